@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_WRITE = "transfer_write"
+INTERACTIVE = "interactive"
+REPORT = "report"
+
+# Long-lived streams hold no DB connection and are not admission controlled
+UNLIMITED_PATHS = ("/events/stream", "/metrics/")
+
+TRANSFER_WRITE_PATHS = (
+    "/transactions/",
+    "/send-money/",
+    "/mark-transaction-received/",
+    "/update-transaction-status/",
+)
+
+
+def classify_request(method: str, path: str) -> Optional[str]:
+    """Map a request to its route class, or None when it is not limited"""
+    if path.startswith(UNLIMITED_PATHS):
+        return None
+    if (
+        path.startswith("/reports/")
+        or path.startswith("/api/transactions/tax_summary")
+        or path.startswith("/backup/")
+        or path.startswith("/restore/")
+        or path.startswith("/import/")
+        or (path.startswith("/api/branches/") and "/profits/" in path)
+    ):
+        return REPORT
+    if method == "POST" and path.startswith(TRANSFER_WRITE_PATHS):
+        return TRANSFER_WRITE
+    return INTERACTIVE
+
+
+class ConcurrencyLimiter:
+    """At most ``max_concurrent`` requests run; up to ``max_queue`` wait for ``queue_timeout`` seconds"""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the server's running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    async def acquire(self) -> bool:
+        if self.active < self.max_concurrent and self.waiting == 0:
+            await self.semaphore.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return False
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self.semaphore.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+
+
+def limiters_from_env() -> Dict[str, ConcurrencyLimiter]:
+    """Default limits are sized for the 30-connection pool; reports can never take more than a few"""
+    def limiter(name, concurrent, queue_size, timeout, retry_after):
+        prefix = f"ADMISSION_{name.upper()}"
+        return ConcurrencyLimiter(
+            name,
+            int(os.getenv(f"{prefix}_CONCURRENCY", concurrent)),
+            int(os.getenv(f"{prefix}_QUEUE", queue_size)),
+            float(os.getenv(f"{prefix}_TIMEOUT", timeout)),
+            int(os.getenv(f"{prefix}_RETRY_AFTER", retry_after))
+        )
+
+    return {
+        TRANSFER_WRITE: limiter(TRANSFER_WRITE, 12, 100, 5.0, 2),
+        INTERACTIVE: limiter(INTERACTIVE, 14, 100, 2.0, 2),
+        REPORT: limiter(REPORT, 3, 6, 1.0, 10),
+    }
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware that sheds load per route class with a fast 503 + Retry-After"""
+
+    def __init__(self, app, limiters: Dict[str, ConcurrencyLimiter]):
+        self.app = app
+        self.limiters = limiters
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify_request(scope["method"], scope["path"])
+        limiter = self.limiters.get(route_class) if route_class else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await limiter.acquire():
+            logger.warning(f"Shedding {scope['method']} {scope['path']} ({route_class} saturated)")
+            await self._reject(send, limiter)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    @staticmethod
+    async def _reject(send, limiter: ConcurrencyLimiter):
+        body = json.dumps({
+            "detail": "الخادم مشغول حالياً. الرجاء المحاولة بعد قليل.",
+            "route_class": limiter.name
+        }, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(limiter.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
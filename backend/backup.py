@@ -0,0 +1,321 @@
+import gzip
+import logging
+import os
+import queue
+import shutil
+import sqlite3
+import tempfile
+import threading
+import zlib
+from typing import Iterator, List, BinaryIO
+
+from change_feed import SEQUENCE, SYNC_SEQUENCE_SQL
+from models import Base
+
+logger = logging.getLogger(__name__)
+
+# Archive layout: for every table a header line, the table's COPY text output,
+# and the standard "\." terminator line. The whole stream is gzip-compressed.
+TABLE_HEADER = b"-- TABLE "
+END_OF_DATA = b"\\.\n"
+
+CHUNK_SIZE = 256 * 1024
+QUEUE_DEPTH = 16
+
+
+def backup_tables() -> List[str]:
+    """Tables in dependency order (parents before children)"""
+    return [table.name for table in Base.metadata.sorted_tables]
+
+
+def _table_columns(cursor, table: str) -> List[str]:
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position",
+        (table,)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _quote_columns(columns: List[str]) -> str:
+    return ", ".join('"' + c.replace('"', '""') + '"' for c in columns)
+
+
+class _QueueWriter:
+    """File-like target for COPY TO that hands data to a bounded queue.
+
+    The bounded queue keeps memory constant: COPY blocks while the HTTP
+    client is slower than the database.
+    """
+
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event):
+        self.chunks = chunks
+        self.cancelled = cancelled
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        while True:
+            if self.cancelled.is_set():
+                raise IOError("Backup download cancelled")
+            try:
+                self.chunks.put(data, timeout=1.0)
+                return len(data)
+            except queue.Full:
+                continue
+
+
+def _run_backup(engine, chunks: queue.Queue, cancelled: threading.Event):
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # One snapshot for all tables so the archive is consistent
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        writer = _QueueWriter(chunks, cancelled)
+        for table in backup_tables():
+            columns = _table_columns(cursor, table)
+            if not columns:
+                continue
+            writer.write(TABLE_HEADER + f"{table} {','.join(columns)}\n".encode("utf-8"))
+            cursor.copy_expert(f'COPY "{table}" ({_quote_columns(columns)}) TO STDOUT', writer)
+            writer.write(END_OF_DATA)
+        raw.rollback()
+        chunks.put(None)
+    except Exception as e:
+        if not cancelled.is_set():
+            logger.error(f"Backup failed: {str(e)}")
+            chunks.put(e)
+    finally:
+        raw.close()
+
+
+def _compress_chunks(chunks: Iterator[bytes], chunk_size: int) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    pending = []
+    pending_size = 0
+    for item in chunks:
+        compressed = compressor.compress(item)
+        if compressed:
+            pending.append(compressed)
+            pending_size += len(compressed)
+        if pending_size >= chunk_size:
+            yield b"".join(pending)
+            pending = []
+            pending_size = 0
+    pending.append(compressor.flush())
+    yield b"".join(pending)
+
+
+def _driver_connection(raw):
+    # SQLAlchemy 2 exposes the DBAPI connection as driver_connection, 1.4 as connection
+    return getattr(raw, "driver_connection", None) or raw.connection
+
+
+def _stream_sqlite_backup(engine, chunk_size: int) -> Iterator[bytes]:
+    """Snapshot the database file with SQLite's online backup API and stream it gzip-compressed"""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        raw = engine.raw_connection()
+        try:
+            target = sqlite3.connect(path)
+            try:
+                _driver_connection(raw).backup(target)
+            finally:
+                target.close()
+        finally:
+            raw.close()
+
+        def read_file():
+            with open(path, "rb") as f:
+                while True:
+                    data = f.read(chunk_size)
+                    if not data:
+                        break
+                    yield data
+
+        yield from _compress_chunks(read_file(), chunk_size)
+    finally:
+        os.unlink(path)
+
+
+def _restore_sqlite_backup(engine, stream: BinaryIO) -> dict:
+    """Replace the live database with an uploaded SQLite backup, page by page in one step"""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with open(path, "wb") as f:
+            shutil.copyfileobj(gzip.GzipFile(fileobj=stream, mode="rb"), f)
+        source = sqlite3.connect(path)
+        try:
+            if source.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+                raise ValueError("Invalid backup file: integrity check failed")
+            present = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            missing = [t for t in backup_tables() if t not in present]
+            if missing:
+                raise ValueError(f"Invalid backup file: missing tables {', '.join(missing)}")
+            restored = {t: source.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in backup_tables()}
+            raw = engine.raw_connection()
+            try:
+                source.backup(_driver_connection(raw))
+            finally:
+                raw.close()
+        finally:
+            source.close()
+    finally:
+        os.unlink(path)
+    # Pooled connections may hold pages of the replaced database
+    engine.dispose()
+    return restored
+
+
+def stream_backup(engine, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a gzip-compressed logical backup of every table.
+
+    COPY runs in a producer thread inside one REPEATABLE READ transaction;
+    this generator compresses its output on the fly and yields chunks of
+    about ``chunk_size`` bytes.
+    """
+    if is_sqlite(engine):
+        yield from _stream_sqlite_backup(engine, chunk_size)
+        return
+
+    chunks: queue.Queue = queue.Queue(maxsize=QUEUE_DEPTH)
+    cancelled = threading.Event()
+    producer = threading.Thread(target=_run_backup, args=(engine, chunks, cancelled), name="backup-copy", daemon=True)
+    producer.start()
+
+    def received():
+        while True:
+            item = chunks.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    try:
+        yield from _compress_chunks(received(), chunk_size)
+    finally:
+        cancelled.set()
+        producer.join(5.0)
+
+
+class _CopyReader:
+    """File-like source for COPY FROM that stops at the table terminator"""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.finished = False
+        self.rows = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if self.finished:
+            return b""
+        parts = []
+        total = 0
+        while size < 0 or total < size:
+            line = self.stream.readline()
+            if not line:
+                raise ValueError("Unexpected end of backup stream")
+            if line == END_OF_DATA:
+                self.finished = True
+                break
+            parts.append(line)
+            total += len(line)
+            self.rows += 1
+        return b"".join(parts)
+
+
+def _secondary_indexes(cursor, tables: List[str]):
+    """Indexes that are not backing a constraint; safe to drop and recreate"""
+    cursor.execute(
+        "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+        "WHERE i.schemaname = current_schema() AND i.tablename = ANY(%s) "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname)",
+        (tables,)
+    )
+    return cursor.fetchall()
+
+
+def restore_backup(engine, stream: BinaryIO) -> dict:
+    """Replace all table contents with a backup produced by ``stream_backup``.
+
+    Runs in a single transaction: tables are truncated, secondary indexes
+    dropped, every table bulk-loaded with COPY FROM, indexes rebuilt and
+    sequences moved past the restored ids and change numbers. Any error
+    rolls everything back.
+    ``stream`` is read incrementally, so memory use does not depend on the
+    backup size.
+
+    On SQLite the backup is a copy of the database file and is restored
+    with the online backup API instead.
+    """
+    if is_sqlite(engine):
+        return _restore_sqlite_backup(engine, stream)
+
+    tables = backup_tables()
+    restored = {}
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        indexes = _secondary_indexes(cursor, tables)
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+        cursor.execute("TRUNCATE " + ", ".join(f'"{t}"' for t in tables) + " CASCADE")
+
+        data = gzip.GzipFile(fileobj=stream, mode="rb")
+        while True:
+            header = data.readline()
+            if not header:
+                break
+            if not header.startswith(TABLE_HEADER):
+                raise ValueError("Invalid backup file: missing table header")
+            table, _, columns = header[len(TABLE_HEADER):].decode("utf-8").strip().partition(" ")
+            if table not in tables:
+                raise ValueError(f"Invalid backup file: unknown table {table}")
+            reader = _CopyReader(data)
+            cursor.copy_expert(f'COPY "{table}" ({_quote_columns(columns.split(","))}) FROM STDIN', reader)
+            restored[table] = reader.rows
+
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for table in tables:
+            if "id" in Base.metadata.tables[table].c:
+                cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (f'"{table}"',))
+                sequence = cursor.fetchone()[0]
+                if sequence:
+                    cursor.execute(
+                        f'SELECT setval(%s, COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM "{table}"',
+                        (sequence,)
+                    )
+            # Fresh statistics for the planner after a bulk load
+            cursor.execute(f'ANALYZE "{table}"')
+        # The change sequence belongs to no column; continue after the restored numbers
+        cursor.execute("SELECT to_regclass(%s)", (SEQUENCE,))
+        if cursor.fetchone()[0]:
+            cursor.execute(SYNC_SEQUENCE_SQL)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    return restored
+
+
+def is_postgres(engine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def is_sqlite(engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def supports_backup(engine) -> bool:
+    return is_postgres(engine) or is_sqlite(engine)
+
+
+def backup_extension(engine) -> str:
+    return "sqlite.gz" if is_sqlite(engine) else "pgcopy.gz"
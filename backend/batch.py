@@ -0,0 +1,230 @@
+"""Several GET requests sent as one: ``POST /batch``.
+
+Client screens often fetch a branch, its tax rate, employees and fund
+history in a row, and over a slow branch link each request pays its own
+TLS and auth round trip. A batch is authenticated once; each sub-request
+is matched against the application's routes and its endpoint function is
+called directly with the caller's user and one database session shared by
+the whole batch. Sub-responses come back as one JSON array, in request
+order.
+
+Only routes listed as batchable can be called, each with a cost; a batch
+may hold at most ``max_requests`` sub-requests and ``max_cost`` in total.
+Sub-requests run one after another: they share a Session, which must not
+be used from two threads at once, and the saving is in the round trips.
+"""
+import inspect
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.params import Depends as DependsParam
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from pydantic.fields import FieldInfo
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+# Headers of the outer request that must not leak into sub-requests
+_OUTER_ONLY_HEADERS = (b"if-none-match", b"content-length", b"content-type")
+
+
+class SubRequest(BaseModel):
+    method: str = "GET"
+    path: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+    # Only If-None-Match is honoured; authorization comes from the batch itself
+    headers: Dict[str, str] = Field(default_factory=dict)
+
+
+class PlannedRequest:
+    """A sub-request matched to its route, or the error response it gets instead"""
+
+    def __init__(self, sub: SubRequest, route: Optional[APIRoute] = None, path_params: Optional[Dict] = None,
+                 cost: int = 0, session: Optional[Callable] = None, error: Optional[Tuple[int, str]] = None):
+        self.sub = sub
+        self.route = route
+        self.path_params = path_params or {}
+        self.cost = cost
+        self.session = session
+        self.error = error
+
+
+class BatchRouter:
+    """Plans and runs batches against ``app``'s GET routes.
+
+    ``batchable`` maps route paths (as declared, e.g. ``/branches/{branch_id}``)
+    to their cost. ``session_dependencies`` maps each session dependency an
+    endpoint may declare to ``(read_only, statement_timeout_ms)``.
+    """
+
+    def __init__(self, app, batchable: Dict[str, int], user_dependency: Callable,
+                 session_dependencies: Dict[Callable, Tuple[bool, Optional[int]]],
+                 max_requests: int = 20, max_cost: int = 20):
+        self.app = app
+        self.batchable = batchable
+        self.user_dependency = user_dependency
+        self.session_dependencies = session_dependencies
+        self.max_requests = max_requests
+        self.max_cost = max_cost
+
+    def plan(self, subs: List[SubRequest]) -> List[PlannedRequest]:
+        """Match every sub-request; 413 when the batch is over its limits"""
+        if len(subs) > self.max_requests:
+            raise HTTPException(status_code=413, detail=f"A batch may hold at most {self.max_requests} requests")
+        planned = [self._resolve(sub) for sub in subs]
+        cost = sum(item.cost for item in planned)
+        if cost > self.max_cost:
+            raise HTTPException(
+                status_code=413, detail=f"Batch cost {cost} is over the limit of {self.max_cost}; split it"
+            )
+        return planned
+
+    def session_options(self, planned: List[PlannedRequest]) -> Tuple[bool, Optional[int]]:
+        """(read_only, statement timeout) for the batch's shared session.
+
+        Read-only (replica-capable) only when every endpoint accepts a read
+        session; the loosest timeout of the endpoints, none if one has none.
+        """
+        needs = [self.session_dependencies[item.session] for item in planned if item.session is not None]
+        read_only = all(need[0] for need in needs)
+        timeouts = [need[1] for need in needs]
+        timeout_ms = None if not timeouts or None in timeouts else max(timeouts)
+        return read_only, timeout_ms
+
+    async def execute(self, planned: List[PlannedRequest], request: Request, current_user: Dict[str, Any],
+                      db, begin: Optional[Callable] = None) -> List[Dict[str, Any]]:
+        """Run the sub-requests in order on ``db``.
+
+        ``begin(db)`` prepares a session transaction (e.g. its statement
+        timeout); it runs first and again after a failed sub-request's rollback.
+        """
+        if begin is not None:
+            await run_in_threadpool(begin, db)
+        results = []
+        for item in planned:
+            result = await self._run(item, request, current_user, db)
+            if result["status"] >= 400 and item.error is None and begin is not None:
+                await run_in_threadpool(begin, db)
+            results.append(result)
+        return results
+
+    def _resolve(self, sub: SubRequest) -> PlannedRequest:
+        if sub.method.upper() != "GET":
+            return PlannedRequest(sub, error=(405, "Only GET requests can be batched"))
+        scope = {"type": "http", "method": "GET", "path": sub.path.split("?", 1)[0], "root_path": ""}
+        for route in self.app.router.routes:
+            if not isinstance(route, APIRoute):
+                continue
+            match, child_scope = route.matches(scope)
+            if match != Match.FULL:
+                continue
+            if route.path not in self.batchable:
+                return PlannedRequest(sub, error=(400, f"{route.path} cannot be batched"))
+            session = None
+            for param in inspect.signature(route.endpoint).parameters.values():
+                if isinstance(param.default, DependsParam) and param.default.dependency in self.session_dependencies:
+                    session = param.default.dependency
+            return PlannedRequest(sub, route, child_scope.get("path_params", {}), self.batchable[route.path], session)
+        return PlannedRequest(sub, error=(404, "Not Found"))
+
+    async def _run(self, item: PlannedRequest, outer: Request, current_user: Dict[str, Any], db) -> Dict[str, Any]:
+        if item.error:
+            return _sub_response(item.error[0], {"detail": item.error[1]})
+        response = Response()
+        try:
+            kwargs = self._arguments(item, _sub_request(outer, item), response, current_user, db)
+            if inspect.iscoroutinefunction(item.route.endpoint):
+                result = await item.route.endpoint(**kwargs)
+            else:
+                result = await run_in_threadpool(item.route.endpoint, **kwargs)
+        except HTTPException as e:
+            await run_in_threadpool(db.rollback)
+            return _sub_response(e.status_code, {"detail": e.detail}, e.headers)
+        except Exception as e:
+            await run_in_threadpool(db.rollback)
+            logger.exception(f"Batched {item.route.path} failed")
+            return _sub_response(500, {"detail": f"Internal server error: {str(e)}"})
+
+        if isinstance(result, Response):
+            return _sub_response(result.status_code, _decode_body(result), result.headers)
+        return _sub_response(item.route.status_code or 200, jsonable_encoder(result), response.headers)
+
+    def _arguments(self, item: PlannedRequest, request: Request, response: Response,
+                   current_user: Dict[str, Any], db) -> Dict[str, Any]:
+        """Endpoint keyword arguments, the way FastAPI would resolve them for this sub-request"""
+        kwargs = {}
+        for name, param in inspect.signature(item.route.endpoint).parameters.items():
+            default = param.default
+            if isinstance(default, DependsParam):
+                if default.dependency is self.user_dependency:
+                    kwargs[name] = current_user
+                elif default.dependency in self.session_dependencies:
+                    kwargs[name] = db
+                else:
+                    raise HTTPException(status_code=400, detail=f"{item.route.path} cannot be batched")
+                continue
+            if param.annotation is Request:
+                kwargs[name] = request
+                continue
+            if param.annotation is Response:
+                kwargs[name] = response
+                continue
+            if name in item.path_params:
+                raw = item.path_params[name]
+            elif name in item.sub.params:
+                raw = item.sub.params[name]
+            elif default is inspect.Parameter.empty:
+                raise HTTPException(status_code=422, detail=f"Missing parameter: {name}")
+            elif isinstance(default, FieldInfo):
+                # Query(...)/Header(...) declarations: Python would pass the marker object itself
+                kwargs[name] = default.get_default(call_default_factory=True)
+                continue
+            else:
+                continue
+            if param.annotation is inspect.Parameter.empty:
+                kwargs[name] = raw
+                continue
+            try:
+                kwargs[name] = TypeAdapter(param.annotation).validate_python(raw)
+            except ValidationError:
+                raise HTTPException(status_code=422, detail=f"Invalid value for {name}: {raw!r}")
+        return kwargs
+
+
+def _sub_request(outer: Request, item: PlannedRequest) -> Request:
+    """Request object for the endpoint: the outer request's headers with the sub-request's path and query"""
+    headers = [(key, value) for key, value in outer.scope["headers"] if key not in _OUTER_ONLY_HEADERS]
+    for key, value in item.sub.headers.items():
+        if key.lower() == "if-none-match":
+            headers.append((b"if-none-match", value.encode("latin-1")))
+    path = item.sub.path.split("?", 1)[0]
+    scope = {
+        **outer.scope,
+        "method": "GET",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(item.sub.params, doseq=True).encode(),
+        "headers": headers,
+        "path_params": item.path_params,
+    }
+    return Request(scope)
+
+
+def _decode_body(response: Response) -> Any:
+    body = getattr(response, "body", b"") or b""
+    if not body:
+        return None
+    if (response.media_type or "").startswith("application/json"):
+        return json.loads(body)
+    return body.decode("utf-8", errors="replace")
+
+
+def _sub_response(status: int, body: Any, headers=None) -> Dict[str, Any]:
+    kept = {key: value for key, value in (headers or {}).items() if key.lower() not in ("content-length", "content-type")}
+    return {"status": status, "headers": kept, "body": body}
@@ -0,0 +1,11 @@
+"""End-to-end benchmark suite for the payment system API.
+
+Seeds a synthetic data set, replays a weighted mix of real client calls
+(transfers, receipts, status updates, listings, searches, dashboards and
+tax summaries) against the app running in-process, and writes latency
+percentiles, throughput and database round trips per endpoint as JSON:
+
+    python -m bench --requests 5000 --output run.json     # local SQLite file
+    python -m bench --database-url postgresql+psycopg2://... --output run.json
+    python -m bench --compare baseline.json run.json
+"""
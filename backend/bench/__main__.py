@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from .runner import build_report, compare, run_against_url, run_in_process
+from .workload import Workload
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark the payment system API")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///bench.db"),
+                        help="database to seed and run against (use a dedicated one; default: local SQLite file)")
+    parser.add_argument("--url", help="benchmark an already running server instead of the in-process app")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--branches", type=int, default=10)
+    parser.add_argument("--employees-per-branch", type=int, default=3)
+    parser.add_argument("--transactions", type=int, default=50_000, help="historical transfers to seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"),
+                        help="print the differences between two saved reports and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, encoding="utf-8") as f:
+                reports.append(json.load(f))
+        print("\n".join(compare(*reports)))
+        return 0
+
+    # Must be set before the application modules are imported
+    os.environ["DATABASE_URL"] = args.database_url
+
+    import database
+    import migrations
+    from .dataset import seed
+
+    engine = database.get_engine()
+    migrations.upgrade(engine)
+    dataset = seed(
+        database.SessionLocal,
+        branches=args.branches,
+        employees_per_branch=args.employees_per_branch,
+        transactions=args.transactions,
+        random_seed=args.seed,
+    )
+    workload = Workload(dataset, random_seed=args.seed)
+
+    if args.url:
+        results = asyncio.run(run_against_url(args.url, workload, args.requests, args.concurrency, args.warmup))
+    else:
+        from server_improved import app
+        results = asyncio.run(run_in_process(app, engine, workload, args.requests, args.concurrency, args.warmup))
+
+    config = {
+        "mode": "url" if args.url else "in-process",
+        "database": engine.dialect.name,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "warmup": args.warmup,
+        "seed": args.seed,
+    }
+    report = build_report(results, config, {**dataset.describe(), "historical_transactions": args.transactions})
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
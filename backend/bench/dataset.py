@@ -0,0 +1,159 @@
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import change_feed
+import daily_totals
+from models import Branch, User, Transaction
+from security import hash_password
+
+PASSWORD = "bench-pass"
+GOVERNORATES = ["دمشق", "حلب", "حمص", "حماة", "اللاذقية", "طرطوس", "درعا", "إدلب"]
+FIRST_NAMES = ["أحمد", "محمد", "علي", "سارة", "ليلى", "عمر", "خالد", "نور", "رنا", "يوسف", "مريم", "حسن"]
+LAST_NAMES = ["الحلواني", "الخطيب", "السيد", "الأحمد", "العلي", "النجار", "الحداد", "الشامي"]
+
+
+@dataclass
+class Dataset:
+    branch_ids: List[int]
+    director: str
+    managers: Dict[int, str] = field(default_factory=dict)
+    employees: Dict[int, List[str]] = field(default_factory=dict)
+    names: List[str] = field(default_factory=list)
+
+    def describe(self) -> dict:
+        return {
+            "branches": len(self.branch_ids),
+            "employees": sum(len(users) for users in self.employees.values()),
+        }
+
+
+def _names() -> List[str]:
+    return [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+
+
+def _mobile(rng: random.Random) -> str:
+    return "09" + "".join(rng.choice("0123456789") for _ in range(8))
+
+
+def _transaction_row(rng: random.Random, names: List[str], branch_ids: List[int],
+                     employee_ids: Dict[int, int], now: datetime) -> dict:
+    source, destination = rng.sample(branch_ids, 2)
+    currency = "SYP" if rng.random() < 0.8 else "USD"
+    base = round(rng.uniform(50_000, 5_000_000) if currency == "SYP" else rng.uniform(20, 2_000), 2)
+    benefited = round(base * 0.01, 2)
+    tax_rate = 5.0
+    status = rng.choices(["completed", "processing", "cancelled"], weights=[70, 20, 10])[0]
+    return {
+        "id": str(uuid.uuid4()),
+        "sender": rng.choice(names),
+        "sender_mobile": _mobile(rng),
+        "sender_governorate": rng.choice(GOVERNORATES),
+        "sender_location": "المركز",
+        "sender_id": str(rng.randint(10**10, 10**11)),
+        "sender_address": "",
+        "receiver": rng.choice(names),
+        "receiver_mobile": _mobile(rng),
+        "receiver_governorate": rng.choice(GOVERNORATES),
+        "receiver_location": "",
+        "receiver_id": "",
+        "receiver_address": "",
+        "amount": base + benefited,
+        "base_amount": base,
+        "benefited_amount": benefited,
+        "tax_rate": tax_rate,
+        "tax_amount": round(benefited * tax_rate / 100, 2),
+        "currency": currency,
+        "message": "",
+        "branch_id": source,
+        "destination_branch_id": destination,
+        "employee_id": employee_ids[source],
+        "employee_name": f"bench_employee_{source}_0",
+        "branch_governorate": GOVERNORATES[source % len(GOVERNORATES)],
+        "status": status,
+        "is_received": status == "completed",
+        "date": now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+    }
+
+
+def seed(session_factory, branches: int = 10, employees_per_branch: int = 3,
+         transactions: int = 50_000, random_seed: int = 42, batch_size: int = 5_000) -> Dataset:
+    """Create branches, users and historical transfers for a benchmark run.
+
+    Refuses to touch a database that already has transactions unless it was
+    seeded by a previous run (recognised by the bench_director user).
+    """
+    rng = random.Random(random_seed)
+    names = _names()
+    db: Session = session_factory()
+    try:
+        existing = db.query(User).filter(User.username == "bench_director").first()
+        if existing:
+            return load(db, names)
+        if db.query(Transaction.id).first():
+            raise RuntimeError("Refusing to seed a database that already holds transactions; use an empty one")
+
+        # One hash for every account keeps seeding fast
+        password_hash = hash_password(PASSWORD)
+        db.add(User(username="bench_director", password=password_hash, role="director"))
+
+        branch_ids = []
+        for i in range(branches):
+            branch = Branch(
+                branch_id=f"BENCH{i:03d}",
+                name=f"فرع الاختبار {i}",
+                location="المركز",
+                governorate=GOVERNORATES[i % len(GOVERNORATES)],
+                allocated_amount_syp=10**13,
+                allocated_amount_usd=10**9,
+                tax_rate=5.0
+            )
+            db.add(branch)
+            db.flush()
+            branch_ids.append(branch.id)
+            db.add(User(username=f"bench_manager_{branch.id}", password=password_hash,
+                        role="branch_manager", branch_id=branch.id))
+            for j in range(employees_per_branch):
+                db.add(User(username=f"bench_employee_{branch.id}_{j}", password=password_hash,
+                            role="employee", branch_id=branch.id))
+        db.flush()
+
+        employee_ids = {
+            user.branch_id: user.id
+            for user in db.query(User).filter(User.username.like("bench_employee_%_0"))
+        }
+        now = datetime.now()
+        table = Transaction.__table__
+        remaining = transactions
+        while remaining > 0:
+            rows = [_transaction_row(rng, names, branch_ids, employee_ids, now)
+                    for _ in range(min(batch_size, remaining))]
+            db.execute(table.insert(), rows)
+            remaining -= len(rows)
+        # Core inserts bypass the ORM hooks that number changes and maintain the report rollup
+        change_feed.stamp_unsequenced(db)
+        daily_totals.rebuild(db)
+        db.commit()
+
+        # Planner statistics for the freshly loaded tables (PostgreSQL and SQLite alike)
+        db.execute(text("ANALYZE"))
+        db.commit()
+        return load(db, names)
+    finally:
+        db.close()
+
+
+def load(db: Session, names: List[str]) -> Dataset:
+    dataset = Dataset(branch_ids=[], director="bench_director", names=names)
+    for user in db.query(User).filter(User.username.like("bench_%")).order_by(User.id):
+        if user.role == "branch_manager":
+            dataset.managers[user.branch_id] = user.username
+        elif user.role == "employee":
+            dataset.employees.setdefault(user.branch_id, []).append(user.username)
+    dataset.branch_ids = sorted(dataset.managers)
+    return dataset
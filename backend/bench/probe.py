@@ -0,0 +1,31 @@
+import contextvars
+from typing import List, Optional
+
+from sqlalchemy import event
+
+# Counter for the request being measured; copied into worker threads with the context
+_current: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("bench_round_trips", default=None)
+
+
+def _on_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _current.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def _on_commit(conn):
+    counter = _current.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def install(engine):
+    """Count statements and commits issued on ``engine`` per measured request"""
+    event.listen(engine, "before_cursor_execute", _on_execute)
+    event.listen(engine, "commit", _on_commit)
+
+
+def start() -> List[int]:
+    counter = [0]
+    _current.set(counter)
+    return counter
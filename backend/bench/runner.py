@@ -0,0 +1,154 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+from . import probe
+from .dataset import PASSWORD
+from .workload import Workload
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.round_trips: Dict[str, List[int]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.status_codes: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name: str, seconds: float, status_code: int, round_trips: Optional[int]):
+        self.latencies[name].append(seconds * 1000)
+        self.status_codes[name][status_code] += 1
+        if status_code >= 400:
+            self.errors[name] += 1
+        if round_trips is not None:
+            self.round_trips[name].append(round_trips)
+
+    def _summary(self, latencies: List[float], round_trips: List[int], errors: int, duration: float) -> dict:
+        def ms(value):
+            return round(value, 2) if value is not None else None
+
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / duration, 2) if duration else None,
+            "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50_ms": ms(percentile(latencies, 0.50)),
+            "p95_ms": ms(percentile(latencies, 0.95)),
+            "p99_ms": ms(percentile(latencies, 0.99)),
+            "max_ms": ms(max(latencies)) if latencies else None,
+            "db_round_trips_mean": round(sum(round_trips) / len(round_trips), 2) if round_trips else None,
+            "db_round_trips_p95": percentile(round_trips, 0.95),
+        }
+
+    def report(self, duration: float) -> dict:
+        endpoints = {}
+        for name in sorted(self.latencies):
+            summary = self._summary(self.latencies[name], self.round_trips[name], self.errors[name], duration)
+            summary["status_codes"] = {str(code): count for code, count in sorted(self.status_codes[name].items())}
+            endpoints[name] = summary
+        all_latencies = [v for values in self.latencies.values() for v in values]
+        all_round_trips = [v for values in self.round_trips.values() for v in values]
+        total = self._summary(all_latencies, all_round_trips, sum(self.errors.values()), duration)
+        total["duration_s"] = round(duration, 2)
+        return {"summary": total, "endpoints": endpoints}
+
+
+async def login(client: httpx.AsyncClient, usernames: List[str]) -> Dict[str, str]:
+    tokens = {}
+    for username in usernames:
+        response = await client.post("/login/", json={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+        tokens[username] = response.json()["access_token"]
+    return tokens
+
+
+async def run_mix(client: httpx.AsyncClient, workload: Workload, requests: int, concurrency: int,
+                  count_round_trips: bool, warmup: int = 0) -> dict:
+    """Closed-loop run: ``concurrency`` clients issue calls back to back until ``requests`` are done"""
+    tokens = await login(client, workload.usernames())
+    recorder = Recorder()
+    issued = 0
+
+    async def one_call(record: bool):
+        call = workload.next_call()
+        counter = probe.start() if count_round_trips else None
+        started = time.perf_counter()
+        response = await client.request(
+            call.method, call.path, params=call.params, json=call.json,
+            headers={"Authorization": f"Bearer {tokens[call.username]}"}
+        )
+        elapsed = time.perf_counter() - started
+        if response.status_code < 400 and call.on_success:
+            call.on_success(response.json())
+        if record:
+            recorder.record(call.name, elapsed, response.status_code, counter[0] if counter else None)
+
+    async def client_loop(limit: int, record: bool):
+        nonlocal issued
+        while issued < limit:
+            issued += 1
+            await one_call(record)
+
+    if warmup:
+        await asyncio.gather(*(client_loop(warmup, False) for _ in range(concurrency)))
+        issued = 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(requests, True) for _ in range(concurrency)))
+    return recorder.report(time.perf_counter() - started)
+
+
+async def run_in_process(app, engine, workload: Workload, requests: int, concurrency: int, warmup: int) -> dict:
+    """Drive the ASGI app directly, with its lifespan, counting DB round trips"""
+    probe.install(engine)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            return await run_mix(client, workload, requests, concurrency, True, warmup)
+
+
+async def run_against_url(url: str, workload: Workload, requests: int, concurrency: int, warmup: int) -> dict:
+    """Drive an already running server; DB round trips are not observable from here"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        return await run_mix(client, workload, requests, concurrency, False, warmup)
+
+
+def build_report(results: dict, config: dict, dataset: dict) -> dict:
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "config": config,
+        "dataset": dataset,
+        **results,
+    }
+
+
+def compare(baseline: dict, candidate: dict) -> List[str]:
+    """Human-readable per-endpoint deltas between two reports"""
+    lines = [f"{'endpoint':<30} {'p95 ms':>18} {'rps':>18} {'db trips':>14}"]
+
+    def delta(old, new):
+        if old in (None, 0) or new is None:
+            return f"{old} -> {new}"
+        return f"{old} -> {new} ({(new - old) / old * 100:+.0f}%)"
+
+    names = sorted(set(baseline["endpoints"]) | set(candidate["endpoints"]))
+    for name in names + ["(all)"]:
+        old = baseline["summary"] if name == "(all)" else baseline["endpoints"].get(name, {})
+        new = candidate["summary"] if name == "(all)" else candidate["endpoints"].get(name, {})
+        lines.append(
+            f"{name:<30} {delta(old.get('p95_ms'), new.get('p95_ms')):>18} "
+            f"{delta(old.get('throughput_rps'), new.get('throughput_rps')):>18} "
+            f"{delta(old.get('db_round_trips_mean'), new.get('db_round_trips_mean')):>14}"
+        )
+    return lines
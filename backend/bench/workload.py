@@ -0,0 +1,152 @@
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+from .dataset import Dataset, GOVERNORATES
+
+# (scenario, weight) — roughly the traffic of a working day across all desktop clients
+DEFAULT_MIX = [
+    ("create_transfer", 20),
+    ("receive_transfer", 10),
+    ("update_status", 5),
+    ("list_transactions", 30),
+    ("search_transactions", 15),
+    ("director_dashboard", 15),
+    ("tax_summary", 5),
+]
+
+DASHBOARD_ENDPOINTS = [
+    ("dashboard_branch_stats", "/branches/stats/"),
+    ("dashboard_financial_total", "/financial/total/"),
+    ("dashboard_transaction_stats", "/transactions/stats/"),
+    ("dashboard_user_stats", "/users/stats/"),
+]
+
+
+@dataclass
+class Call:
+    name: str
+    method: str
+    path: str
+    username: str
+    params: Optional[dict] = None
+    json: Optional[dict] = None
+    on_success: Optional[Callable[[dict], None]] = field(default=None, repr=False)
+
+
+class Workload:
+    """Produces the next API call of the mix, tracking transfers created during the run"""
+
+    def __init__(self, dataset: Dataset, mix=None, random_seed: int = 7):
+        self.dataset = dataset
+        self.rng = random.Random(random_seed)
+        scenarios, weights = zip(*(mix or DEFAULT_MIX))
+        self.scenarios = list(scenarios)
+        self.weights = list(weights)
+        # Transfers created by this run that are still "processing"
+        self.open_by_destination: Dict[int, List[str]] = {}
+        self.open_by_source: Dict[int, List[str]] = {}
+        self.closed = set()
+
+    def usernames(self) -> List[str]:
+        users = [self.dataset.director, *self.dataset.managers.values()]
+        for employees in self.dataset.employees.values():
+            users.extend(employees)
+        return users
+
+    def next_call(self) -> Call:
+        scenario = self.rng.choices(self.scenarios, weights=self.weights)[0]
+        call = getattr(self, scenario)()
+        return call or self.create_transfer()
+
+    def _take(self, pool: Dict[int, List[str]]):
+        candidates = [branch for branch, ids in pool.items() if ids]
+        while candidates:
+            branch = self.rng.choice(candidates)
+            transaction_id = pool[branch].pop()
+            if transaction_id not in self.closed:
+                self.closed.add(transaction_id)
+                return branch, transaction_id
+            if not pool[branch]:
+                candidates.remove(branch)
+        return None
+
+    def create_transfer(self) -> Call:
+        source, destination = self.rng.sample(self.dataset.branch_ids, 2)
+        currency = "SYP" if self.rng.random() < 0.8 else "USD"
+        base = round(self.rng.uniform(50_000, 2_000_000) if currency == "SYP" else self.rng.uniform(20, 1_000), 2)
+        benefited = round(base * 0.01, 2)
+        payload = {
+            "sender": self.rng.choice(self.dataset.names),
+            "sender_mobile": "09" + str(self.rng.randint(10**7, 10**8 - 1)),
+            "sender_governorate": self.rng.choice(GOVERNORATES),
+            "sender_location": "المركز",
+            "sender_id": str(self.rng.randint(10**10, 10**11)),
+            "receiver": self.rng.choice(self.dataset.names),
+            "receiver_mobile": "09" + str(self.rng.randint(10**7, 10**8 - 1)),
+            "receiver_governorate": self.rng.choice(GOVERNORATES),
+            "amount": base + benefited,
+            "base_amount": base,
+            "benefited_amount": benefited,
+            "tax_rate": 0,
+            "tax_amount": 0,
+            "currency": currency,
+            "message": "",
+            "employee_name": self.dataset.employees[source][0],
+            "branch_governorate": GOVERNORATES[source % len(GOVERNORATES)],
+            "destination_branch_id": destination,
+            "branch_id": source,
+        }
+
+        def remember(body: dict):
+            transaction_id = body.get("transaction_id")
+            if transaction_id:
+                self.open_by_destination.setdefault(destination, []).append(transaction_id)
+                self.open_by_source.setdefault(source, []).append(transaction_id)
+
+        return Call("create_transfer", "POST", "/transactions/", self.rng.choice(self.dataset.employees[source]),
+                    json=payload, on_success=remember)
+
+    def receive_transfer(self) -> Optional[Call]:
+        taken = self._take(self.open_by_destination)
+        if not taken:
+            return None
+        destination, transaction_id = taken
+        payload = {
+            "transaction_id": transaction_id,
+            "receiver": self.rng.choice(self.dataset.names),
+            "receiver_mobile": "09" + str(self.rng.randint(10**7, 10**8 - 1)),
+            "receiver_id": str(self.rng.randint(10**10, 10**11)),
+            "receiver_address": "المركز",
+            "receiver_governorate": self.rng.choice(GOVERNORATES),
+        }
+        return Call("receive_transfer", "POST", "/mark-transaction-received/",
+                    self.rng.choice(self.dataset.employees[destination]), json=payload)
+
+    def update_status(self) -> Optional[Call]:
+        taken = self._take(self.open_by_source)
+        if not taken:
+            return None
+        source, transaction_id = taken
+        return Call("update_status", "POST", "/update-transaction-status/", self.dataset.managers[source],
+                    json={"transaction_id": transaction_id, "status": "cancelled"})
+
+    def list_transactions(self) -> Call:
+        branch = self.rng.choice(self.dataset.branch_ids)
+        return Call("list_transactions", "GET", "/transactions/", self.dataset.managers[branch],
+                    params={"branch_id": branch, "page": self.rng.randint(1, 5), "per_page": 20})
+
+    def search_transactions(self) -> Call:
+        return Call("search_transactions", "GET", "/transactions/", self.dataset.director,
+                    params={"sender": self.rng.choice(self.dataset.names), "per_page": 20})
+
+    def director_dashboard(self) -> Call:
+        name, path = self.rng.choice(DASHBOARD_ENDPOINTS)
+        return Call(name, "GET", path, self.dataset.director)
+
+    def tax_summary(self) -> Call:
+        end = date.today() - timedelta(days=self.rng.randint(0, 300))
+        start = end - timedelta(days=30)
+        return Call("tax_summary", "GET", "/api/transactions/tax_summary/", self.dataset.director,
+                    params={"start_date": start.isoformat(), "end_date": end.isoformat()})
@@ -0,0 +1,426 @@
+"""Bulk import of legacy transfers and fund history.
+
+Rows are read as a stream (CSV or NDJSON), validated with the same rules as
+``TransactionSchema`` and loaded with COPY into a temporary staging table.
+Everything else happens in set-based SQL inside one transaction: unknown
+branches and ids repeated within the file are rejected, new rows are merged
+into ``transactions`` (existing ids are skipped), and branch balances and
+profit records are updated once for the whole batch.
+
+Usage:
+    python bulk_import.py transactions legacy.csv
+    python bulk_import.py funds history.ndjson --format ndjson --dry-run
+"""
+import argparse
+import csv
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Iterator, Dict, Any, List, Optional, Iterable, TextIO, Union
+
+from pydantic import ValidationError
+
+import codes
+from change_feed import stamp_sql
+from daily_totals import rebuild_statements
+from schemas import TransactionSchema
+
+logger = logging.getLogger(__name__)
+
+MAX_REPORTED_ERRORS = 100
+
+TRANSACTION_COLUMNS = [
+    "id", "sender", "sender_mobile", "sender_governorate", "sender_location", "sender_id", "sender_address",
+    "receiver", "receiver_mobile", "receiver_governorate", "receiver_location", "receiver_id", "receiver_address",
+    "amount", "base_amount", "benefited_amount", "tax_rate", "tax_amount", "currency", "message",
+    "branch_id", "destination_branch_id", "employee_id", "employee_name", "branch_governorate",
+    "status", "is_received", "received_at", "date"
+]
+
+FUND_COLUMNS = ["branch_id", "amount", "type", "currency", "description", "created_at"]
+
+TRANSACTION_STATUSES = ("processing", "completed", "cancelled", "rejected", "pending")
+# Transfers in these states never moved money
+VOID_STATUS_CODES = ", ".join(str(codes.STATUS.code(name)) for name in ("cancelled", "rejected"))
+COMPLETED_CODE = codes.STATUS.code("completed")
+USD_CODE = codes.CURRENCY.code("USD")
+FUND_TYPES = ("allocation", "deduction", "refund")
+
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.valid = 0
+        self.inserted = 0
+        self.skipped_existing = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.error_count = 0
+
+    def add_error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "read": self.read,
+            "valid": self.valid,
+            "inserted": self.inserted,
+            "skipped_existing": self.skipped_existing,
+            "error_count": self.error_count,
+            "errors": self.errors
+        }
+
+
+def read_records(stream: TextIO, file_format: str) -> Iterator[Union[Dict[str, Any], str]]:
+    """Yield one record per input row without loading the file into memory.
+
+    NDJSON lines are yielded as text and decoded per row by ``_valid_rows``,
+    so a malformed line is reported like any other invalid row.
+    """
+    if file_format == "csv":
+        for row in csv.DictReader(stream):
+            yield {k: (v if v != "" else None) for k, v in row.items() if k}
+    elif file_format == "ndjson":
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield line
+    else:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+
+def _decode_line(line: str) -> Dict[str, Any]:
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Malformed JSON: {e.msg} (column {e.colno})")
+    if not isinstance(record, dict):
+        raise ValueError("Each line must be a JSON object")
+    return record
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(str(value).strip())
+
+
+def _optional_int(value) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+def validate_transaction(record: Dict[str, Any]) -> List[Any]:
+    """Validate one legacy transfer and return it in TRANSACTION_COLUMNS order"""
+    schema_fields = {k: v for k, v in record.items() if k in TransactionSchema.model_fields and v is not None}
+    schema_fields.pop("date", None)
+    schema_fields.setdefault("message", "")
+    transaction = TransactionSchema(**schema_fields)
+
+    status = record.get("status") or "completed"
+    if status not in TRANSACTION_STATUSES:
+        raise ValueError(f"Invalid status: {status}")
+    date = _parse_datetime(record.get("date"))
+    if date is None:
+        raise ValueError("date is required for historical transfers")
+    is_received = str(record.get("is_received", status == "completed")).lower() in ("true", "1", "yes")
+
+    # Currency, status and governorates are loaded as their small-integer codes
+    return [
+        record.get("id") or str(uuid.uuid4()),
+        transaction.sender, transaction.sender_mobile, codes.GOVERNORATE.code(transaction.sender_governorate),
+        transaction.sender_location, transaction.sender_id or "", transaction.sender_address or "",
+        transaction.receiver, transaction.receiver_mobile, codes.GOVERNORATE.code(transaction.receiver_governorate),
+        transaction.receiver_location or "", transaction.receiver_id or "", transaction.receiver_address or "",
+        transaction.amount, transaction.base_amount, transaction.benefited_amount,
+        transaction.tax_rate, transaction.tax_amount, codes.CURRENCY.code(transaction.currency), transaction.message or "",
+        transaction.branch_id, transaction.destination_branch_id, _optional_int(record.get("employee_id")),
+        transaction.employee_name, codes.GOVERNORATE.code(transaction.branch_governorate),
+        codes.STATUS.code(status), is_received, _parse_datetime(record.get("received_at")), date
+    ]
+
+
+def validate_fund(record: Dict[str, Any]) -> List[Any]:
+    """Validate one fund history entry and return it in FUND_COLUMNS order"""
+    branch_id = _optional_int(record.get("branch_id"))
+    if branch_id is None:
+        raise ValueError("branch_id is required")
+    fund_type = record.get("type")
+    if fund_type not in FUND_TYPES:
+        raise ValueError(f"Invalid fund type: {fund_type}")
+    currency = (record.get("currency") or "SYP").upper()
+    if currency not in ("SYP", "USD"):
+        raise ValueError("العملة غير مدعومة. الرجاء استخدام SYP أو USD")
+    return [
+        branch_id,
+        float(record.get("amount")),
+        fund_type,
+        codes.CURRENCY.code(currency),
+        record.get("description") or "",
+        _parse_datetime(record.get("created_at")) or datetime.now()
+    ]
+
+
+def _valid_rows(records: Iterable[Union[Dict[str, Any], str]], validator,
+                report: ImportReport) -> Iterator[List[Any]]:
+    for line_no, record in enumerate(records, start=1):
+        report.read += 1
+        try:
+            row = validator(_decode_line(record) if isinstance(record, str) else record)
+        except ValidationError as e:
+            report.add_error(line_no, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            continue
+        except (ValueError, TypeError) as e:
+            report.add_error(line_no, str(e))
+            continue
+        report.valid += 1
+        yield [line_no] + row
+
+
+def _copy_text(value) -> str:
+    """Encode one value in COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        value = value.isoformat(sep=" ")
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class _CopySource:
+    """File-like object that feeds validated rows to COPY FROM.
+
+    Rows are pulled from the validating generator only as COPY asks for more
+    data, so the input file is never held in memory.
+    """
+
+    def __init__(self, rows: Iterator[List[Any]]):
+        self.rows = rows
+        self.buffer = b""
+        self.exhausted = False
+
+    def read(self, size: int = 65536) -> bytes:
+        while not self.exhausted and len(self.buffer) < size:
+            try:
+                row = next(self.rows)
+            except StopIteration:
+                self.exhausted = True
+                break
+            self.buffer += ("\t".join(_copy_text(v) for v in row) + "\n").encode("utf-8")
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def _load_staging(cursor, staging: str, like_table: str, columns: List[str], rows: Iterator[List[Any]]):
+    cursor.execute(
+        f"CREATE TEMP TABLE {staging} (line_no INTEGER, LIKE {like_table} INCLUDING DEFAULTS) ON COMMIT DROP"
+    )
+    cursor.execute(f"ALTER TABLE {staging} ADD COLUMN inserted BOOLEAN DEFAULT FALSE")
+    cursor.copy_expert(
+        f"COPY {staging} (line_no, {', '.join(columns)}) FROM STDIN",
+        _CopySource(rows)
+    )
+
+
+def _reject_unknown_branches(cursor, staging: str, branch_columns: List[str], report: ImportReport):
+    conditions = " OR ".join(
+        f"({column} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM branches b WHERE b.id = s.{column}))"
+        for column in branch_columns
+    )
+    cursor.execute(f"DELETE FROM {staging} s WHERE {conditions} RETURNING line_no")
+    for (line_no,) in cursor.fetchall():
+        report.valid -= 1
+        report.add_error(line_no, "Branch not found")
+
+
+def _reject_duplicate_ids(cursor, staging: str, report: ImportReport):
+    """Keep the first row of each id in the file; the repeats would be counted twice by the merge"""
+    cursor.execute(f"""
+        DELETE FROM {staging} s
+        USING (
+            SELECT line_no, id, MIN(line_no) OVER (PARTITION BY id) AS first_line,
+                   ROW_NUMBER() OVER (PARTITION BY id ORDER BY line_no) AS occurrence
+            FROM {staging}
+        ) d
+        WHERE s.line_no = d.line_no AND d.occurrence > 1
+        RETURNING d.line_no, d.id, d.first_line
+    """)
+    for line_no, transaction_id, first_line in sorted(cursor.fetchall()):
+        report.valid -= 1
+        report.add_error(line_no, f"Duplicate id {transaction_id} (first on line {first_line})")
+
+
+def _merge_transactions(cursor, apply_balances: bool, report: ImportReport) -> List[int]:
+    staging = "import_transactions"
+    # Legacy employee ids that do not exist here are dropped rather than failing the batch
+    cursor.execute(f"""
+        UPDATE {staging} s SET employee_id = NULL
+        WHERE employee_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = s.employee_id)
+    """)
+    columns = ", ".join(TRANSACTION_COLUMNS)
+    cursor.execute(f"""
+        WITH ins AS (
+            INSERT INTO transactions ({columns})
+            SELECT {columns} FROM {staging}
+            ON CONFLICT (id) DO NOTHING
+            RETURNING id
+        )
+        UPDATE {staging} s SET inserted = TRUE FROM ins WHERE s.id = ins.id
+    """)
+    report.inserted = cursor.rowcount
+    report.skipped_existing = report.valid - report.inserted
+    # Give the new rows change sequence numbers so change feed clients pick them up
+    for statement in stamp_sql("postgresql"):
+        cursor.execute(statement)
+    # Recompute the report rollup for the days that received rows
+    for statement in rebuild_statements(f"day IN (SELECT DISTINCT DATE(date) FROM {staging} WHERE inserted)"):
+        cursor.execute(statement)
+
+    # Profit records for completed transfers, same split as record_branch_profit
+    cursor.execute(f"""
+        INSERT INTO branch_profits (branch_id, transaction_id, profit_amount, currency, source_type, date)
+        SELECT branch_id, id, benefited_amount - benefited_amount * tax_rate / 100, currency, 'benefited_amount', date
+        FROM {staging}
+        WHERE inserted AND status = {COMPLETED_CODE} AND benefited_amount - benefited_amount * tax_rate / 100 > 0
+        UNION ALL
+        SELECT branch_id, id, benefited_amount * tax_rate / 100, currency, 'tax', date
+        FROM {staging}
+        WHERE inserted AND status = {COMPLETED_CODE} AND benefited_amount * tax_rate / 100 > 0
+    """)
+
+    if apply_balances:
+        # Net effect of all imported transfers on each branch, applied once
+        cursor.execute(f"""
+            UPDATE branches b SET
+                allocated_amount_syp = b.allocated_amount_syp + d.delta_syp,
+                allocated_amount_usd = b.allocated_amount_usd + d.delta_usd,
+                allocated_amount = b.allocated_amount_syp + d.delta_syp
+            FROM (
+                SELECT branch_id,
+                       SUM(CASE WHEN currency = {USD_CODE} THEN 0 ELSE amount END) AS delta_syp,
+                       SUM(CASE WHEN currency = {USD_CODE} THEN amount ELSE 0 END) AS delta_usd
+                FROM (
+                    SELECT branch_id, currency, -amount AS amount FROM {staging}
+                    WHERE inserted AND status NOT IN ({VOID_STATUS_CODES}) AND branch_id IS NOT NULL AND branch_id <> 0
+                    UNION ALL
+                    SELECT destination_branch_id, currency, amount FROM {staging}
+                    WHERE inserted AND status NOT IN ({VOID_STATUS_CODES})
+                ) movements
+                GROUP BY branch_id
+            ) d
+            WHERE b.id = d.branch_id
+        """)
+
+    cursor.execute(f"""
+        SELECT branch_id FROM {staging} WHERE inserted AND branch_id IS NOT NULL
+        UNION
+        SELECT destination_branch_id FROM {staging} WHERE inserted
+    """)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _merge_funds(cursor, report: ImportReport) -> List[int]:
+    staging = "import_branch_funds"
+    columns = ", ".join(FUND_COLUMNS)
+    cursor.execute(f"INSERT INTO branch_funds ({columns}) SELECT {columns} FROM {staging}")
+    report.inserted = cursor.rowcount
+    for statement in rebuild_statements(f"day IN (SELECT DISTINCT DATE(created_at) FROM {staging})"):
+        cursor.execute(statement)
+    cursor.execute(f"SELECT DISTINCT branch_id FROM {staging}")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def run_import(
+    engine,
+    stream: TextIO,
+    kind: str = "transactions",
+    file_format: str = "csv",
+    apply_balances: bool = True,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """Import a CSV/NDJSON stream of transfers or fund history in one transaction.
+
+    Fund history rows are audit records only and never change balances;
+    ``apply_balances`` controls whether imported transfers move branch
+    balances the way ``save_to_db`` would.
+    """
+    report = ImportReport()
+    records = read_records(stream, file_format)
+    if kind == "transactions":
+        rows = _valid_rows(records, validate_transaction, report)
+    elif kind == "funds":
+        rows = _valid_rows(records, validate_fund, report)
+    else:
+        raise ValueError(f"Unknown import kind: {kind}")
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if kind == "transactions":
+            _load_staging(cursor, "import_transactions", "transactions", TRANSACTION_COLUMNS, rows)
+            _reject_duplicate_ids(cursor, "import_transactions", report)
+            _reject_unknown_branches(cursor, "import_transactions", ["branch_id", "destination_branch_id"], report)
+            affected_branches = _merge_transactions(cursor, apply_balances, report)
+        else:
+            _load_staging(cursor, "import_branch_funds", "branch_funds", FUND_COLUMNS, rows)
+            _reject_unknown_branches(cursor, "import_branch_funds", ["branch_id"], report)
+            affected_branches = _merge_funds(cursor, report)
+
+        for table in ("transactions", "branch_profits", "branches", "branch_funds"):
+            cursor.execute(f"ANALYZE {table}")
+
+        if dry_run:
+            raw.rollback()
+        else:
+            raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    result = report.as_dict()
+    result["dry_run"] = dry_run
+    result["affected_branches"] = sorted(b for b in affected_branches if b is not None)
+    logger.info(f"Bulk import of {kind}: {report.inserted} inserted, {report.error_count} rejected")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import legacy transfers or fund history")
+    parser.add_argument("kind", choices=["transactions", "funds"])
+    parser.add_argument("path")
+    parser.add_argument("--format", dest="file_format", choices=["csv", "ndjson"])
+    parser.add_argument("--no-balances", action="store_true", help="do not adjust branch balances")
+    parser.add_argument("--dry-run", action="store_true", help="validate and merge, then roll back")
+    args = parser.parse_args()
+
+    from database import get_engine
+
+    with get_engine().connect() as conn:
+        codes.load_extras(conn)
+    file_format = args.file_format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    with open(args.path, "r", encoding="utf-8-sig", newline="") as stream:
+        result = run_import(
+            get_engine(),
+            stream,
+            kind=args.kind,
+            file_format=file_format,
+            apply_balances=not args.no_balances,
+            dry_run=args.dry_run
+        )
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,23 +14,42 @@ def default_serializer(obj):
 
 class Cache:
     def __init__(self, host=None, port=None, db=0):
+        # Use environment variables with fallback to default values
+        self.host = host or os.getenv('REDIS_HOST', 'localhost')
+        self.port = port or int(os.getenv('REDIS_PORT', 6379))
+        self.password = os.getenv('REDIS_PASSWORD', None)
+        self.db = db
+        self._client = None
+        self._connected = False
+
+    def connect(self):
+        """Create the Redis client; called on first use or from the app lifespan"""
+        if self._connected:
+            return self._client
+        self._connected = True
         try:
-            # Use environment variables with fallback to default values
-            redis_host = host or os.getenv('REDIS_HOST', 'localhost')
-            redis_port = port or int(os.getenv('REDIS_PORT', 6379))
-            redis_password = os.getenv('REDIS_PASSWORD', None)
-            
-            self.redis_client = redis.Redis(
-                host=redis_host,
-                port=redis_port,
-                password=redis_password,
-                db=db,
+            self._client = redis.Redis(
+                host=self.host,
+                port=self.port,
+                password=self.password,
+                db=self.db,
                 decode_responses=True
             )
-            logger.info(f"Successfully connected to Redis at {redis_host}:{redis_port}")
+            logger.info(f"Redis client configured for {self.host}:{self.port}")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {str(e)}")
-            self.redis_client = None
+            self._client = None
+        return self._client
+
+    @property
+    def redis_client(self):
+        return self.connect()
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+        self._client = None
+        self._connected = False
 
     def set(self, key: str, value: Any, expire: int = 3600) -> bool:
         """Store data in cache with expiration time in seconds"""
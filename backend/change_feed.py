@@ -0,0 +1,247 @@
+"""Change sequence for transactions, behind GET /transactions/changes/.
+
+Every insert, update or delete of a ``Transaction`` flushed through the ORM
+takes new numbers and stores them in ``change_seq`` (deletes leave a
+``TransactionTombstone`` carrying the number instead). Writers that bypass
+the ORM (bulk import, benchmark seeding) run ``stamp_sql`` before committing.
+
+On PostgreSQL the numbers come from the ``transaction_change_seq`` sequence,
+so writers never wait on each other. Numbers are taken at flush but become
+visible at commit, so the feed only serves up to a horizon below which no
+transaction still in flight holds a number. Each writer publishes a lower
+bound of its numbers as a shared transaction-level advisory lock, which
+every session can see in ``pg_locks`` and which goes away with the commit or
+rollback; ``current_seq`` is the last number handed out, capped below the
+smallest such bound. The horizon must be read on the primary.
+
+On SQLite, where writes are serialized anyway, the numbers come from the
+``transactions`` row of ``change_counters``, which stays locked until the
+writer commits; there the counter itself is the horizon.
+
+Changes to branches and users take a number too (without a row of their own
+in the feed), so the horizon is a cheap version of everything the polled
+list endpoints return; see etags.py.
+"""
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from models import Branch, Transaction, TransactionTombstone, User
+
+COUNTER = "transactions"
+SEQUENCE = "transaction_change_seq"
+
+# Other models whose changes move the counter (one number per flush)
+VERSIONED_MODELS = (Branch, User)
+
+ENSURE_COUNTER_SQL = f"""
+    INSERT INTO change_counters (name, value)
+    SELECT '{COUNTER}', 0
+    WHERE NOT EXISTS (SELECT 1 FROM change_counters WHERE name = '{COUNTER}')
+"""
+
+# Last number the sequence handed out (0 before the first)
+LAST_ISSUED_SQL = f"SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM {SEQUENCE}"
+
+# Lower bound of the numbers this transaction is about to take, visible to
+# every session until it ends (shared, so writers never block each other)
+ANNOUNCE_SQL = f"SELECT pg_advisory_xact_lock_shared(({LAST_ISSUED_SQL}) + 1)"
+
+# Smallest bound announced by a transaction still in flight
+IN_FLIGHT_FLOOR_SQL = """
+    SELECT MIN((classid::bigint << 32) | objid::bigint) FROM pg_locks
+    WHERE locktype = 'advisory' AND objsubid = 1 AND mode = 'ShareLock'
+      AND database = (SELECT oid FROM pg_database WHERE datname = current_database())
+"""
+
+# Move the sequence past every number handed out so far (the counter row,
+# stored rows and tombstones), so client cursors stay valid. Run by migration
+# 9 and after a restore, which loads rows the sequence has never seen.
+SYNC_SEQUENCE_SQL = f"""
+    SELECT setval('{SEQUENCE}', GREATEST(last, 1), last > 0)
+    FROM (
+        SELECT GREATEST(
+            COALESCE((SELECT value FROM change_counters WHERE name = '{COUNTER}'), 0),
+            COALESCE((SELECT MAX(change_seq) FROM transactions), 0),
+            COALESCE((SELECT MAX(change_seq) FROM transaction_tombstones), 0)
+        ) AS last
+    ) AS issued
+"""
+
+# Number rows that have no change_seq yet (oldest first), then move the
+# counter past them. Plain SQL without bind parameters so it runs through
+# SQLAlchemy and raw DB-API cursors alike (SQLite 3.33+ for UPDATE ... FROM).
+# Used on SQLite, and by migration 4 on PostgreSQL before the sequence exists.
+COUNTER_STAMP_SQL = [
+    ENSURE_COUNTER_SQL,
+    # Take the counter row lock first so concurrent ORM writers wait for us
+    f"UPDATE change_counters SET value = value WHERE name = '{COUNTER}'",
+    f"""
+    UPDATE transactions
+    SET change_seq = numbered.seq + (SELECT value FROM change_counters WHERE name = '{COUNTER}'),
+        updated_at = COALESCE(transactions.updated_at, transactions.date)
+    FROM (
+        SELECT id, ROW_NUMBER() OVER (ORDER BY date, id) AS seq
+        FROM transactions WHERE change_seq IS NULL
+    ) AS numbered
+    WHERE transactions.id = numbered.id
+    """,
+    f"""
+    UPDATE change_counters
+    SET value = COALESCE(
+        (SELECT MAX(change_seq) FROM transactions WHERE change_seq > change_counters.value), value
+    )
+    WHERE name = '{COUNTER}'
+    """,
+]
+
+# The same from the sequence on PostgreSQL
+SEQUENCE_STAMP_SQL = [
+    ANNOUNCE_SQL,
+    f"""
+    UPDATE transactions
+    SET change_seq = numbered.seq,
+        updated_at = COALESCE(transactions.updated_at, transactions.date)
+    FROM (
+        SELECT id, nextval('{SEQUENCE}') AS seq
+        FROM (SELECT id FROM transactions WHERE change_seq IS NULL ORDER BY date, id) AS oldest_first
+    ) AS numbered
+    WHERE transactions.id = numbered.id
+    """,
+]
+
+
+def _is_postgres(bind) -> bool:
+    dialect = bind.dialect if hasattr(bind, "dialect") else bind.get_bind().dialect
+    return dialect.name == "postgresql"
+
+
+def stamp_sql(dialect_name: str) -> List[str]:
+    return SEQUENCE_STAMP_SQL if dialect_name == "postgresql" else COUNTER_STAMP_SQL
+
+
+def stamp_unsequenced(conn) -> None:
+    """Number unsequenced rows; ``conn`` is a Connection or a Session"""
+    for statement in stamp_sql("postgresql" if _is_postgres(conn) else "sqlite"):
+        conn.execute(text(statement))
+
+
+def reserve(session: Session, count: int) -> List[int]:
+    """Take ``count`` new change numbers for this transaction"""
+    if _is_postgres(session):
+        session.execute(text(ANNOUNCE_SQL))
+        rows = session.execute(text(f"SELECT nextval('{SEQUENCE}') FROM generate_series(1, :n)"), {"n": count})
+        return [row[0] for row in rows]
+    params = {"n": count, "name": COUNTER}
+    result = session.execute(
+        text("UPDATE change_counters SET value = value + :n WHERE name = :name"), params
+    )
+    if result.rowcount == 0:
+        session.execute(text(ENSURE_COUNTER_SQL))
+        session.execute(text("UPDATE change_counters SET value = value + :n WHERE name = :name"), params)
+    last = current_seq(session)
+    return list(range(last - count + 1, last + 1))
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_transaction_changes(session: Session, flush_context, instances) -> None:
+    changed = [obj for obj in session.new if isinstance(obj, Transaction)]
+    changed += [
+        obj for obj in session.dirty
+        if isinstance(obj, Transaction) and session.is_modified(obj, include_collections=False)
+    ]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Transaction)]
+    if not changed and not deleted:
+        if _versioned_changes(session):
+            reserve(session, 1)
+        return
+
+    numbers = iter(reserve(session, len(changed) + len(deleted)))
+    now = datetime.now()
+    for transaction in changed:
+        transaction.change_seq = next(numbers)
+        transaction.updated_at = now
+    for transaction in deleted:
+        session.merge(TransactionTombstone(
+            transaction_id=transaction.id,
+            branch_id=transaction.branch_id,
+            destination_branch_id=transaction.destination_branch_id,
+            employee_id=transaction.employee_id,
+            change_seq=next(numbers),
+            deleted_at=now
+        ))
+
+
+def _versioned_changes(session: Session) -> bool:
+    return any(isinstance(obj, VERSIONED_MODELS) for obj in session.new) or \
+        any(isinstance(obj, VERSIONED_MODELS) for obj in session.deleted) or \
+        any(
+            isinstance(obj, VERSIONED_MODELS) and session.is_modified(obj, include_collections=False)
+            for obj in session.dirty
+        )
+
+
+def scope_filter(columns, current_user: Dict[str, Any]):
+    """Row filter matching what GET /transactions/ lets this user see, or None for directors.
+
+    ``columns`` is the mapped class (Transaction or TransactionTombstone).
+    """
+    if current_user["role"] == "employee":
+        return (columns.employee_id == current_user["user_id"]) | \
+               (columns.destination_branch_id == current_user["branch_id"])
+    if current_user["role"] == "branch_manager":
+        return (columns.branch_id == current_user["branch_id"]) | \
+               (columns.destination_branch_id == current_user["branch_id"])
+    return None
+
+
+def fetch_changes(db: Session, current_user: Dict[str, Any], since: int, limit: int,
+                  changed_since=None) -> Dict[str, Any]:
+    """One page of the feed: changed rows and tombstones after ``since``, in sequence order.
+
+    ``changed_since`` (a datetime) limits the first page of a fresh client to
+    recently changed rows instead of the whole history.
+    """
+    # Read before the rows: nothing at or below it can still be committed later
+    horizon = current_seq(db)
+    tx_query = db.query(Transaction).filter(Transaction.change_seq > since, Transaction.change_seq <= horizon)
+    tomb_query = db.query(TransactionTombstone).filter(
+        TransactionTombstone.change_seq > since, TransactionTombstone.change_seq <= horizon
+    )
+    if scope_filter(Transaction, current_user) is not None:
+        tx_query = tx_query.filter(scope_filter(Transaction, current_user))
+        tomb_query = tomb_query.filter(scope_filter(TransactionTombstone, current_user))
+    if changed_since is not None:
+        tx_query = tx_query.filter(Transaction.updated_at >= changed_since)
+        tomb_query = tomb_query.filter(TransactionTombstone.deleted_at >= changed_since)
+
+    # Fetch one extra of each to know whether another page follows
+    rows: List[Any] = tx_query.order_by(Transaction.change_seq).limit(limit + 1).all()
+    rows += tomb_query.order_by(TransactionTombstone.change_seq).limit(limit + 1).all()
+    rows.sort(key=lambda row: row.change_seq)
+    page, has_more = rows[:limit], len(rows) > limit
+
+    return {
+        "changes": [row for row in page if isinstance(row, Transaction)],
+        "deleted": [
+            {"id": row.transaction_id, "change_seq": row.change_seq, "deleted_at": row.deleted_at}
+            for row in page if isinstance(row, TransactionTombstone)
+        ],
+        "cursor": page[-1].change_seq if page else since,
+        "has_more": has_more,
+        # A cursor above this came from another database (e.g. before a restore): start over
+        "latest": horizon,
+    }
+
+
+def current_seq(db: Session) -> int:
+    """Highest number below which every change is committed (or rolled back)"""
+    if _is_postgres(db):
+        # Last issued first: a number at or below it was announced before it was taken
+        last_issued = db.execute(text(LAST_ISSUED_SQL)).scalar() or 0
+        floor = db.execute(text(IN_FLIGHT_FLOOR_SQL)).scalar()
+        return last_issued if floor is None else min(last_issued, floor - 1)
+    value = db.execute(text("SELECT value FROM change_counters WHERE name = :name"), {"name": COUNTER}).scalar()
+    return value or 0
@@ -0,0 +1,169 @@
+"""Query plan regression check for the hot endpoints.
+
+Seeds a local database with the benchmark dataset (branches, users and
+historical transfers), then EXPLAINs the query shape behind each hot
+endpoint and fails when any of them reads a large table with a sequential
+scan. On PostgreSQL sequential scans are disabled for the check, so a seq
+scan in the plan means no index can serve the query at all; on SQLite a
+bare ``SCAN <table>`` (one without ``USING INDEX``) is a failure. Run it in
+CI or after touching indexes or these queries:
+
+    python check_query_plans.py [--database-url sqlite:///plans.db] [--transactions 50000]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+# Tables whose full scans grow with traffic
+LARGE_TABLES = {
+    "transactions", "transaction_tombstones", "branch_funds", "branch_profits", "notifications",
+    "branch_daily_totals",
+}
+
+# (name, endpoint, SQL) for the shape each hot endpoint sends; keep in step with server_improved.py
+HOT_QUERIES = [
+    ("manager_list", "GET /transactions/ (branch manager)",
+     "SELECT * FROM transactions WHERE (branch_id = :branch_id OR destination_branch_id = :branch_id) "
+     "ORDER BY date DESC LIMIT 20"),
+    ("manager_count", "GET /transactions/ total (branch manager)",
+     "SELECT COUNT(*) FROM transactions WHERE (branch_id = :branch_id OR destination_branch_id = :branch_id)"),
+    ("employee_list", "GET /transactions/ (employee)",
+     "SELECT * FROM transactions WHERE (employee_id = :employee_id OR destination_branch_id = :branch_id) "
+     "ORDER BY date DESC LIMIT 20"),
+    ("receive_tab", "GET /transactions/?destination_branch_id=",
+     "SELECT * FROM transactions WHERE destination_branch_id = :branch_id ORDER BY date DESC LIMIT 20"),
+    ("pending_queue", "GET /transactions/?status=processing (director)",
+     "SELECT * FROM transactions WHERE status = :processing ORDER BY date DESC LIMIT 20"),
+    ("branch_pending_queue", "GET /transactions/?status=processing (branch manager)",
+     "SELECT * FROM transactions WHERE status = :processing "
+     "AND (branch_id = :branch_id OR destination_branch_id = :branch_id) ORDER BY date DESC LIMIT 20"),
+    ("change_feed_employee", "GET /transactions/changes/ (employee)",
+     "SELECT * FROM transactions WHERE change_seq > :since "
+     "AND (employee_id = :employee_id OR destination_branch_id = :branch_id) ORDER BY change_seq LIMIT 501"),
+    ("branch_profits", "GET /api/branches/{id}/profits/",
+     "SELECT * FROM transactions WHERE branch_id = :branch_id AND status = :completed AND date >= :start"),
+    ("tax_summary_list", "GET /api/transactions/tax_summary/",
+     "SELECT * FROM transactions WHERE date BETWEEN :start AND :end AND status = :completed"),
+    ("tax_summary_received", "GET /api/transactions/tax_summary/ totals (branch)",
+     "SELECT branch_id, currency, COUNT(*), SUM(amount) FROM transactions "
+     "WHERE destination_branch_id = :branch_id AND branch_id != :branch_id "
+     "AND date BETWEEN :start AND :end AND status = :completed GROUP BY branch_id, currency"),
+    ("idempotency_lookup", "POST /transactions/ (Idempotency-Key)",
+     "SELECT id FROM transactions WHERE idempotency_key = :key"),
+    ("fund_history", "GET /branches/{id}/funds-history",
+     "SELECT * FROM branch_funds WHERE branch_id = :branch_id ORDER BY created_at DESC"),
+    ("profit_cleanup", "POST /update-transaction-status/ (cancel)",
+     "SELECT id FROM branch_profits WHERE transaction_id = :key"),
+    ("report_rollup", "GET /reports/{type}/",
+     "SELECT day, currency, SUM(amount) FROM branch_daily_totals "
+     "WHERE direction = 'outgoing' AND day BETWEEN :start_day AND :end_day GROUP BY day, currency"),
+    ("notifications_due", "notification dispatcher",
+     "SELECT * FROM notifications WHERE status = 'pending' AND next_attempt_at <= :end LIMIT 50"),
+]
+
+
+def plan_scans_sqlite(conn, sql, params):
+    """Plan lines and the large tables SQLite reads without an index"""
+    from sqlalchemy import text
+
+    lines = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)]
+    scans = [m.group(1) for m in (re.match(r"SCAN (\w+)$", line) for line in lines) if m]
+    return lines, [table for table in scans if table in LARGE_TABLES]
+
+
+def plan_scans_postgres(conn, sql, params):
+    """Plan node summaries and the large tables PostgreSQL still scans sequentially"""
+    from sqlalchemy import text
+
+    conn.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    lines, scans = [], []
+
+    def walk(node):
+        relation = node.get("Relation Name")
+        index = node.get("Index Name")
+        lines.append(" ".join(part for part in (node["Node Type"], relation, index) if part))
+        if node["Node Type"] == "Seq Scan" and relation in LARGE_TABLES:
+            scans.append(relation)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return lines, scans
+
+
+def sample_params(conn):
+    from sqlalchemy import text
+
+    import codes
+
+    row = conn.execute(text(
+        "SELECT branch_id, employee_id FROM transactions WHERE employee_id IS NOT NULL LIMIT 1"
+    )).first()
+    if row is None:
+        raise RuntimeError("The database has no transactions to plan against; seed it first")
+    now = datetime.now()
+    return {
+        "branch_id": row[0],
+        "employee_id": row[1],
+        "processing": codes.STATUS.code("processing"),
+        "completed": codes.STATUS.code("completed"),
+        "since": 0,
+        "key": "plan-check",
+        "start": now - timedelta(days=30),
+        "end": now,
+        "start_day": (now - timedelta(days=30)).date(),
+        "end_day": now.date(),
+    }
+
+
+def check_plans(engine):
+    results = []
+    explain = plan_scans_postgres if engine.dialect.name == "postgresql" else plan_scans_sqlite
+    with engine.connect() as conn:
+        params = sample_params(conn)
+    with engine.connect() as conn:
+        for name, endpoint, sql in HOT_QUERIES:
+            with conn.begin():
+                wanted = {key: value for key, value in params.items() if f":{key}" in sql}
+                lines, scans = explain(conn, sql, wanted)
+            results.append({"query": name, "endpoint": endpoint, "ok": not scans, "seq_scans": scans, "plan": lines})
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("PLAN_CHECK_DATABASE_URL", "sqlite:///plans.db"),
+                        help="database to seed and check (use a dedicated one; default: local SQLite file)")
+    parser.add_argument("--branches", type=int, default=10)
+    parser.add_argument("--transactions", type=int, default=50_000, help="historical transfers to seed")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    # Must be set before the application modules are imported
+    os.environ["DATABASE_URL"] = args.database_url
+
+    import database
+    import migrations
+    from bench.dataset import seed
+
+    engine = database.get_engine()
+    migrations.upgrade(engine)
+    seed(database.SessionLocal, branches=args.branches, transactions=args.transactions, random_seed=args.seed)
+
+    results = check_plans(engine)
+    print(json.dumps({"database": engine.dialect.name, "results": results}, indent=2, ensure_ascii=False))
+    failures = [result for result in results if not result["ok"]]
+    for result in failures:
+        print(f"FAIL: {result['query']} ({result['endpoint']}) scans {', '.join(result['seq_scans'])}",
+              file=sys.stderr)
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
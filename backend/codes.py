@@ -0,0 +1,163 @@
+"""Small-integer codes for currency, transfer status and governorate.
+
+These columns hold a SMALLINT code instead of repeated text; the API still
+speaks strings. ``Coded`` columns translate in both directions, so ORM code
+keeps comparing and assigning names (``Transaction.status == "completed"``).
+Spelling variants are normalized on the way in ("ليرة سورية" is stored as
+SYP). The lookup tables (``currencies``, ``transaction_statuses``,
+``governorates``) mirror the seeds below for raw SQL and reporting tools;
+values found in old data that are not seeds were added there by the
+migration with codes from ``EXTRA_CODE_START`` and are read back with
+``load_extras``.
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import SmallInteger, text
+from sqlalchemy.types import TypeDecorator
+
+EXTRA_CODE_START = 100
+
+
+class Lookup:
+    """Code <-> name table for one kind of value"""
+
+    def __init__(self, table: str, seeds: Dict[int, str], aliases: Optional[Dict[str, str]] = None,
+                 strip_prefixes=()):
+        self.table = table
+        self.seeds = dict(seeds)
+        self._names = dict(seeds)
+        self._codes = {name: code for code, name in seeds.items()}
+        self._aliases = {_fold(alias): name for alias, name in (aliases or {}).items()}
+        self._aliases.update({_fold(name): name for name in seeds.values()})
+        self._strip_prefixes = strip_prefixes
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._names.values())
+
+    def add(self, code: int, name: str) -> None:
+        self._names[code] = name
+        self._codes[name] = code
+        self._aliases.setdefault(_fold(name), name)
+
+    def normalize(self, value: str) -> str:
+        """Canonical name for ``value``; ValueError when it is not known"""
+        folded = _fold(value)
+        for prefix in self._strip_prefixes:
+            if folded.startswith(prefix):
+                folded = folded[len(prefix):].strip()
+        try:
+            return self._aliases[folded]
+        except KeyError:
+            raise ValueError(f"قيمة غير معروفة '{value}'. القيم المسموحة: {', '.join(self.names)}")
+
+    def find(self, value: str) -> Optional[str]:
+        try:
+            return self.normalize(value)
+        except ValueError:
+            return None
+
+    def code(self, value: str) -> int:
+        return self._codes[self.normalize(value)]
+
+    def has_code(self, code: int) -> bool:
+        return code in self._names
+
+    def name(self, code: int) -> str:
+        return self._names.get(code, str(code))
+
+    def matching(self, fragment: str) -> List[int]:
+        """Codes of every name containing ``fragment`` (case-insensitive), for search filters"""
+        folded = _fold(fragment)
+        return [code for code, name in self._names.items() if folded in _fold(name)]
+
+
+def _fold(value: str) -> str:
+    return " ".join(str(value).split()).casefold()
+
+
+CURRENCY = Lookup("currencies", {1: "SYP", 2: "USD"}, aliases={
+    "ليرة سورية": "SYP", "ليرة سورية (SYP)": "SYP", "ل.س": "SYP",
+    "دولار أمريكي": "USD", "دولار أمريكي (USD)": "USD", "دولار": "USD", "$": "USD",
+})
+
+STATUS = Lookup("transaction_statuses", {
+    1: "pending", 2: "processing", 3: "completed", 4: "cancelled", 5: "rejected", 6: "on_hold",
+})
+
+GOVERNORATE = Lookup("governorates", {
+    1: "دمشق", 2: "ريف دمشق", 3: "حلب", 4: "حمص", 5: "حماة", 6: "اللاذقية", 7: "طرطوس",
+    8: "الرقة", 9: "دير الزور", 10: "الحسكة", 11: "إدلب", 12: "درعا", 13: "السويداء",
+    14: "القنيطرة", 15: "المركزية", 16: "رئيسي",
+}, aliases={
+    "حماه": "حماة", "ادلب": "إدلب", "اللادقية": "اللاذقية", "ديرالزور": "دير الزور",
+    "Damascus": "دمشق", "Rif Dimashq": "ريف دمشق", "Aleppo": "حلب", "Homs": "حمص", "Hama": "حماة",
+    "Latakia": "اللاذقية", "Tartus": "طرطوس", "Raqqa": "الرقة", "Deir ez-Zor": "دير الزور",
+    "Hasakah": "الحسكة", "Idlib": "إدلب", "Daraa": "درعا", "As-Suwayda": "السويداء",
+    "Quneitra": "القنيطرة",
+}, strip_prefixes=("محافظة ",))
+
+LOOKUPS = {"currency": CURRENCY, "status": STATUS, "governorate": GOVERNORATE}
+
+
+class Coded(TypeDecorator):
+    """SMALLINT column exposed as the lookup's names"""
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, kind: str):
+        super().__init__()
+        self.kind = kind
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        return LOOKUPS[self.kind].code(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        # SQLite databases converted in place keep the code in a TEXT column
+        return LOOKUPS[self.kind].name(int(value))
+
+
+def seed_lookups(conn) -> None:
+    """Create the lookup rows for the seeds (idempotent)"""
+    for lookup in LOOKUPS.values():
+        for code, name in lookup.seeds.items():
+            conn.execute(
+                text(f"INSERT INTO {lookup.table} (id, name) SELECT :id, :name "
+                     f"WHERE NOT EXISTS (SELECT 1 FROM {lookup.table} WHERE id = :id)"),
+                {"id": code, "name": name}
+            )
+
+
+def load_extras(conn) -> None:
+    """Register lookup rows beyond the seeds (values kept from old data)"""
+    for lookup in LOOKUPS.values():
+        rows = conn.execute(
+            text(f"SELECT id, name FROM {lookup.table} WHERE id >= :start"), {"start": EXTRA_CODE_START}
+        )
+        for code, name in rows:
+            lookup.add(code, name)
+
+
+def register_extra(conn, lookup: Lookup, name: str) -> int:
+    """Keep a value found in old data that is not a seed; returns its code"""
+    code = conn.execute(
+        text(f"SELECT COALESCE(MAX(id) + 1, :start) FROM {lookup.table} WHERE id >= :start"),
+        {"start": EXTRA_CODE_START}
+    ).scalar()
+    conn.execute(text(f"INSERT INTO {lookup.table} (id, name) VALUES (:id, :name)"), {"id": code, "name": name})
+    lookup.add(code, name)
+    return code
+
+
+def code_case(column: str, mapping: Dict[str, int]) -> str:
+    """SQL CASE turning the text values in ``column`` into codes"""
+    if not mapping:
+        return "NULL"
+    branches = " ".join(
+        f"WHEN {column} = '{value.replace(chr(39), chr(39) * 2)}' THEN {code}" for value, code in mapping.items()
+    )
+    return f"CASE {branches} ELSE NULL END"
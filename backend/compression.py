@@ -0,0 +1,96 @@
+"""Response compression for the JSON API.
+
+Brotli is used when the ``brotli`` package is installed and the client
+accepts it, gzip otherwise. Only complete bodies of at least
+``minimum_size`` bytes are compressed; streamed responses (server-sent
+events, backup downloads, exports) and responses that already carry a
+Content-Encoding are passed through untouched, so an event is never held
+back in a compressor buffer.
+"""
+import gzip
+import os
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """Best encoding we support that the client accepts, or "" for identity"""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return ""
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing single-message response bodies over a size threshold"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    @classmethod
+    def options_from_env(cls):
+        return {
+            "minimum_size": int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+            "gzip_level": int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+            "brotli_quality": int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+        }
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                # Later chunks of a response whose first chunk was already sent
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            if not (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or headers.get("content-type", "").startswith("text/event-stream")
+                or len(body) < self.minimum_size
+            ):
+                body = self.compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message = {**message, "body": body}
+            await send(start_message)
+            start_message = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
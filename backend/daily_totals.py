@@ -0,0 +1,227 @@
+"""Daily per-branch rollup (``branch_daily_totals``) behind the report endpoints.
+
+Every flush that inserts or changes a ``Transaction`` or inserts a
+``BranchFund`` adds the matching deltas to ``branch_daily_totals`` in the
+same database transaction, so reports read days x branches rows instead of
+scanning transfers. Writers that bypass the ORM (bulk import) run
+``rebuild_statements`` for the days they touched. A full or partial rebuild
+is available as
+
+    python daily_totals.py rebuild [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+import argparse
+import logging
+import sys
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+import codes
+from models import BranchDailyTotal, BranchFund, Transaction
+
+logger = logging.getLogger(__name__)
+
+OUTGOING = "outgoing"
+INCOMING = "incoming"
+FUND_STATUS = "posted"
+MEASURES = ("count", "amount", "benefited", "tax", "profit")
+
+# Attributes of a transfer that decide which rollup rows it counts in
+TRACKED = ("branch_id", "destination_branch_id", "date", "currency", "status",
+           "amount", "benefited_amount", "tax_amount")
+
+Key = Tuple[int, date, str, str, str]
+
+
+def _transfer_facts(values: Dict) -> List[Tuple[Key, Tuple[float, ...]]]:
+    """Rollup contributions of one transfer: its sending and its receiving side.
+
+    Profit goes to the sending branch: the benefited amount net of tax, or
+    all of it for System Manager transfers (same rule as the tax summary).
+    """
+    day = (values["date"] or datetime.now()).date()
+    currency = codes.CURRENCY.normalize(values["currency"] or "SYP")
+    status = codes.STATUS.normalize(values["status"] or "processing")
+    amount = values["amount"] or 0.0
+    benefited = values["benefited_amount"] or 0.0
+    tax = values["tax_amount"] or 0.0
+    branch_id = values["branch_id"] or 0
+    profit = benefited if branch_id == 0 else benefited - tax
+    return [
+        ((branch_id, day, currency, OUTGOING, status), (1, amount, benefited, tax, profit)),
+        ((values["destination_branch_id"] or 0, day, currency, INCOMING, status), (1, amount, benefited, tax, 0.0)),
+    ]
+
+
+def _old_values(transaction: Transaction) -> Optional[Dict]:
+    """Values before this flush, or None when no tracked attribute changed"""
+    old, changed = {}, False
+    for name in TRACKED:
+        history = get_history(transaction, name)
+        if history.deleted:
+            old[name] = history.deleted[0]
+            changed = True
+        else:
+            old[name] = getattr(transaction, name)
+    return old if changed else None
+
+
+def collect_deltas(session: Session) -> Dict[Key, List[float]]:
+    deltas: Dict[Key, List[float]] = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0])
+
+    def add(facts, sign):
+        for key, measures in facts:
+            for i, value in enumerate(measures):
+                deltas[key][i] += sign * value
+
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            add(_transfer_facts({name: getattr(obj, name) for name in TRACKED}), 1)
+        elif isinstance(obj, BranchFund):
+            day = (obj.created_at or datetime.now()).date()
+            key = (obj.branch_id or 0, day, codes.CURRENCY.normalize(obj.currency or "SYP"), obj.type or "allocation", FUND_STATUS)
+            add([(key, (1, obj.amount or 0.0, 0.0, 0.0, 0.0))], 1)
+    for obj in session.dirty:
+        if isinstance(obj, Transaction):
+            old = _old_values(obj)
+            if old is not None:
+                add(_transfer_facts(old), -1)
+                add(_transfer_facts({name: getattr(obj, name) for name in TRACKED}), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            add(_transfer_facts({name: getattr(obj, name) for name in TRACKED}), -1)
+    return {key: values for key, values in deltas.items() if any(values)}
+
+
+def apply_deltas(session: Session, deltas: Dict[Key, List[float]]) -> None:
+    """Upsert the deltas (INSERT ... ON CONFLICT DO UPDATE on PostgreSQL and SQLite)"""
+    if not deltas:
+        return
+    dialect = session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    table = BranchDailyTotal.__table__
+    rows = [
+        dict(zip(("branch_id", "day", "currency", "direction", "status") + MEASURES, key + tuple(values)))
+        for key, values in sorted(deltas.items())  # fixed order keeps concurrent writers from deadlocking
+    ]
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.branch_id, table.c.day, table.c.currency, table.c.direction, table.c.status],
+        set_={name: table.c[name] + statement.excluded[name] for name in MEASURES}
+    )
+    session.execute(statement, rows)
+
+
+@event.listens_for(Session, "before_flush")
+def _maintain_daily_totals(session: Session, flush_context, instances) -> None:
+    apply_deltas(session, collect_deltas(session))
+
+
+def rebuild_statements(day_condition: str = "1 = 1") -> List[str]:
+    """SQL that recomputes the rollup for the days matching ``day_condition``.
+
+    The condition is a predicate over ``day`` (it may use bind parameters);
+    it is applied to the rollup itself and to the source rows.
+    """
+    # Currency and status are stored as codes; the rollup keeps their names
+    transfer_source = """
+        SELECT {branch} AS branch_id, DATE(t.date) AS day, COALESCE(c.name, 'SYP') AS currency,
+               COALESCE(s.name, 'processing') AS status, COALESCE(t.amount, 0) AS amount,
+               COALESCE(t.benefited_amount, 0) AS benefited, COALESCE(t.tax_amount, 0) AS tax,
+               {profit} AS profit
+        FROM transactions t
+        LEFT JOIN currencies c ON c.id = t.currency
+        LEFT JOIN transaction_statuses s ON s.id = t.status
+    """
+    outgoing = transfer_source.format(
+        branch="COALESCE(t.branch_id, 0)",
+        profit="CASE WHEN COALESCE(t.branch_id, 0) = 0 THEN COALESCE(t.benefited_amount, 0) "
+               "ELSE COALESCE(t.benefited_amount, 0) - COALESCE(t.tax_amount, 0) END"
+    )
+    incoming = transfer_source.format(branch="COALESCE(t.destination_branch_id, 0)", profit="0")
+    columns = "branch_id, day, currency, direction, status, count, amount, benefited, tax, profit"
+    statements = [f"DELETE FROM branch_daily_totals WHERE {day_condition}"]
+    for direction, source in ((OUTGOING, outgoing), (INCOMING, incoming)):
+        statements.append(f"""
+            INSERT INTO branch_daily_totals ({columns})
+            SELECT branch_id, day, currency, '{direction}', status, COUNT(*), SUM(amount),
+                   SUM(benefited), SUM(tax), SUM(profit)
+            FROM ({source}) AS facts
+            WHERE {day_condition}
+            GROUP BY branch_id, day, currency, status
+        """)
+    statements.append(f"""
+        INSERT INTO branch_daily_totals ({columns})
+        SELECT branch_id, day, currency, direction, '{FUND_STATUS}', COUNT(*), SUM(amount), 0, 0, 0
+        FROM (
+            SELECT COALESCE(f.branch_id, 0) AS branch_id, DATE(f.created_at) AS day,
+                   COALESCE(c.name, 'SYP') AS currency, COALESCE(f.type, 'allocation') AS direction,
+                   COALESCE(f.amount, 0) AS amount
+            FROM branch_funds f
+            LEFT JOIN currencies c ON c.id = f.currency
+        ) AS facts
+        WHERE {day_condition}
+        GROUP BY branch_id, day, currency, direction
+    """)
+    return statements
+
+
+def rebuild(conn, start: Optional[date] = None, end: Optional[date] = None) -> None:
+    """Recompute the rollup from transactions and branch_funds (optionally for a day range)"""
+    conditions, params = [], {}
+    if start:
+        conditions.append("day >= :start")
+        params["start"] = start
+    if end:
+        conditions.append("day <= :end")
+        params["end"] = end
+    for statement in rebuild_statements(" AND ".join(conditions) or "1 = 1"):
+        conn.execute(text(statement), params)
+
+
+def query_totals(db: Session, group_by=(), start: Optional[date] = None, end: Optional[date] = None,
+                 directions=(OUTGOING,), statuses=None, branch_ids=None, currency: Optional[str] = None):
+    """Summed measures grouped by the given BranchDailyTotal columns"""
+    columns = [getattr(BranchDailyTotal, name) for name in group_by]
+    query = db.query(
+        *columns,
+        *(func.coalesce(func.sum(getattr(BranchDailyTotal, name)), 0).label(name) for name in MEASURES)
+    ).filter(BranchDailyTotal.direction.in_(directions))
+    if start:
+        query = query.filter(BranchDailyTotal.day >= start)
+    if end:
+        query = query.filter(BranchDailyTotal.day <= end)
+    if statuses:
+        query = query.filter(BranchDailyTotal.status.in_(statuses))
+    if branch_ids:
+        query = query.filter(BranchDailyTotal.branch_id.in_(branch_ids))
+    if currency:
+        query = query.filter(BranchDailyTotal.currency == currency)
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+    return query.all()
+
+
+def main(argv=None) -> int:
+    from database import get_engine
+
+    parser = argparse.ArgumentParser(description="Rebuild the branch_daily_totals rollup")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--start", type=date.fromisoformat, help="first day to rebuild (default: all)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day to rebuild (default: all)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    with get_engine().begin() as conn:
+        rebuild(conn, args.start, args.end)
+    print(f"Rebuilt branch_daily_totals for {args.start or 'the beginning'} .. {args.end or 'today'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
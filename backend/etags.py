@@ -0,0 +1,55 @@
+"""Conditional GET for the endpoints the desktop clients poll.
+
+An ETag is built from a version that is cheap to read (the change_feed
+horizon, which every committed transfer, branch or user change advances, or
+the time a snapshot was computed) plus everything else the
+response depends on: the path, the caller's scope and the query string.
+When the client's ``If-None-Match`` still matches, the endpoint answers 304
+before running its query.
+"""
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+# Clients may keep the body but must revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag over ``parts`` (equal parts give equal tags in every worker)"""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def request_etag(request: Request, current_user: Dict[str, Any], version: Any) -> str:
+    """ETag of this request's response at ``version``"""
+    scope = (current_user.get("role"), current_user.get("user_id"), current_user.get("branch_id"))
+    params = tuple(sorted(request.query_params.multi_items()))
+    return make_etag(request.url.path, version, scope, params)
+
+
+def matches(request: Request, etag: str) -> bool:
+    """Whether ``If-None-Match`` lists ``etag`` (weak comparison, as RFC 9110 requires for GET)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"})
+
+
+def conditional(request: Request, response: Response, etag: Optional[str]) -> Optional[Response]:
+    """The 304 to return when the client already has ``etag``; otherwise tag ``response`` and return None"""
+    if etag is None:
+        return None
+    if matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.headers["Vary"] = "Authorization"
+    return None
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Set
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "payment_system:events")
+
+# Event types pushed to clients
+TRANSFER_CREATED = "transfer_created"
+STATUS_CHANGED = "status_changed"
+BALANCE_CHANGED = "balance_changed"
+ALLOCATION_MADE = "allocation_made"
+RESYNC = "resync"
+
+
+class Subscription:
+    """One connected client with its own bounded event queue"""
+
+    def __init__(self, role: str, branch_id: Optional[int], queue_size: int):
+        self.role = role
+        self.branch_id = branch_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def can_see(self, event: Dict[str, Any]) -> bool:
+        if self.role == "director":
+            return True
+        return self.branch_id is not None and self.branch_id in event.get("branch_ids", [])
+
+    def offer(self, event: Dict[str, Any]):
+        """Queue an event without ever blocking the publisher.
+
+        A client that falls behind loses its backlog and gets a single
+        ``resync`` event instead, telling it to reconcile with a normal poll.
+        """
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({
+                "type": RESYNC,
+                "data": {"reason": "slow_consumer"},
+                "branch_ids": event.get("branch_ids", []),
+                "ts": datetime.now().isoformat()
+            })
+
+
+class EventBroker:
+    """Fan out domain events to the streaming clients of every worker.
+
+    Events are published on a Redis pub/sub channel; each worker runs one
+    listener thread that forwards them into its event loop, where they are
+    filtered per subscription by role and branch. Without Redis the broker
+    falls back to delivering inside the current process only.
+    """
+
+    def __init__(self, redis_client=None, channel: str = EVENTS_CHANNEL, queue_size: int = 100):
+        self.redis_client = redis_client
+        self.channel = channel
+        self.queue_size = queue_size
+        self.subscriptions: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop, redis_client=None):
+        self._loop = loop
+        if redis_client is not None:
+            self.redis_client = redis_client
+        if self.redis_client is None or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._listen, name="event-broker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def subscribe(self, current_user: dict) -> Subscription:
+        subscription = Subscription(current_user["role"], current_user.get("branch_id"), self.queue_size)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+
+    def publish(self, event_type: str, data: Dict[str, Any], branch_ids: List[Optional[int]],
+                ts: Optional[str] = None):
+        """Publish an event to every worker. Errors are logged, never raised.
+
+        ``ts`` is when the change happened (default: now).
+        """
+        event = {
+            "type": event_type,
+            "data": data,
+            "branch_ids": sorted({b for b in branch_ids if b is not None}),
+            "ts": ts or datetime.now().isoformat()
+        }
+        if self.redis_client is not None:
+            try:
+                self.redis_client.publish(self.channel, json.dumps(event, default=str))
+                return
+            except Exception as e:
+                logger.error(f"Event publish error: {str(e)}")
+        self._deliver_threadsafe(event)
+
+    def _deliver_threadsafe(self, event: Dict[str, Any]):
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._deliver, event)
+
+    def _deliver(self, event: Dict[str, Any]):
+        for subscription in list(self.subscriptions):
+            if subscription.can_see(event):
+                subscription.offer(event)
+
+    def _listen(self):
+        while not self._stop_event.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                while not self._stop_event.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._deliver_threadsafe(json.loads(message["data"]))
+            except Exception as e:
+                logger.error(f"Event listener error: {str(e)}")
+                time.sleep(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str, ensure_ascii=False)}\n\n"
+
+
+def branch_balance_payload(branch) -> Dict[str, Any]:
+    return {
+        "branch_id": branch.id,
+        "allocated_amount_syp": branch.allocated_amount_syp,
+        "allocated_amount_usd": branch.allocated_amount_usd,
+        "allocated_amount": branch.allocated_amount
+    }
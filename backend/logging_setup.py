@@ -0,0 +1,161 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Any
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed through ``extra`` are kept as keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of INFO/DEBUG records for selected loggers.
+
+    Warnings and errors are never dropped.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.name)
+        if rate is None or rate >= 1.0:
+            return True
+        return random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hand records to the listener thread without formatting or blocking.
+
+    Formatting (including ``%`` argument interpolation) happens in the
+    listener, so request threads pay only for a queue put. When the queue
+    is full the record is dropped and counted instead of waiting.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.enqueue_seconds = 0.0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records stay in-process, so there is no need to pre-format them here
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        started = time.perf_counter()
+        try:
+            self.queue.put_nowait(record)
+            dropped = 0
+        except queue.Full:
+            dropped = 1
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.enqueued += 1 - dropped
+            self.dropped += dropped
+            self.enqueue_seconds += elapsed
+
+
+def _parse_sample_rates(value: str) -> Dict[str, float]:
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(log_file: str, level: int = logging.INFO) -> QueueHandler:
+    """Route the root logger through a queue to a background file writer.
+
+    Sampling rates come from LOG_SAMPLE_RATES, e.g.
+    ``payment.requests=0.1,payment.profits=1``. Safe to call more than once.
+    """
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        return _queue_handler
+
+    file_handler = RotatingFileHandler(log_file, maxBytes=2*1024*1024, backupCount=5, encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(_parse_sample_rates(
+        os.getenv("LOG_SAMPLE_RATES", "payment.requests=0.1")
+    )))
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    root_logger.addHandler(_queue_handler)
+
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.unregister(shutdown_logging)
+    atexit.register(shutdown_logging)
+    return _queue_handler
+
+
+def shutdown_logging():
+    """Flush queued records, stop the listener thread and detach the handler"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def get_logging_stats(total_requests: int = 0) -> Dict[str, Any]:
+    """Queue counters plus the average logging cost per request, against LOG_OVERHEAD_BUDGET_US"""
+    if _queue_handler is None:
+        return {}
+    budget_us = float(os.getenv("LOG_OVERHEAD_BUDGET_US", "50"))
+    with _queue_handler._stats_lock:
+        enqueued = _queue_handler.enqueued
+        dropped = _queue_handler.dropped
+        seconds = _queue_handler.enqueue_seconds
+    records = enqueued + dropped
+    per_request_us = (seconds / total_requests * 1e6) if total_requests else 0.0
+    return {
+        "enqueued": enqueued,
+        "dropped": dropped,
+        "queue_depth": _queue_handler.queue.qsize(),
+        "average_enqueue_us": round(seconds / records * 1e6, 2) if records else 0.0,
+        "overhead_per_request_us": round(per_request_us, 2),
+        "overhead_budget_us": budget_us,
+        "within_budget": per_request_us <= budget_us
+    }
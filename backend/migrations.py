@@ -0,0 +1,292 @@
+"""Explicit, versioned schema migrations.
+
+The application no longer touches the schema when it starts; run
+
+    python migrations.py upgrade
+
+before deploying (or set MIGRATE_ON_STARTUP=true in development). Applied
+versions are recorded in ``schema_migrations``. Migration 1 creates the
+baseline schema from the models, so every later migration must be
+idempotent (``IF NOT EXISTS`` or an explicit check) to also apply cleanly
+on top of it. Migrations must run on both PostgreSQL and SQLite.
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Integer, inspect, text
+
+from models import Base
+
+logger = logging.getLogger(__name__)
+
+# Serializes concurrent runners (e.g. several workers started with MIGRATE_ON_STARTUP)
+MIGRATION_LOCK_ID = 7230411
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+
+def migration(version: int, description: str):
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+@migration(1, "baseline schema")
+def _baseline(conn):
+    Base.metadata.create_all(bind=conn)
+
+
+def _existing_columns(conn, table: str):
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+@migration(2, "notification delivery tracking and branch scoping")
+def _notification_delivery(conn):
+    # SQLite has no ADD COLUMN IF NOT EXISTS, so look the columns up first
+    existing = _existing_columns(conn, "notifications")
+    for column, definition in (
+        ("branch_id", "INTEGER REFERENCES branches(id)"),
+        ("attempts", "INTEGER DEFAULT 0"),
+        ("next_attempt_at", "TIMESTAMP"),
+        ("last_error", "TEXT"),
+        ("sent_at", "TIMESTAMP"),
+        ("delivery_latency_ms", "REAL"),
+    ):
+        if column not in existing:
+            conn.execute(text(f"ALTER TABLE notifications ADD COLUMN {column} {definition}"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_notification_status ON notifications(status, next_attempt_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_notification_branch_created ON notifications(branch_id, created_at)"
+    ))
+    conn.execute(text("""
+        UPDATE notifications
+        SET branch_id = (
+            SELECT transactions.branch_id FROM transactions
+            WHERE transactions.id = notifications.transaction_id
+        )
+        WHERE branch_id IS NULL
+    """))
+
+
+@migration(3, "idempotency keys for transfer submissions")
+def _transaction_idempotency_key(conn):
+    if "idempotency_key" not in _existing_columns(conn, "transactions"):
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN idempotency_key VARCHAR"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_transaction_idempotency_key ON transactions(idempotency_key)"
+    ))
+
+
+@migration(4, "transaction change sequence and tombstones")
+def _transaction_change_feed(conn):
+    from change_feed import COUNTER_STAMP_SQL
+    from models import ChangeCounter, TransactionTombstone
+
+    Base.metadata.create_all(bind=conn, tables=[ChangeCounter.__table__, TransactionTombstone.__table__])
+    existing = _existing_columns(conn, "transactions")
+    for column, definition in (("updated_at", "TIMESTAMP"), ("change_seq", "BIGINT")):
+        if column not in existing:
+            conn.execute(text(f"ALTER TABLE transactions ADD COLUMN {column} {definition}"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_transaction_change_seq ON transactions(change_seq)"))
+    # Existing rows are numbered oldest first (PostgreSQL moves to a sequence in migration 9)
+    for statement in COUNTER_STAMP_SQL:
+        conn.execute(text(statement))
+
+
+@migration(5, "branch daily totals rollup")
+def _branch_daily_totals(conn):
+    from models import BranchDailyTotal
+
+    Base.metadata.create_all(bind=conn, tables=[BranchDailyTotal.__table__])
+    # Backfilled by migration 6, which the rebuild SQL depends on; later writes keep it current
+
+
+# (table, column, lookup kind, default name) of the columns stored as codes
+CODED_COLUMNS = [
+    ("transactions", "currency", "currency", "SYP"),
+    ("transactions", "status", "status", "processing"),
+    ("transactions", "sender_governorate", "governorate", None),
+    ("transactions", "receiver_governorate", "governorate", None),
+    ("transactions", "branch_governorate", "governorate", None),
+    ("branches", "governorate", "governorate", None),
+    ("branch_funds", "currency", "currency", "SYP"),
+    ("branch_profits", "currency", "currency", None),
+]
+
+
+@migration(6, "small-integer codes for currency, status and governorate")
+def _coded_columns(conn):
+    """Replace the text values with lookup codes.
+
+    Values in the data that are neither a known name nor a known spelling
+    variant are kept as extra lookup rows. PostgreSQL columns become
+    SMALLINT; SQLite cannot change a column type in place, so the codes are
+    written into the existing columns instead.
+    """
+    import codes
+    from daily_totals import rebuild
+    from models import CurrencyLookup, GovernorateLookup, StatusLookup
+
+    Base.metadata.create_all(
+        bind=conn, tables=[CurrencyLookup.__table__, StatusLookup.__table__, GovernorateLookup.__table__]
+    )
+    codes.seed_lookups(conn)
+    codes.load_extras(conn)
+    postgres = conn.dialect.name == "postgresql"
+
+    for table, column, kind, default in CODED_COLUMNS:
+        column_type = next(c["type"] for c in inspect(conn).get_columns(table) if c["name"] == column)
+        if isinstance(column_type, Integer):
+            continue
+        lookup = codes.LOOKUPS[kind]
+        mapping = {}
+        for (value,) in conn.execute(text(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL")):
+            value = str(value)
+            if value.isdigit() and lookup.has_code(int(value)):
+                mapping[value] = int(value)  # already converted (SQLite)
+            elif value.strip():
+                name = lookup.find(value)
+                mapping[value] = lookup.code(name) if name else codes.register_extra(conn, lookup, value.strip())
+        logger.info(f"Coding {table}.{column}: {len(mapping)} distinct values")
+        case = codes.code_case(column, mapping)
+        if postgres:
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} DROP DEFAULT"))
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE SMALLINT USING ({case})"))
+            if default:
+                conn.execute(text(
+                    f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT {lookup.code(default)}"
+                ))
+        else:
+            conn.execute(text(f"UPDATE {table} SET {column} = {case}"))
+
+    # Backfill the report rollup (migration 5) from the coded columns
+    rebuild(conn)
+
+
+# Duplicates of primary keys, low-cardinality single columns, and indexes for
+# shapes that now read from branch_daily_totals or cannot use a b-tree (ILIKE '%..%')
+REDUNDANT_INDEXES = [
+    "idx_transactions_id", "ix_transactions_id", "ix_users_id", "ix_branches_id", "ix_branch_funds_id",
+    "ix_notifications_id", "ix_branch_profits_id",
+    "idx_transactions_sender", "idx_transactions_receiver", "idx_transactions_status", "idx_transaction_status",
+    "idx_transaction_currency", "idx_transaction_dates", "idx_transaction_branch", "idx_transaction_destination",
+    "idx_transaction_employee",
+]
+
+
+@migration(7, "indexes for the hot query shapes")
+def _hot_query_indexes(conn):
+    import codes
+
+    processing = codes.STATUS.code("processing")
+    for statement in (
+        # Manager and employee lists: one side of the OR each, newest first
+        "CREATE INDEX IF NOT EXISTS idx_transaction_branch_date ON transactions(branch_id, date)",
+        "CREATE INDEX IF NOT EXISTS idx_transaction_destination_date ON transactions(destination_branch_id, date)",
+        "CREATE INDEX IF NOT EXISTS idx_transaction_employee_date ON transactions(employee_id, date)",
+        # Profits per branch and status
+        "CREATE INDEX IF NOT EXISTS idx_transaction_composite ON transactions(branch_id, status, date)",
+        # Pending queue: only in-flight transfers, with the scope columns inside the index
+        f"CREATE INDEX IF NOT EXISTS idx_transaction_processing ON transactions(date, branch_id, destination_branch_id) "
+        f"WHERE status = {processing}",
+        "CREATE INDEX IF NOT EXISTS idx_transaction_date ON transactions(date)",
+        "CREATE INDEX IF NOT EXISTS idx_transaction_received ON transactions(received_by)",
+        "CREATE INDEX IF NOT EXISTS idx_branch_funds_branch_created ON branch_funds(branch_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_branch_profits_transaction ON branch_profits(transaction_id)",
+    ):
+        conn.execute(text(statement))
+    for name in REDUNDANT_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+@migration(8, "outbox for cache invalidation and events")
+def _outbox_events(conn):
+    from models import OutboxEvent
+
+    Base.metadata.create_all(bind=conn, tables=[OutboxEvent.__table__])
+
+
+@migration(9, "change numbers from a sequence on PostgreSQL")
+def _change_sequence(conn):
+    if conn.dialect.name != "postgresql":
+        # SQLite keeps the counter row; its writes are serialized anyway
+        return
+    from change_feed import SEQUENCE, SYNC_SEQUENCE_SQL
+
+    conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE}"))
+    conn.execute(text(SYNC_SEQUENCE_SQL))
+
+
+def _ensure_version_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP
+        )
+    """))
+
+
+def applied_versions(engine) -> List[int]:
+    with engine.connect() as conn:
+        _ensure_version_table(conn)
+        conn.commit()
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+
+def pending_migrations(engine) -> List[Tuple[int, str, Callable]]:
+    applied = set(applied_versions(engine))
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def upgrade(engine) -> List[int]:
+    """Apply every pending migration, each in its own transaction"""
+    done = []
+    for version, description, func in pending_migrations(engine):
+        with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            already = conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :v"), {"v": version}
+            ).first()
+            if already:
+                continue
+            logger.info(f"Applying migration {version}: {description}")
+            func(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": version, "d": description, "t": datetime.now()}
+            )
+        done.append(version)
+    return done
+
+
+def main(argv=None) -> int:
+    from database import get_engine
+
+    parser = argparse.ArgumentParser(description="Manage the payment system database schema")
+    parser.add_argument("command", choices=["upgrade", "status"])
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    engine = get_engine()
+    if args.command == "status":
+        applied = set(applied_versions(engine))
+        for version, description, _ in MIGRATIONS:
+            print(f"{'applied' if version in applied else 'pending'}  {version:4d}  {description}")
+        return 0
+
+    done = upgrade(engine)
+    print(f"Applied {len(done)} migration(s)" + (f": {done}" if done else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,16 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Float, Text, Index
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, String, ForeignKey, DateTime, Date, Boolean, Float, Text, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
+from codes import Coded, STATUS
+
 Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     username = Column(String, unique=True, index=True)
     password = Column(String)
     role = Column(String, default="employee")
@@ -21,11 +23,11 @@ class User(Base):
 class Branch(Base):
     __tablename__ = "branches"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     branch_id = Column(String, unique=True, index=True)
     name = Column(String, index=True)
     location = Column(String)
-    governorate = Column(String)
+    governorate = Column(Coded("governorate"))
     allocated_amount_syp = Column(Float, default=0.0)
     allocated_amount_usd = Column(Float, default=0.0)
     allocated_amount = Column(Float, default=0.0)  # Kept for backward compatibility
@@ -42,12 +44,15 @@ class Branch(Base):
 
 class BranchFund(Base):
     __tablename__ = "branch_funds"
+    __table_args__ = (
+        Index('idx_branch_funds_branch_created', 'branch_id', 'created_at'),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     branch_id = Column(Integer, ForeignKey("branches.id"))
     amount = Column(Float)
     type = Column(String)
-    currency = Column(String, default="SYP")  # Added currency field
+    currency = Column(Coded("currency"), default="SYP")  # Added currency field
     description = Column(String)
     created_at = Column(DateTime, default=datetime.now)
     
@@ -56,19 +61,26 @@ class BranchFund(Base):
 class Transaction(Base):
     __tablename__ = "transactions"
     
-    # Add indexes for commonly queried fields
+    # One index per hot query shape (see migration 7 and check_query_plans.py)
     __table_args__ = (
         Index('idx_transaction_date', 'date'),
-        Index('idx_transaction_branch', 'branch_id'),
-        Index('idx_transaction_currency', 'currency'),
-        Index('idx_transaction_status', 'status'),
-        Index('idx_transaction_dates', 'date', 'branch_id', 'currency', 'status')
+        Index('idx_transaction_branch_date', 'branch_id', 'date'),
+        Index('idx_transaction_destination_date', 'destination_branch_id', 'date'),
+        Index('idx_transaction_employee_date', 'employee_id', 'date'),
+        Index('idx_transaction_composite', 'branch_id', 'status', 'date'),
+        # Transfers still in flight; the branch columns let scoped queues filter inside the index
+        Index('idx_transaction_processing', 'date', 'branch_id', 'destination_branch_id',
+              postgresql_where=text(f"status = {STATUS.code('processing')}"),
+              sqlite_where=text(f"status = {STATUS.code('processing')}")),
+        Index('idx_transaction_received', 'received_by'),
+        Index('idx_transaction_idempotency_key', 'idempotency_key', unique=True),
+        Index('idx_transaction_change_seq', 'change_seq')
     )
 
-    id = Column(String, primary_key=True, index=True)
+    id = Column(String, primary_key=True)
     sender = Column(String)
     sender_mobile = Column(String)
-    sender_governorate = Column(String)
+    sender_governorate = Column(Coded("governorate"))
     sender_location = Column(String)
     sender_id = Column(String)  # Added sender ID field
     sender_address = Column(String)  # Added sender address field
@@ -76,12 +88,12 @@ class Transaction(Base):
     receiver_mobile = Column(String)
     receiver_id = Column(String)
     receiver_address = Column(String)
-    receiver_governorate = Column(String)
+    receiver_governorate = Column(Coded("governorate"))
     receiver_location = Column(String)
     amount = Column(Float)  # Total amount
     base_amount = Column(Float, default=0.0)  # Added base amount
     benefited_amount = Column(Float, default=0.0)  # Added benefited amount
-    currency = Column(String, default="ليرة سورية")
+    currency = Column(Coded("currency"), default="SYP")
     message = Column(Text)
     
     # Branch relationships
@@ -97,11 +109,15 @@ class Transaction(Base):
     received_by = Column(Integer, ForeignKey("users.id"))
     
     employee_name = Column(String)
-    branch_governorate = Column(String)
-    status = Column(String, default="processing")
+    branch_governorate = Column(Coded("governorate"))
+    status = Column(Coded("status"), default="processing")
     is_received = Column(Boolean, default=False)
     received_at = Column(DateTime)
     date = Column(DateTime, default=datetime.now)
+    idempotency_key = Column(String, nullable=True)  # Client-supplied key so retried submissions are not duplicated
+    # Maintained by change_feed on every insert/update; drives /transactions/changes/
+    updated_at = Column(DateTime, default=datetime.now)
+    change_seq = Column(BigInteger, nullable=True)
     
     # Relationships
     branch = relationship("Branch", foreign_keys=[branch_id], back_populates="sent_transactions")
@@ -110,26 +126,115 @@ class Transaction(Base):
     receiver_user = relationship("User", foreign_keys=[received_by])
     profits = relationship("BranchProfits", back_populates="transaction")
 
+class TransactionTombstone(Base):
+    """Marker left behind by a deleted transaction so change feed clients drop it too"""
+    __tablename__ = "transaction_tombstones"
+
+    transaction_id = Column(String, primary_key=True)
+    branch_id = Column(Integer, nullable=True)
+    destination_branch_id = Column(Integer, nullable=True)
+    employee_id = Column(Integer, nullable=True)
+    change_seq = Column(BigInteger, index=True)
+    deleted_at = Column(DateTime, default=datetime.now)
+
+class BranchDailyTotal(Base):
+    """Per branch, day, currency, direction and status rollup of transfers and fund movements.
+
+    ``direction`` is ``outgoing``/``incoming`` for transfers (``status`` is the
+    transfer status) or the branch_funds type for fund movements (``status``
+    is ``posted``). Maintained by daily_totals on every flush.
+    """
+    __tablename__ = "branch_daily_totals"
+    __table_args__ = (
+        Index('idx_branch_daily_totals_day', 'day', 'direction'),
+    )
+
+    branch_id = Column(Integer, primary_key=True)  # 0 for the System Manager
+    day = Column(Date, primary_key=True)
+    currency = Column(String, primary_key=True)
+    direction = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    amount = Column(Float, nullable=False, default=0.0)
+    benefited = Column(Float, nullable=False, default=0.0)
+    tax = Column(Float, nullable=False, default=0.0)
+    profit = Column(Float, nullable=False, default=0.0)
+
+class CurrencyLookup(Base):
+    """Names of the codes stored in currency columns (see codes.py)"""
+    __tablename__ = "currencies"
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=False)
+    name = Column(String, unique=True, nullable=False)
+
+class StatusLookup(Base):
+    """Names of the codes stored in transactions.status"""
+    __tablename__ = "transaction_statuses"
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=False)
+    name = Column(String, unique=True, nullable=False)
+
+class GovernorateLookup(Base):
+    """Names of the codes stored in governorate columns"""
+    __tablename__ = "governorates"
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=False)
+    name = Column(String, unique=True, nullable=False)
+
+class ChangeCounter(Base):
+    """Named monotonically increasing counters (one row per feed)"""
+    __tablename__ = "change_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+class OutboxEvent(Base):
+    """Cache invalidations and domain events committed with the write that caused them (see outbox.py)"""
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # 'invalidate' or 'event'
+    payload = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, default=datetime.now)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index('idx_notification_status', 'status', 'next_attempt_at'),
+        Index('idx_notification_branch_created', 'branch_id', 'created_at'),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     transaction_id = Column(String, ForeignKey("transactions.id"))
+    branch_id = Column(Integer, ForeignKey("branches.id"), nullable=True)  # Sending branch of the transaction
     recipient_phone = Column(String)
     message = Column(Text)
     status = Column(String, default="pending")
     created_at = Column(DateTime, default=datetime.now)
 
+    # Delivery tracking used by the background dispatcher
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    delivery_latency_ms = Column(Float, nullable=True)
+
     transaction = relationship("Transaction", backref="notifications")
 
 class BranchProfits(Base):
     __tablename__ = "branch_profits"
+    __table_args__ = (
+        Index('idx_branch_profits_transaction', 'transaction_id'),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     branch_id = Column(Integer, ForeignKey("branches.id"))
     transaction_id = Column(String, ForeignKey("transactions.id"))
     profit_amount = Column(Float, default=0.0)
-    currency = Column(String)
+    currency = Column(Coded("currency"))
     source_type = Column(String)  # 'benefited_amount', 'tax', etc.
     date = Column(DateTime, default=datetime.now)
     
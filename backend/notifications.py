@@ -0,0 +1,236 @@
+import abc
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any
+
+from models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationSender(abc.ABC):
+    """Base class for notification delivery backends.
+
+    ``send`` must raise an exception when the message could not be delivered,
+    so the dispatcher can schedule a retry.
+    """
+
+    @abc.abstractmethod
+    def send(self, notification: Notification) -> None:
+        ...
+
+
+class LoopbackSender(NotificationSender):
+    """Keep delivered notifications in memory (used by tests and local runs)"""
+
+    def __init__(self):
+        self.sent: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def send(self, notification: Notification) -> None:
+        with self._lock:
+            self.sent.append({
+                "id": notification.id,
+                "transaction_id": notification.transaction_id,
+                "recipient_phone": notification.recipient_phone,
+                "message": notification.message
+            })
+
+
+class FileSender(NotificationSender):
+    """Append every delivered notification as one JSON line to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, notification: Notification) -> None:
+        line = json.dumps({
+            "id": notification.id,
+            "transaction_id": notification.transaction_id,
+            "recipient_phone": notification.recipient_phone,
+            "message": notification.message,
+            "sent_at": datetime.now().isoformat()
+        }, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def get_sender_from_env() -> NotificationSender:
+    """Build the sender configured by NOTIFICATION_SENDER.
+
+    Accepts ``file`` (default), ``loopback`` or a ``module:ClassName`` path
+    to a custom NotificationSender subclass.
+    """
+    sender_name = os.getenv("NOTIFICATION_SENDER", "file")
+    if sender_name == "loopback":
+        return LoopbackSender()
+    if sender_name == "file":
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "notifications_outbox.jsonl")
+        return FileSender(os.getenv("NOTIFICATION_OUTBOX_FILE", default_path))
+    module_name, _, class_name = sender_name.partition(":")
+    module = __import__(module_name, fromlist=[class_name])
+    return getattr(module, class_name)()
+
+
+# How a transfer status change moves its notification's delivery state:
+# transfer status -> (delivery state it applies to, new delivery state).
+# "sent" and "failed" belong to the dispatcher and are never reset, so a
+# delivered notification is not sent again and an undelivered one is only
+# withdrawn while the transfer is cancelled or rejected.
+DELIVERY_FOR_TRANSFER_STATUS = {
+    "cancelled": ("pending", "withdrawn"),
+    "rejected": ("pending", "withdrawn"),
+    "processing": ("withdrawn", "pending"),
+    "pending": ("withdrawn", "pending"),
+    "completed": ("withdrawn", "pending"),
+}
+
+
+def follow_transfer_status(session, transaction_ids: List[str], transfer_status: str) -> None:
+    """Withdraw or reinstate the undelivered notifications of these transfers"""
+    transition = DELIVERY_FOR_TRANSFER_STATUS.get(transfer_status)
+    if transition is None or not transaction_ids:
+        return
+    session.query(Notification).filter(
+        Notification.transaction_id.in_(transaction_ids),
+        Notification.status == transition[0]
+    ).update({Notification.status: transition[1]}, synchronize_session=False)
+
+
+class NotificationDispatcher:
+    """Background worker that delivers pending notifications in batches.
+
+    Each cycle claims up to ``batch_size`` due rows with
+    ``SELECT ... FOR UPDATE SKIP LOCKED`` so several workers can run side by
+    side without delivering the same notification twice. Failed deliveries
+    are retried with exponential backoff until ``max_attempts`` is reached.
+    The request path never waits on this worker; it only calls ``wake()``.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        sender: NotificationSender,
+        batch_size: int = 50,
+        poll_interval: float = 2.0,
+        max_attempts: int = 5,
+        backoff_base: float = 5.0,
+        backoff_max: float = 600.0
+    ):
+        self.session_factory = session_factory
+        self.sender = sender
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "delivered": 0,
+            "retried": 0,
+            "failed": 0,
+            "total_latency_ms": 0.0,
+            "max_latency_ms": 0.0
+        }
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._thread.start()
+        logger.info("Notification dispatcher started")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info("Notification dispatcher stopped")
+
+    def wake(self):
+        """Ask the worker to run a cycle now instead of waiting for the next poll"""
+        self._wake_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                # Keep draining while full batches come back
+                while self.dispatch_batch() == self.batch_size and not self._stop_event.is_set():
+                    pass
+            except Exception as e:
+                logger.error(f"Notification dispatch cycle failed: {str(e)}")
+            self._wake_event.wait(self.poll_interval)
+            self._wake_event.clear()
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+
+    def dispatch_batch(self) -> int:
+        """Claim and deliver one batch of due notifications. Returns the batch size."""
+        db = self.session_factory()
+        try:
+            now = datetime.now()
+            batch = db.query(Notification).filter(
+                Notification.status == "pending",
+                (Notification.next_attempt_at == None) | (Notification.next_attempt_at <= now)  # noqa: E711
+            ).order_by(Notification.id).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+            for notification in batch:
+                try:
+                    self.sender.send(notification)
+                except Exception as e:
+                    notification.attempts = (notification.attempts or 0) + 1
+                    notification.last_error = str(e)[:500]
+                    if notification.attempts >= self.max_attempts:
+                        notification.status = "failed"
+                        self._record("failed")
+                        logger.warning(f"Notification {notification.id} failed after {notification.attempts} attempts: {str(e)}")
+                    else:
+                        notification.next_attempt_at = now + timedelta(seconds=self._backoff(notification.attempts))
+                        self._record("retried")
+                    continue
+
+                sent_at = datetime.now()
+                notification.attempts = (notification.attempts or 0) + 1
+                notification.status = "sent"
+                notification.sent_at = sent_at
+                notification.last_error = None
+                if notification.created_at:
+                    notification.delivery_latency_ms = (sent_at - notification.created_at).total_seconds() * 1000
+                self._record("delivered", notification.delivery_latency_ms)
+
+            db.commit()
+            return len(batch)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _record(self, outcome: str, latency_ms: Optional[float] = None):
+        with self._stats_lock:
+            self.stats[outcome] += 1
+            if latency_ms is not None:
+                self.stats["total_latency_ms"] += latency_ms
+                self.stats["max_latency_ms"] = max(self.stats["max_latency_ms"], latency_ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            delivered = self.stats["delivered"]
+            return {
+                "delivered": delivered,
+                "retried": self.stats["retried"],
+                "failed": self.stats["failed"],
+                "average_latency_ms": round(self.stats["total_latency_ms"] / delivered, 2) if delivered else 0,
+                "max_latency_ms": round(self.stats["max_latency_ms"], 2)
+            }
@@ -0,0 +1,238 @@
+"""Transactional outbox for cache invalidation and domain events.
+
+Write endpoints no longer talk to Redis after ``commit()``. They add
+``OutboxEvent`` rows to the session instead, so the invalidations and events
+are committed (or rolled back) together with the change that caused them,
+and the request never waits on Redis. ``OutboxRelay`` runs in the
+background of every worker, one relaying at a time (a transaction-level
+advisory lock on PostgreSQL): it reads committed rows in id order, deletes
+the cache keys of a whole batch with one DELETE, publishes the events
+through the EventBroker and removes the rows.
+
+An event is never published before the invalidations queued ahead of it:
+when an invalidation fails, it is retried with backoff and every row after
+it waits, until it succeeds or is dropped after ``max_attempts`` (the entry
+then still expires with its TTL). Delivery is at least once: a worker dying
+between publishing and its commit publishes the batch again, which is
+harmless for invalidations and events alike (clients treat events as hints
+to refetch).
+"""
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE = "invalidate"
+EVENT = "event"
+
+# Held by the one worker relaying at a time, so rows go out in id order
+RELAY_LOCK_ID = 7230413
+
+
+def invalidate(session: Session, keys: Iterable[str] = (), patterns: Iterable[str] = ()) -> None:
+    """Delete these cache keys (and keys matching these patterns) once the session commits"""
+    payload = {"keys": sorted(set(keys)), "patterns": sorted(set(patterns))}
+    session.add(OutboxEvent(kind=INVALIDATE, payload=json.dumps(payload)))
+
+
+def publish(session: Session, event_type: str, data: Dict[str, Any], branch_ids: List[Optional[int]]) -> None:
+    """Publish this event to the streaming clients once the session commits"""
+    payload = {"type": event_type, "data": data, "branch_ids": branch_ids}
+    session.add(OutboxEvent(kind=EVENT, payload=json.dumps(payload, default=str)))
+
+
+class OutboxRelay:
+    """Background worker that delivers committed outbox rows in batches.
+
+    The request path only calls ``wake()`` after committing, so events still
+    go out right away instead of waiting for the next poll.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        cache,
+        broker,
+        batch_size: int = 100,
+        poll_interval: float = 1.0,
+        max_attempts: int = 5,
+        backoff_base: float = 2.0,
+        backoff_max: float = 60.0
+    ):
+        self.session_factory = session_factory
+        self.cache = cache
+        self.broker = broker
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "invalidations": 0,
+            "events": 0,
+            "retried": 0,
+            "dropped": 0,
+            "total_delay_ms": 0.0,
+            "max_delay_ms": 0.0,
+            "relayed": 0
+        }
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-relay", daemon=True)
+        self._thread.start()
+        logger.info("Outbox relay started")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        # Deliver what is already committed before the process goes away
+        try:
+            self.relay_batch()
+        except Exception as e:
+            logger.error(f"Final outbox relay failed: {str(e)}")
+        logger.info("Outbox relay stopped")
+
+    def wake(self):
+        """Ask the worker to run a cycle now instead of waiting for the next poll"""
+        self._wake_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                # Keep draining while full batches come back
+                while self.relay_batch() == self.batch_size and not self._stop_event.is_set():
+                    pass
+            except Exception as e:
+                logger.error(f"Outbox relay cycle failed: {str(e)}")
+            self._wake_event.wait(self.poll_interval)
+            self._wake_event.clear()
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+
+    def relay_batch(self) -> int:
+        """Deliver one batch of due rows in id order. Returns the batch size."""
+        db = self.session_factory()
+        try:
+            if db.get_bind().dialect.name == "postgresql" and not db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": RELAY_LOCK_ID}
+            ).scalar():
+                return 0  # another worker is relaying
+
+            now = datetime.now()
+            query = db.query(OutboxEvent).filter(
+                (OutboxEvent.next_attempt_at == None) | (OutboxEvent.next_attempt_at <= now)  # noqa: E711
+            )
+            # Nothing may overtake an invalidation waiting for its retry
+            barrier = db.query(func.min(OutboxEvent.id)).filter(
+                OutboxEvent.kind == INVALIDATE, OutboxEvent.next_attempt_at > now
+            ).scalar()
+            if barrier is not None:
+                query = query.filter(OutboxEvent.id < barrier)
+            batch = query.order_by(OutboxEvent.id).limit(self.batch_size).all()
+            if not batch:
+                return 0
+
+            delivered, dropped = [], []
+            held_from = None  # id of the first row that must wait for a retry
+            invalidations = [row for row in batch if row.kind == INVALIDATE]
+            if invalidations:
+                try:
+                    self._invalidate([json.loads(row.payload) for row in invalidations])
+                    delivered += invalidations
+                    self._record("invalidations", len(invalidations))
+                except Exception as e:
+                    dropped = self._schedule_retry(invalidations, e, now)
+                    if len(dropped) < len(invalidations):
+                        held_from = invalidations[0].id
+
+            # Cache entries are gone before clients hear about the change and refetch
+            for row in batch:
+                if row.kind != EVENT or (held_from is not None and row.id > held_from):
+                    continue
+                payload = json.loads(row.payload)
+                ts = row.created_at.isoformat() if row.created_at else None
+                self.broker.publish(payload["type"], payload["data"], payload["branch_ids"], ts=ts)
+                delivered.append(row)
+                self._record("events")
+
+            for row in delivered:
+                if row.created_at:
+                    self._record_delay((datetime.now() - row.created_at).total_seconds() * 1000)
+            if delivered or dropped:
+                db.query(OutboxEvent).filter(
+                    OutboxEvent.id.in_([row.id for row in delivered + dropped])
+                ).delete(synchronize_session=False)
+            db.commit()
+            return len(batch)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _invalidate(self, payloads: List[Dict[str, Any]]):
+        """Delete every key of the batch with one DELETE; raises when Redis fails"""
+        client = self.cache.redis_client
+        if client is None:
+            return
+        keys = {key for payload in payloads for key in payload["keys"]}
+        for pattern in {pattern for payload in payloads for pattern in payload["patterns"]}:
+            keys.update(client.keys(pattern))
+        if keys:
+            client.delete(*keys)
+
+    def _schedule_retry(self, rows: List[OutboxEvent], error: Exception, now: datetime) -> List[OutboxEvent]:
+        """Push failed rows back with backoff; returns the ones that ran out of attempts"""
+        dropped = []
+        for row in rows:
+            row.attempts = (row.attempts or 0) + 1
+            row.last_error = str(error)[:500]
+            if row.attempts >= self.max_attempts:
+                dropped.append(row)
+                self._record("dropped")
+                logger.warning(f"Dropping cache invalidation {row.id} after {row.attempts} attempts: {str(error)}")
+            else:
+                row.next_attempt_at = now + timedelta(seconds=self._backoff(row.attempts))
+                self._record("retried")
+        return dropped
+
+    def _record(self, outcome: str, count: int = 1):
+        with self._stats_lock:
+            self.stats[outcome] += count
+
+    def _record_delay(self, delay_ms: float):
+        with self._stats_lock:
+            self.stats["relayed"] += 1
+            self.stats["total_delay_ms"] += delay_ms
+            self.stats["max_delay_ms"] = max(self.stats["max_delay_ms"], delay_ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            relayed = self.stats["relayed"]
+            return {
+                "invalidations": self.stats["invalidations"],
+                "events": self.stats["events"],
+                "retried": self.stats["retried"],
+                "dropped": self.stats["dropped"],
+                "average_delay_ms": round(self.stats["total_delay_ms"] / relayed, 2) if relayed else 0,
+                "max_delay_ms": round(self.stats["max_delay_ms"], 2)
+            }
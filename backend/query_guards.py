@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import exc as sa_exc, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+logger = logging.getLogger(__name__)
+
+# Per-endpoint-class statement timeouts in milliseconds
+REPORT_STATEMENT_TIMEOUT_MS = int(os.getenv("REPORT_STATEMENT_TIMEOUT_MS", "15000"))
+INTERACTIVE_STATEMENT_TIMEOUT_MS = int(os.getenv("INTERACTIVE_STATEMENT_TIMEOUT_MS", "5000"))
+
+# Hard caps on rows loaded into memory by a single request
+REPORT_ROW_CAP = int(os.getenv("REPORT_ROW_CAP", "50000"))
+CUSTOMER_ROW_CAP = int(os.getenv("CUSTOMER_ROW_CAP", "5000"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Planner cost above which a user-driven report is refused before it runs
+REPORT_MAX_PLAN_COST = float(os.getenv("REPORT_MAX_PLAN_COST", "500000"))
+
+# Postgres SQLSTATE for "canceling statement due to statement timeout"
+QUERY_CANCELED = "57014"
+
+_stats_lock = threading.Lock()
+_stats = {"cancelled": 0, "row_capped": 0, "cost_rejected": 0}
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def get_query_guard_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def set_statement_timeout(db: Session, timeout_ms: int):
+    """Limit every statement of the session's current transaction"""
+    if timeout_ms and _is_postgres(db):
+        db.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+
+
+def is_query_cancelled(error: Exception) -> bool:
+    orig = getattr(error, "orig", None)
+    return isinstance(error, sa_exc.OperationalError) and getattr(orig, "pgcode", None) == QUERY_CANCELED
+
+
+@contextmanager
+def guard_query(endpoint: str):
+    """Turn a statement timeout into a quick 504 instead of a generic error"""
+    try:
+        yield
+    except sa_exc.OperationalError as e:
+        if not is_query_cancelled(e):
+            raise
+        _count("cancelled")
+        logger.warning(f"Query cancelled by statement timeout in {endpoint}")
+        raise HTTPException(
+            status_code=504,
+            detail="استغرق الاستعلام وقتاً طويلاً وتم إلغاؤه. الرجاء تضييق نطاق التاريخ أو إضافة فلاتر. "
+                   "(Query timed out; narrow the date range or add filters.)"
+        )
+
+
+def clamp_page_size(per_page: int) -> int:
+    return max(1, min(per_page, MAX_PAGE_SIZE))
+
+
+def fetch_capped(query: Query, cap: int, suggestion: str) -> List[Any]:
+    """Run ``query`` but refuse to materialize more than ``cap`` rows"""
+    rows = query.limit(cap + 1).all()
+    if len(rows) > cap:
+        _count("row_capped")
+        raise HTTPException(
+            status_code=400,
+            detail=f"النتائج تتجاوز الحد المسموح ({cap} سجل). {suggestion}"
+        )
+    return rows
+
+
+class Explain(Executable, ClauseElement):
+    """``EXPLAIN (FORMAT JSON) <statement>`` as a statement of its own.
+
+    Compiled together with the wrapped statement, so its parameters go through
+    the column types' bind processors (``Coded`` columns send their codes).
+    """
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def explain_cost(db: Session, query: Query) -> Optional[float]:
+    """Planner's total cost estimate for ``query``, or None when unavailable"""
+    if not _is_postgres(db):
+        return None
+    plan = db.execute(Explain(query.statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+def check_query_cost(db: Session, query: Query, suggestion: str, max_cost: float = REPORT_MAX_PLAN_COST):
+    """Refuse a report whose estimated cost is above ``max_cost`` before running it"""
+    cost = explain_cost(db, query)
+    if cost is not None and cost > max_cost:
+        _count("cost_rejected")
+        logger.warning(f"Report query refused: estimated cost {cost:.0f} > {max_cost:.0f}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"التقرير المطلوب كبير جداً. {suggestion}"
+        )
@@ -0,0 +1,152 @@
+import hashlib
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import create_engine, text
+
+from cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind; 0 when fully replayed (or when pointed at a non-standby database)
+REPLICATION_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+def get_last_write_cache_key(identity: str) -> str:
+    return f"last_write:{identity}"
+
+
+def client_identity(authorization: Optional[str]) -> Optional[str]:
+    """Stable key for a client derived from its bearer token"""
+    if not authorization:
+        return None
+    return hashlib.sha1(authorization.encode("utf-8")).hexdigest()
+
+
+class Replica:
+    def __init__(self, url: str, engine):
+        self.url = url
+        self.engine = engine
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.healthy = False
+
+
+class ReplicaRouter:
+    """Choose the engine for read-only sessions.
+
+    A replica is used only while its measured lag is below ``max_lag`` and
+    below the time since the client's last write (read-your-writes).
+    Otherwise, or when no replica is configured or reachable, reads go to
+    the primary.
+    """
+
+    def __init__(self, replica_urls: List[str], max_lag: float = 5.0, check_interval: float = 2.0,
+                 write_window: float = 30.0, engine_options: Dict[str, Any] = None):
+        self.replica_urls = [url for url in replica_urls if url]
+        self.engine_options = engine_options or {}
+        self.primary_engine = None
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.write_window = write_window
+        self.replicas: List[Replica] = []
+        self._cycle = None
+        self._lock = threading.Lock()
+        self._local_writes: Dict[str, float] = {}
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def start(self, primary_engine):
+        """Create the replica engines; no connection is opened until the first read"""
+        self.primary_engine = primary_engine
+        if not self.replicas:
+            self.replicas = [Replica(url, create_engine(url, **self.engine_options)) for url in self.replica_urls]
+            self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+
+    def mark_write(self, identity: Optional[str]):
+        """Remember that a client just wrote, so its next reads see the write"""
+        if not identity or not self.replicas:
+            return
+        now = time.time()
+        with self._lock:
+            self._local_writes[identity] = now
+        cache.set(get_last_write_cache_key(identity), now, expire=int(self.write_window))
+
+    def _last_write(self, identity: Optional[str]) -> Optional[float]:
+        if not identity:
+            return None
+        with self._lock:
+            local = self._local_writes.get(identity)
+        shared = cache.get(get_last_write_cache_key(identity))
+        candidates = [t for t in (local, shared) if t is not None]
+        return max(candidates) if candidates else None
+
+    def _claim_due_checks(self) -> List[Replica]:
+        """Take the replicas whose lag is stale, so one request measures each (lock held)"""
+        now = time.time()
+        due = [replica for replica in self.replicas if now - replica.checked_at >= self.check_interval]
+        for replica in due:
+            replica.checked_at = now
+        return due
+
+    def _refresh(self, replica: Replica):
+        """Measure the replica's lag; runs without the lock, as it may wait on the network"""
+        try:
+            with replica.engine.connect() as conn:
+                lag, healthy = float(conn.execute(REPLICATION_LAG_SQL).scalar() or 0), True
+        except Exception as e:
+            if replica.healthy:
+                logger.warning(f"Replica {replica.engine.url.host} unavailable: {str(e)}")
+            lag, healthy = None, False
+        with self._lock:
+            replica.lag, replica.healthy = lag, healthy
+
+    def engine_for_read(self, identity: Optional[str] = None):
+        if not self.replicas:
+            self.primary_reads += 1
+            return self.primary_engine
+
+        last_write = self._last_write(identity)
+        allowed_lag = self.max_lag
+        if last_write is not None:
+            allowed_lag = min(allowed_lag, time.time() - last_write)
+
+        with self._lock:
+            due = self._claim_due_checks()
+        for replica in due:
+            self._refresh(replica)
+
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = next(self._cycle)
+                if replica.healthy and replica.lag is not None and replica.lag < allowed_lag:
+                    self.replica_reads += 1
+                    return replica.engine
+            self.primary_reads += 1
+        return self.primary_engine
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+        self.replicas = []
+        self._cycle = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {"host": replica.engine.url.host, "database": replica.engine.url.database,
+                 "healthy": replica.healthy, "lag_seconds": replica.lag}
+                for replica in self.replicas
+            ]
+        }
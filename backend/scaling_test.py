@@ -0,0 +1,125 @@
+"""Throughput scaling test across worker counts.
+
+Starts the API through ``serve.py`` with 1, 2, 4 and 8 workers (against the
+database and Redis configured in the environment), drives it with a fixed
+number of concurrent clients for a fixed time, and prints requests per
+second, latency percentiles and the speed-up relative to one worker:
+
+    python scaling_test.py --workers 1 2 4 8 --clients 64 --duration 20
+
+With the default probe (``/check-initialization/``, one indexed query per
+request) throughput should grow close to linearly until the CPU count or
+the database becomes the bottleneck; a flat curve means the process-local
+or shared state is serializing workers.
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_until_ready(url: str, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server did not become ready: {url}")
+
+
+def drive(url: str, clients: int, duration: float) -> dict:
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client():
+        local, failed = [], 0
+        while time.time() < stop_at:
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+                local.append(time.perf_counter() - started)
+            except Exception:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1) if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else None,
+    }
+
+
+def run_once(workers: int, port: int, path: str, clients: int, duration: float) -> dict:
+    pidfile = os.path.join(HERE, f"scaling-{port}.pid")
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "start", "--workers", str(workers),
+         "--bind", f"127.0.0.1:{port}", "--pidfile", pidfile],
+        cwd=HERE,
+    )
+    url = f"http://127.0.0.1:{port}{path}"
+    try:
+        wait_until_ready(url)
+        drive(url, clients, min(3.0, duration))  # warm up pools and caches
+        result = drive(url, clients, duration)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(60)
+    result["workers"] = workers
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure API throughput across worker counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/check-initialization/")
+    args = parser.parse_args(argv)
+
+    results = [run_once(w, args.port, args.path, args.clients, args.duration) for w in args.workers]
+    base = results[0]["throughput_rps"] or 1
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for r in results:
+        r["speedup"] = round(r["throughput_rps"] / base, 2)
+        print(f"{r['workers']:>7} {r['throughput_rps']:>9} {r['speedup']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['errors']:>7}")
+    print(json.dumps(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
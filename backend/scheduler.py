@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Compare-and-delete so a worker only releases the lock it still owns
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def get_snapshot_cache_key(name: str) -> str:
+    return f"snapshot:{name}"
+
+
+def read_snapshot(name: str) -> Optional[Tuple[Any, float, float]]:
+    """Return (data, age in seconds, computed_at timestamp) of a precomputed snapshot, or None"""
+    snapshot = cache.get(get_snapshot_cache_key(name))
+    if not snapshot:
+        return None
+    age = time.time() - snapshot["computed_at"]
+    return snapshot["data"], round(age, 1), snapshot["computed_at"]
+
+
+def get_snapshot(name: str) -> Optional[Tuple[Any, float]]:
+    """Return (data, age in seconds) of a precomputed snapshot, or None"""
+    snapshot = read_snapshot(name)
+    return snapshot[:2] if snapshot else None
+
+
+class Job:
+    def __init__(self, name: str, func: Callable, interval: float, lock_timeout: float = 60.0):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.lock_timeout = lock_timeout
+        self.triggered_at: Optional[float] = None
+
+
+class Scheduler:
+    """Refresh cached snapshots of expensive aggregates in the background.
+
+    Every worker runs this loop, but a job only executes while holding a
+    short Redis lock, and only when the shared snapshot is older than the
+    job's interval (or a write triggered it). So across all workers each
+    job runs at most once per cadence.
+    """
+
+    def __init__(self, session_factory, tick: float = 1.0, trigger_delay: float = 2.0):
+        self.session_factory = session_factory
+        self.tick = tick
+        self.trigger_delay = trigger_delay
+        self.jobs: Dict[str, Job] = {}
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_job(self, name: str, func: Callable, interval: float, lock_timeout: float = 60.0):
+        """Register ``func(db)``; its return value becomes the snapshot"""
+        self.jobs[name] = Job(name, func, interval, lock_timeout)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Snapshot scheduler started ({len(self.jobs)} jobs)")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def trigger(self, *names: str):
+        """Mark jobs for a refresh shortly after a relevant write; never blocks"""
+        now = time.time()
+        with self._lock:
+            for name in names:
+                job = self.jobs.get(name)
+                if job and job.triggered_at is None:
+                    job.triggered_at = now
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            for job in list(self.jobs.values()):
+                if self._stop_event.is_set():
+                    break
+                if self._is_due(job):
+                    self.run_job(job)
+            self._stop_event.wait(self.tick)
+
+    def _is_due(self, job: Job) -> bool:
+        with self._lock:
+            triggered_at = job.triggered_at
+        if triggered_at is not None and time.time() - triggered_at >= self.trigger_delay:
+            return True
+        snapshot = get_snapshot(job.name)
+        return snapshot is None or snapshot[1] >= job.interval
+
+    def _acquire(self, job: Job) -> Optional[str]:
+        if cache.redis_client is None:
+            return "local"
+        token = f"{self.worker_id}:{uuid.uuid4().hex}"
+        try:
+            acquired = cache.redis_client.set(
+                f"scheduler:lock:{job.name}", token, nx=True, px=int(job.lock_timeout * 1000)
+            )
+            return token if acquired else None
+        except Exception as e:
+            logger.error(f"Scheduler lock error: {str(e)}")
+            return None
+
+    def _release(self, job: Job, token: str):
+        if token == "local":
+            return
+        try:
+            cache.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, f"scheduler:lock:{job.name}", token)
+        except Exception as e:
+            logger.error(f"Scheduler unlock error: {str(e)}")
+
+    def run_job(self, job: Job) -> bool:
+        token = self._acquire(job)
+        if token is None:
+            # Another worker is refreshing this snapshot right now
+            return False
+        with self._lock:
+            job.triggered_at = None
+        db = self.session_factory()
+        try:
+            started = time.time()
+            data = job.func(db)
+            cache.set(
+                get_snapshot_cache_key(job.name),
+                {"data": data, "computed_at": time.time()},
+                expire=int(max(job.interval * 10, 300))
+            )
+            logger.debug(f"Snapshot {job.name} refreshed in {time.time() - started:.3f}s")
+            return True
+        except Exception as e:
+            logger.error(f"Snapshot job {job.name} failed: {str(e)}")
+            return False
+        finally:
+            db.close()
+            self._release(job, token)
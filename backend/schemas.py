@@ -0,0 +1,70 @@
+from typing import Optional
+from pydantic import BaseModel, field_validator
+
+import codes
+
+
+class TransactionSchema(BaseModel):
+    sender: str
+    sender_mobile: str
+    sender_governorate: str
+    sender_location: str
+    sender_id: Optional[str] = None
+    sender_address: Optional[str] = None
+    
+    receiver: str
+    receiver_mobile: str
+    receiver_governorate: str
+    receiver_location: Optional[str] = None
+    receiver_id: Optional[str] = None
+    receiver_address: Optional[str] = None
+    
+    amount: float
+    base_amount: float
+    benefited_amount: float
+    tax_rate: float
+    tax_amount: float
+    currency: str = "SYP"
+    
+    message: str
+    employee_name: str
+    branch_governorate: str
+    destination_branch_id: int
+    branch_id: Optional[int] = None
+    date: Optional[str] = None  # <-- Add date field as string (ISO format)
+
+    @field_validator('amount')
+    def amount_must_be_positive(cls, v):
+        if v <= 0:
+            raise ValueError('المبلغ يجب أن يكون أكبر من صفر')
+        return v
+
+    @field_validator('base_amount', 'benefited_amount')
+    def amounts_non_negative(cls, v, info):
+        if v < 0:
+            raise ValueError(f"{info.field_name} لا يمكن أن يكون سالباً")
+        return v
+
+    @field_validator('tax_rate')
+    def tax_rate_valid(cls, v):
+        if not (0 <= v <= 100):
+            raise ValueError('نسبة الضريبة يجب أن تكون بين 0 و 100')
+        return v
+
+    @field_validator('sender_mobile', 'receiver_mobile')
+    def mobile_valid(cls, v, info):
+        if not v.isdigit() or not (9 <= len(v) <= 10):
+            raise ValueError(f"رقم الجوال {info.field_name} غير صحيح")
+        return v
+
+    @field_validator('currency')
+    def currency_valid(cls, v):
+        allowed = ["SYP", "USD", "ليرة سورية"]
+        if v not in allowed:
+            raise ValueError(f"العملة غير مدعومة. استخدم: {', '.join(allowed)}")
+        # Stored as a code; "ليرة سورية" is the same currency as SYP
+        return codes.CURRENCY.normalize(v)
+
+    @field_validator('sender_governorate', 'receiver_governorate', 'branch_governorate')
+    def governorate_known(cls, v):
+        return codes.GOVERNORATE.normalize(v)
@@ -0,0 +1,165 @@
+"""Production launcher for the payment system API.
+
+    python serve.py start [--workers N] [--bind 0.0.0.0:8000]
+    python serve.py reload     # re-read config, replace workers gracefully
+    python serve.py upgrade    # load new code: start a new master, drain the old one
+    python serve.py stop       # stop accepting, drain in-flight requests, exit
+
+On Linux this runs gunicorn with uvicorn workers and ``preload_app``: the
+application module is imported once in the master (importing it has no
+side effects) and forked into every worker, and each worker then opens its
+own pools in the app lifespan. On platforms without gunicorn it falls back
+to ``uvicorn --workers``, without preload or graceful reload.
+
+The database connection budget (DB_MAX_CONNECTIONS) is split across
+workers, so adding workers does not exhaust Postgres connections.
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+
+DEFAULT_BIND = "0.0.0.0:8000"
+DEFAULT_PIDFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.pid")
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+
+def _set_default(name: str, value):
+    # Explicit environment settings always win over the computed defaults
+    os.environ.setdefault(name, str(value))
+
+
+def configure_worker_resources(workers: int):
+    """Size per-worker pools and admission limits from the shared connection budget"""
+    budget = int(os.getenv("DB_MAX_CONNECTIONS", "90"))
+    per_worker = max(2, budget // workers)
+    pool_size = max(1, per_worker // 2)
+    _set_default("DB_POOL_SIZE", pool_size)
+    _set_default("DB_MAX_OVERFLOW", per_worker - pool_size)
+    _set_default("ADMISSION_TRANSFER_WRITE_CONCURRENCY", max(1, per_worker * 4 // 10))
+    _set_default("ADMISSION_INTERACTIVE_CONCURRENCY", max(1, per_worker * 5 // 10))
+    _set_default("ADMISSION_REPORT_CONCURRENCY", max(1, per_worker // 10))
+
+
+def gunicorn_options(args) -> dict:
+    return {
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "pidfile": args.pidfile,
+        # Seconds a worker gets to finish in-flight requests on reload/stop
+        "graceful_timeout": int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+        "timeout": int(os.getenv("WORKER_TIMEOUT", "60")),
+        "keepalive": int(os.getenv("KEEPALIVE", "5")),
+        # Recycle workers now and then to bound memory growth
+        "max_requests": int(os.getenv("MAX_REQUESTS", "20000")),
+        "max_requests_jitter": int(os.getenv("MAX_REQUESTS_JITTER", "2000")),
+        "accesslog": None,
+    }
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class PaymentApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from server_improved import app
+            return app
+
+    PaymentApplication(gunicorn_options(args)).run()
+
+
+def run_uvicorn(args):
+    import uvicorn
+
+    host, _, port = args.bind.rpartition(":")
+    uvicorn.run(
+        "server_improved:app",
+        host=host or "0.0.0.0",
+        port=int(port),
+        workers=args.workers,
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+        access_log=False,
+    )
+
+
+def start(args):
+    configure_worker_resources(args.workers)
+    try:
+        import gunicorn  # noqa: F401
+        use_gunicorn = sys.platform != "win32"
+    except ImportError:
+        use_gunicorn = False
+    if use_gunicorn:
+        run_gunicorn(args)
+    else:
+        run_uvicorn(args)
+
+
+def read_pid(pidfile: str) -> int:
+    try:
+        with open(pidfile) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        sys.exit(f"No running server found ({pidfile})")
+
+
+def send_signal(pidfile: str, sig):
+    pid = read_pid(pidfile)
+    os.kill(pid, sig)
+    return pid
+
+
+def upgrade(args):
+    """Start a new master with the new code, then drain and stop the old one"""
+    old_pid = send_signal(args.pidfile, signal.SIGUSR2)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        time.sleep(0.5)
+        try:
+            with open(args.pidfile) as f:
+                new_pid = int(f.read().strip())
+        except (OSError, ValueError):
+            continue
+        if new_pid != old_pid:
+            # Let the new workers come up before the old master drains
+            time.sleep(float(os.getenv("UPGRADE_WARMUP_SECONDS", "5")))
+            os.kill(old_pid, signal.SIGTERM)
+            print(f"Upgraded: {old_pid} -> {new_pid}")
+            return
+    sys.exit("New master did not start; the old one keeps serving")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the payment system API")
+    parser.add_argument("command", choices=["start", "reload", "upgrade", "stop"])
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--bind", default=os.getenv("BIND", DEFAULT_BIND))
+    parser.add_argument("--pidfile", default=os.getenv("PIDFILE", DEFAULT_PIDFILE))
+    args = parser.parse_args(argv)
+
+    if args.command == "start":
+        start(args)
+    elif args.command == "reload":
+        send_signal(args.pidfile, signal.SIGHUP)
+    elif args.command == "upgrade":
+        upgrade(args)
+    elif args.command == "stop":
+        send_signal(args.pidfile, signal.SIGTERM)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import logging
+import threading
+from typing import Dict, Optional
+
+from cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCounters:
+    """Counters that add up across all worker processes.
+
+    Increments are accumulated in-process and flushed to a Redis hash by a
+    background thread every ``flush_interval`` seconds, so the request path
+    never waits on Redis. Without Redis the counters are per process.
+    """
+
+    def __init__(self, key: str, fields: Dict[str, float], flush_interval: float = 1.0):
+        self.key = key
+        self.fields = dict(fields)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending: Dict[str, float] = {}
+        self._local: Dict[str, float] = dict(fields)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def incr(self, field: str, amount: float = 1):
+        with self._lock:
+            self._pending[field] = self._pending.get(field, 0) + amount
+            self._local[field] = self._local.get(field, 0) + amount
+
+    def local(self) -> Dict[str, float]:
+        """Totals of this process only"""
+        with self._lock:
+            return dict(self._local)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"metrics-{self.key}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        client = cache.redis_client
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for field, amount in pending.items():
+                if isinstance(amount, float):
+                    pipe.hincrbyfloat(self.key, field, amount)
+                else:
+                    pipe.hincrby(self.key, field, amount)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Metrics flush error: {str(e)}")
+            # Keep the increments for the next flush
+            with self._lock:
+                for field, amount in pending.items():
+                    self._pending[field] = self._pending.get(field, 0) + amount
+
+    def snapshot(self) -> Dict[str, float]:
+        """Totals across all workers, including this process's unflushed increments"""
+        client = cache.redis_client
+        totals = dict(self.fields)
+        shared = None
+        if client is not None:
+            try:
+                shared = client.hgetall(self.key)
+            except Exception as e:
+                logger.error(f"Metrics read error: {str(e)}")
+        if shared is None:
+            return self.local()
+        for field, value in shared.items():
+            totals[field] = float(value) if "." in value else int(value)
+        with self._lock:
+            for field, amount in self._pending.items():
+                totals[field] = totals.get(field, 0) + amount
+        return totals
+
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from models import Branch, BranchDailyTotal, Transaction
+
+DIRECTOR = {"id": 1, "username": "director", "role": "director", "branch_id": None}
+
+
+def _rollup(db, direction):
+    return {
+        (row.status, row.count, row.amount)
+        for row in db.query(BranchDailyTotal).filter(BranchDailyTotal.direction == direction)
+        if row.count
+    }
+
+
+def test_completing_a_transfer_moves_it_in_the_rollup(db):
+    import server_improved
+
+    db.add_all([
+        Branch(id=1, branch_id="B1", name="Damascus", tax_rate=10.0),
+        Branch(id=2, branch_id="B2", name="Aleppo", tax_rate=0.0),
+    ])
+    db.add(Transaction(
+        id="tx-1", sender="Sender", receiver="Receiver", amount=500.0, benefited_amount=50.0,
+        tax_rate=10.0, tax_amount=5.0, currency="SYP", status="processing",
+        branch_id=1, destination_branch_id=2, date=datetime(2026, 1, 15, 10, 0)
+    ))
+    db.commit()
+    assert _rollup(db, "outgoing") == {("processing", 1, 500.0)}
+
+    server_improved.update_transaction_status(
+        server_improved.TransactionStatus(transaction_id="tx-1", status="completed"), DIRECTOR, db
+    )
+
+    db.expire_all()
+    assert _rollup(db, "outgoing") == {("completed", 1, 500.0)}
+    assert _rollup(db, "incoming") == {("completed", 1, 500.0)}
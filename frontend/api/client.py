@@ -6,14 +6,49 @@ class APIClient:
     def __init__(self, token=None):
         self.token = token
         self.api_url = os.environ["API_URL"]
-    
+        # url -> last 200 response; revalidated with If-None-Match, the server answers 304 while unchanged
+        self._etag_cache = {}
+
     def _get_headers(self):
         return {"Authorization": f"Bearer {self.token}"} if self.token else {}
-    
+
+    def conditional_get(self, path, params=None, timeout=None):
+        """GET that reuses the previous body when the server reports it unchanged (304)"""
+        url = requests.Request("GET", f"{self.api_url}{path}", params=params).prepare().url
+        headers = self._get_headers()
+        cached = self._etag_cache.get(url)
+        if cached is not None:
+            headers["If-None-Match"] = cached.headers["ETag"]
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            return cached
+        if response.status_code == 200 and response.headers.get("ETag"):
+            self._etag_cache[url] = response
+        return response
+
     def get_branches(self):
-        return requests.get(
-            f"{self.api_url}/branches/",
-            headers=self._get_headers()
+        return self.conditional_get("/branches/")
+
+    def get_branch_stats(self):
+        return self.conditional_get("/branches/stats/")
+
+    def get_branch_tax_rate(self, branch_id):
+        return self.conditional_get(f"/api/branches/{branch_id}/tax_rate/")
+
+    def get_dashboard_snapshot(self, timeout=10):
+        """Every dashboard section for the caller's role (director or branch manager) in one request"""
+        return requests.get(f"{self.api_url}/dashboard/snapshot", headers=self._get_headers(), timeout=timeout)
+
+    def batch(self, sub_requests, timeout=15):
+        """Run several GETs in one round trip.
+
+        ``sub_requests`` is a list of ``{"path": ..., "params": {...}}``; returns
+        the list of ``{"status", "headers", "body"}`` in the same order.
+        """
+        response = requests.post(
+            f"{self.api_url}/batch", json=sub_requests, headers=self._get_headers(), timeout=timeout
         )
-    
-    # Add more API methods as needed...
\ No newline at end of file
+        response.raise_for_status()
+        return response.json()
+
+    # Add more API methods as needed...
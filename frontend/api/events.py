@@ -0,0 +1,73 @@
+# api/events.py
+import json
+import time
+
+import requests
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class EventStreamThread(QThread):
+    """Listen to the server's /events/stream and re-emit events as Qt signals.
+
+    Reconnects with a growing delay when the connection drops. While the
+    stream is connected, screens can relax their polling timers to rare
+    reconciling refreshes.
+    """
+    event_received = pyqtSignal(str, dict)
+    connection_changed = pyqtSignal(bool)
+
+    def __init__(self, api_url, token, parent=None):
+        super().__init__(parent)
+        self.api_url = api_url
+        self.token = token
+        self._running = True
+        self._response = None
+
+    def run(self):
+        delay = 1
+        while self._running:
+            try:
+                self._response = requests.get(
+                    f"{self.api_url}/events/stream",
+                    headers={"Authorization": f"Bearer {self.token}", "Accept": "text/event-stream"},
+                    stream=True,
+                    timeout=(5, 60)
+                )
+                if self._response.status_code != 200:
+                    raise requests.RequestException(f"status {self._response.status_code}")
+                self.connection_changed.emit(True)
+                delay = 1
+                event_type = None
+                for raw_line in self._response.iter_lines(decode_unicode=True):
+                    if not self._running:
+                        break
+                    if raw_line is None or raw_line.startswith(":"):
+                        continue
+                    if raw_line.startswith("event:"):
+                        event_type = raw_line[6:].strip()
+                    elif raw_line.startswith("data:") and event_type:
+                        try:
+                            payload = json.loads(raw_line[5:].strip())
+                        except ValueError:
+                            continue
+                        self.event_received.emit(event_type, payload.get("data", {}))
+                        event_type = None
+            except Exception as e:
+                print(f"Event stream disconnected: {e}")
+            finally:
+                if self._response is not None:
+                    self._response.close()
+                    self._response = None
+            if self._running:
+                self.connection_changed.emit(False)
+                time.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    def stop(self):
+        self._running = False
+        if self._response is not None:
+            try:
+                self._response.close()
+            except Exception:
+                pass
+        self.wait(2000)
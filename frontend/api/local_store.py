@@ -0,0 +1,299 @@
+# api/local_store.py
+"""Local SQLite mirror of what a branch client works with.
+
+Keeps the branch's recent transactions, the branch list and the customers
+seen in those transactions on disk so screens can render without a round
+trip, and holds a durable outbox of submissions (new transfers) that are
+replayed with their idempotency keys once the server is reachable again.
+The mirror is filled by ``api.sync.SyncThread``; the UI only reads from it.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    branch_id INTEGER,
+    destination_branch_id INTEGER,
+    employee_id INTEGER,
+    status TEXT,
+    date TEXT,
+    pending INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_local_tx_branch_date ON transactions(branch_id, date);
+CREATE INDEX IF NOT EXISTS idx_local_tx_destination_date ON transactions(destination_branch_id, date);
+
+CREATE TABLE IF NOT EXISTS branches (
+    id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS customers (
+    name TEXT NOT NULL,
+    mobile TEXT NOT NULL,
+    governorate TEXT,
+    location TEXT,
+    id_number TEXT,
+    last_seen TEXT,
+    PRIMARY KEY (name, mobile)
+);
+
+CREATE TABLE IF NOT EXISTS outbox (
+    idempotency_key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TEXT NOT NULL,
+    last_error TEXT,
+    status TEXT NOT NULL DEFAULT 'pending'
+);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+PENDING_STATUS = "queued"  # Shown for transfers that only exist in the outbox
+
+
+def default_store_path(api_url, username):
+    """One store file per server and user, under LOCAL_STORE_DIR (default ~/.payment_system)"""
+    directory = os.environ.get("LOCAL_STORE_DIR", os.path.join(os.path.expanduser("~"), ".payment_system"))
+    os.makedirs(directory, exist_ok=True)
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{api_url}_{username or 'anonymous'}")
+    return os.path.join(directory, f"{name}.db")
+
+
+class LocalStore:
+    """Thread-safe wrapper around the local SQLite file (UI thread + sync thread)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def for_user(cls, api_url, username):
+        return cls(default_store_path(api_url, username))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- sync state -----------------------------------------------------
+
+    def get_state(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_state(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, None if value is None else str(value))
+            )
+
+    # --- branches -------------------------------------------------------
+
+    def replace_branches(self, branches):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM branches")
+            self._conn.executemany(
+                "INSERT INTO branches (id, data) VALUES (?, ?)",
+                [(b["id"], json.dumps(b, ensure_ascii=False)) for b in branches if b.get("id") is not None]
+            )
+
+    def get_branches(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM branches ORDER BY id").fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    # --- transactions and customers -------------------------------------
+
+    def upsert_transactions(self, transactions):
+        """Store server rows; customers are derived from the same rows"""
+        tx_rows, customer_rows = [], []
+        for tx in transactions:
+            date = tx.get("date")
+            tx_rows.append((
+                tx["id"], tx.get("branch_id"), tx.get("destination_branch_id"), tx.get("employee_id"),
+                tx.get("status"), date, json.dumps(tx, ensure_ascii=False, default=str)
+            ))
+            for prefix in ("sender", "receiver"):
+                name, mobile = tx.get(prefix), tx.get(f"{prefix}_mobile")
+                if name and mobile:
+                    customer_rows.append((
+                        name, mobile, tx.get(f"{prefix}_governorate"), tx.get(f"{prefix}_location"),
+                        tx.get(f"{prefix}_id"), date
+                    ))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO transactions (id, branch_id, destination_branch_id, employee_id, status, date, pending, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?) "
+                "ON CONFLICT(id) DO UPDATE SET branch_id = excluded.branch_id, "
+                "destination_branch_id = excluded.destination_branch_id, employee_id = excluded.employee_id, "
+                "status = excluded.status, date = excluded.date, pending = 0, data = excluded.data",
+                tx_rows
+            )
+            self._conn.executemany(
+                "INSERT INTO customers (name, mobile, governorate, location, id_number, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(name, mobile) DO UPDATE SET governorate = excluded.governorate, "
+                "location = excluded.location, "
+                "id_number = COALESCE(NULLIF(excluded.id_number, ''), customers.id_number), "
+                "last_seen = MAX(COALESCE(customers.last_seen, ''), COALESCE(excluded.last_seen, ''))",
+                customer_rows
+            )
+        return len(tx_rows)
+
+    def delete_transactions(self, transaction_ids):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM transactions WHERE id = ?", [(i,) for i in transaction_ids])
+
+    def clear_transactions(self):
+        """Forget every synced row (pending placeholders stay)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM transactions WHERE pending = 0")
+
+    def prune_transactions(self, keep_days):
+        """Drop synced rows older than the mirror window; pending rows are kept"""
+        cutoff = (datetime.now() - timedelta(days=keep_days)).isoformat()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM transactions WHERE pending = 0 AND date < ?", (cutoff,))
+
+    def query_transactions(self, branch_id=None, destination_branch_id=None, employee_id=None,
+                           status=None, page=1, per_page=20):
+        """Same shape as GET /transactions/: dict with items, total, page, per_page, total_pages"""
+        clauses, params = [], []
+        for column, value in (("branch_id", branch_id), ("destination_branch_id", destination_branch_id),
+                              ("employee_id", employee_id), ("status", status)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        page = max(page, 1)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM transactions {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT data FROM transactions {where} ORDER BY date DESC LIMIT ? OFFSET ?",
+                params + [per_page, (page - 1) * per_page]
+            ).fetchall()
+        return {
+            "items": [json.loads(row["data"]) for row in rows],
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "total_pages": max(1, (total + per_page - 1) // per_page),
+        }
+
+    def search_customers(self, term="", limit=50):
+        like = f"%{term}%"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, mobile, governorate, location, id_number FROM customers "
+                "WHERE name LIKE ? OR mobile LIKE ? OR id_number LIKE ? "
+                "ORDER BY last_seen DESC LIMIT ?",
+                (like, like, like, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    # --- outbox ---------------------------------------------------------
+
+    def enqueue(self, path, payload, hold_seconds=0, local_fields=None):
+        """Durably record a submission before it is sent; returns its idempotency key.
+
+        A placeholder transaction is written alongside so the transfer shows
+        up in the lists (status ``queued``) until the server confirms it;
+        ``local_fields`` fills in what the server would (e.g. employee_id).
+        ``hold_seconds`` keeps the sync thread away while the UI sends it itself.
+        """
+        key = str(uuid.uuid4())
+        now = datetime.now()
+        placeholder = {
+            **payload,
+            **(local_fields or {}),
+            "id": f"pending-{key}",
+            "status": PENDING_STATUS,
+            "date": now.isoformat(timespec="seconds"),
+            "is_received": False,
+        }
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO outbox (idempotency_key, path, payload, created_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, path, json.dumps(payload, ensure_ascii=False, default=str), now.isoformat(),
+                 (now + timedelta(seconds=hold_seconds)).isoformat())
+            )
+            self._conn.execute(
+                "INSERT INTO transactions (id, branch_id, destination_branch_id, employee_id, status, date, pending, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, 1, ?)",
+                (placeholder["id"], placeholder.get("branch_id"), placeholder.get("destination_branch_id"),
+                 placeholder.get("employee_id"), PENDING_STATUS, placeholder["date"],
+                 json.dumps(placeholder, ensure_ascii=False, default=str))
+            )
+        return key
+
+    def due_outbox(self, limit=20):
+        """Pending submissions whose retry time has come, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM outbox WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY created_at LIMIT ?",
+                (datetime.now().isoformat(), limit)
+            ).fetchall()
+        return [{**dict(row), "payload": json.loads(row["payload"])} for row in rows]
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def rejected(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM outbox WHERE status = 'rejected' ORDER BY created_at"
+            ).fetchall()
+        return [{**dict(row), "payload": json.loads(row["payload"])} for row in rows]
+
+    def mark_sent(self, key):
+        """The server accepted the submission; the synced row replaces the placeholder"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM outbox WHERE idempotency_key = ?", (key,))
+            self._conn.execute("DELETE FROM transactions WHERE id = ?", (f"pending-{key}",))
+
+    def mark_retry(self, key, error, delay_seconds):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, next_attempt_at = ? "
+                "WHERE idempotency_key = ?",
+                (str(error), (datetime.now() + timedelta(seconds=delay_seconds)).isoformat(), key)
+            )
+
+    def mark_rejected(self, key, error):
+        """The server refused the submission for good (4xx); keep it for the user to review"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, status = 'rejected' "
+                "WHERE idempotency_key = ?",
+                (str(error), key)
+            )
+            self._conn.execute("DELETE FROM transactions WHERE id = ?", (f"pending-{key}",))
+
+    def discard(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM outbox WHERE idempotency_key = ?", (key,))
+            self._conn.execute("DELETE FROM transactions WHERE id = ?", (f"pending-{key}",))
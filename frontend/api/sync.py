@@ -0,0 +1,182 @@
+# api/sync.py
+import os
+import threading
+from datetime import datetime, timedelta
+
+import requests
+from PyQt6.QtCore import QThread, pyqtSignal
+
+# How far back the local mirror reaches
+SYNC_WINDOW_DAYS = int(os.environ.get("SYNC_WINDOW_DAYS", "30"))
+SYNC_INTERVAL_SECONDS = int(os.environ.get("SYNC_INTERVAL_SECONDS", "30"))
+CHANGES_PAGE_SIZE = 500
+MAX_RETRY_DELAY = 300
+
+
+class CursorReset(Exception):
+    """The server's change counter is behind our cursor (restored or different database)"""
+
+
+def iter_changes(api_url, headers, since=0, changed_since=None, page_size=CHANGES_PAGE_SIZE):
+    """Yield pages of GET /transactions/changes/ after ``since`` until caught up.
+
+    Each page has ``changes`` (full rows), ``deleted`` (tombstones) and the
+    ``cursor`` to store once the page is applied. Raises CursorReset when the
+    caller has to drop its copy and start again from 0.
+    """
+    while True:
+        params = {"since": since, "limit": page_size}
+        if changed_since:
+            params["changed_since"] = changed_since
+        response = requests.get(f"{api_url}/transactions/changes/", params=params, headers=headers, timeout=30)
+        response.raise_for_status()
+        page = response.json()
+        if since > page.get("latest", since):
+            raise CursorReset()
+        yield page
+        since = page["cursor"]
+        if not page.get("has_more"):
+            return
+
+
+def error_detail(response):
+    """Readable message out of an error response, as the transfer screens show it"""
+    message = f"رمز الحالة {response.status_code}"
+    try:
+        detail = response.json().get("detail")
+        if isinstance(detail, list):
+            message = "\n".join(str(err) for err in detail)
+        elif detail:
+            message = str(detail)
+    except ValueError:
+        pass
+    return message
+
+
+def send_submission(api_url, headers, path, payload, idempotency_key, timeout=15):
+    """POST one outbox entry.
+
+    Returns ``("sent", body)``, ``("rejected", message)`` when the server
+    refused it for good, or ``("retry", message)`` when it is worth trying
+    again later (no connection, timeouts, 5xx, 408 and 429).
+    """
+    try:
+        response = requests.post(
+            f"{api_url}{path}",
+            json=payload,
+            headers={**headers, "Idempotency-Key": idempotency_key},
+            timeout=timeout
+        )
+    except requests.RequestException as e:
+        return "retry", f"خطأ في الاتصال: {e}"
+    if response.status_code in (200, 201):
+        return "sent", response.json()
+    if response.status_code in (408, 429) or response.status_code >= 500:
+        return "retry", error_detail(response)
+    return "rejected", error_detail(response)
+
+
+class SyncThread(QThread):
+    """Keep a LocalStore current and drain its outbox.
+
+    Every pass first replays due outbox entries (oldest first, stopping at
+    the first one that has to wait so submissions keep their order), then
+    refreshes branches and applies the transaction change feed from the
+    stored cursor.
+    ``request_sync()`` starts a pass right away, e.g. after a submission.
+    """
+    synced = pyqtSignal(dict)
+    connection_changed = pyqtSignal(bool)
+    submission_sent = pyqtSignal(str, dict)
+    submission_rejected = pyqtSignal(str, str)
+
+    def __init__(self, api_url, token, store, parent=None):
+        super().__init__(parent)
+        self.api_url = api_url
+        self.token = token
+        self.store = store
+        self._running = True
+        self._wake = threading.Event()
+        self._online = None
+
+    @property
+    def headers(self):
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    def request_sync(self):
+        self._wake.set()
+
+    def run(self):
+        while self._running:
+            try:
+                stats = {"sent": self.replay_outbox()}
+                stats["branches"] = self.pull_branches()
+                stats["transactions"] = self.pull_transactions()
+                stats["pending"] = self.store.pending_count()
+                self._set_online(True)
+                self.synced.emit(stats)
+            except requests.RequestException as e:
+                print(f"Sync failed: {e}")
+                self._set_online(False)
+            except Exception as e:
+                print(f"Sync error: {e}")
+            self._wake.wait(SYNC_INTERVAL_SECONDS)
+            self._wake.clear()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        self.wait(2000)
+
+    def _set_online(self, online):
+        if online != self._online:
+            self._online = online
+            self.connection_changed.emit(online)
+
+    def replay_outbox(self):
+        sent = 0
+        for entry in self.store.due_outbox():
+            key = entry["idempotency_key"]
+            outcome, result = send_submission(self.api_url, self.headers, entry["path"], entry["payload"], key)
+            if outcome == "sent":
+                self.store.mark_sent(key)
+                self.submission_sent.emit(key, result)
+                sent += 1
+            elif outcome == "rejected":
+                self.store.mark_rejected(key, result)
+                self.submission_rejected.emit(key, result)
+            else:
+                delay = min(MAX_RETRY_DELAY, 5 * 2 ** min(entry["attempts"], 6))
+                self.store.mark_retry(key, result, delay)
+                raise requests.ConnectionError(result)
+        return sent
+
+    def pull_branches(self):
+        response = requests.get(f"{self.api_url}/branches/", headers=self.headers, timeout=15)
+        response.raise_for_status()
+        branches = response.json().get("branches", [])
+        self.store.replace_branches(branches)
+        return len(branches)
+
+    def pull_transactions(self):
+        """Apply transactions changed since the stored cursor to the mirror"""
+        cursor = int(self.store.get_state("transactions_cursor", 0))
+        # A fresh mirror only needs the sync window, not the whole history
+        changed_since = None
+        if cursor == 0:
+            changed_since = (datetime.now() - timedelta(days=SYNC_WINDOW_DAYS)).strftime("%Y-%m-%d")
+        pulled = 0
+        try:
+            for page in iter_changes(self.api_url, self.headers, cursor, changed_since):
+                pulled += self.store.upsert_transactions(page["changes"])
+                self.store.delete_transactions([tombstone["id"] for tombstone in page["deleted"]])
+                self.store.set_state("transactions_cursor", page["cursor"])
+                if not self._running:
+                    break
+        except CursorReset:
+            self.store.clear_transactions()
+            self.store.set_state("transactions_cursor", 0)
+            return self.pull_transactions()
+
+        self.store.prune_transactions(SYNC_WINDOW_DAYS)
+        return pulled
@@ -165,7 +165,10 @@ class ReportsTabMixin:
             "end_date": date_to,
             "status": status_filter,
             "page": self.report_current_page,
-            "per_page": self.report_per_page
+            "per_page": self.report_per_page,
+            # Only the columns the report table shows
+            "fields": "id,sender,receiver,amount,currency,date,status,sending_branch_name,"
+                      "destination_branch_name,employee_name"
         }
         self.report_worker = ReportWorker(self.api_url, self.branch_id, self.token, base_params, transfer_type, self.report_current_page, self.report_per_page)
         self.report_worker.finished.connect(self.on_report_loaded)
@@ -759,23 +759,15 @@ class BranchManagementMixin:
     def _load_branch_stats(self, branch_id, layout):
         """Load branch statistics in background."""
         try:
-            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
-            
-            # Get employee stats
-            emp_response = requests.get(
-                f"{API_BASE_URL}/branches/{branch_id}/employees/stats/", 
-                headers=headers
-            )
-            
-            # Get transaction stats
-            trans_response = requests.get(
-                f"{API_BASE_URL}/branches/{branch_id}/transactions/stats/", 
-                headers=headers
-            )
+            # Employee and transaction stats in one round trip
+            emp_result, trans_result = self.api_client.batch([
+                {"path": f"/branches/{branch_id}/employees/stats/"},
+                {"path": f"/branches/{branch_id}/transactions/stats/"},
+            ])
             
             stats = {
-                'employees': emp_response.json() if emp_response.status_code == 200 else {},
-                'transactions': trans_response.json() if trans_response.status_code == 200 else {}
+                'employees': emp_result["body"] if emp_result["status"] == 200 else {},
+                'transactions': trans_result["body"] if trans_result["status"] == 200 else {}
             }
             
             self.branch_cache.set(branch_id, stats, 'stats')
@@ -11,6 +11,7 @@ from queue import Queue
 import weakref
 import threading
 from .table_manager import OptimizedTableManager
+from api.sync import CursorReset, iter_changes
 
 class TableUpdateManager:
     """Legacy adapter for OptimizedTableManager"""
@@ -292,6 +293,35 @@ class DashboardCacheManager:
         stats = self.get_metrics()
         print(f"[Cache] Stats: hit_rate={stats['hit_rate']:.2f}%, hits={stats['hits']}, misses={stats['misses']}, evictions={stats['evictions']}, total_requests={stats['total_requests']}, cache_size_mb={stats['cache_size_mb']:.2f}, usage={stats['cache_usage_percent']:.2f}%, items={stats['items_count']}")
 
+class TransactionChangeMirror:
+    """Process-wide copy of the transaction list kept current through /transactions/changes/.
+
+    The first load reads the whole feed once; later loads only fetch the
+    rows created, modified or deleted since the stored cursor.
+    """
+    _lock = threading.Lock()
+    _rows: Dict[str, Dict[str, Any]] = {}
+    _cursor = 0
+
+    @classmethod
+    def refresh(cls, api_url: str, headers: dict) -> List[Dict[str, Any]]:
+        with cls._lock:
+            try:
+                cls._apply_changes(api_url, headers)
+            except CursorReset:
+                cls._rows, cls._cursor = {}, 0
+                cls._apply_changes(api_url, headers)
+            return sorted(cls._rows.values(), key=lambda tx: str(tx.get("date") or ""), reverse=True)
+
+    @classmethod
+    def _apply_changes(cls, api_url: str, headers: dict) -> None:
+        for page in iter_changes(api_url, headers, cls._cursor):
+            for transaction in page["changes"]:
+                cls._rows[transaction["id"]] = transaction
+            for tombstone in page["deleted"]:
+                cls._rows.pop(tombstone["id"], None)
+            cls._cursor = page["cursor"]
+
 class DataLoadThread(QThread):
     """Thread for loading dashboard data asynchronously with enhanced progress tracking and error handling"""
     # Basic signals
@@ -438,7 +468,7 @@ class DataLoadThread(QThread):
             self._log_performance("Total operation", self._start_time)
         
     def load_basic_stats(self, headers: dict) -> None:
-        """Load basic statistics with progress tracking and parallel requests"""
+        """Load basic statistics (the dashboard snapshot) with progress tracking"""
         operation_start = time.time()
         
         cached_stats = self.cache_manager.get('basic_stats', 'critical')
@@ -448,33 +478,14 @@ class DataLoadThread(QThread):
 
         self._update_progress("تحميل إحصائيات النظام", 33)
         
-        # Use concurrent requests
-        import concurrent.futures
-        
-        urls = {
-            'branches': f"{self.api_url}/branches/stats/",
-            'users': f"{self.api_url}/users/stats/",
-            'financial': f"{self.api_url}/financial/total/"
-        }
-        
+        # Every dashboard section in one request
         combined_stats = {}
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            # Start all requests concurrently
-            future_to_url = {
-                executor.submit(self.make_request, url, headers): key
-                for key, url in urls.items()
-            }
-            
-            # Process responses as they complete
-            for future in concurrent.futures.as_completed(future_to_url):
-                key = future_to_url[future]
-                try:
-                    response = future.result()
-                    if response and response.status_code == 200:
-                        combined_stats.update(response.json())
-                except Exception as e:
-                    print(f"Error loading {key} stats: {e}")
+        try:
+            response = self.make_request(f"{self.api_url}/dashboard/snapshot", headers)
+            if response and response.status_code == 200:
+                combined_stats = response.json().get("sections", {})
+        except Exception as e:
+            print(f"Error loading dashboard snapshot: {e}")
         
         self._update_progress("معالجة البيانات", 66)
         
@@ -494,12 +505,18 @@ class DataLoadThread(QThread):
             self.data_loaded.emit({"transactions": cached_transactions})
             return
         self._update_progress("تحميل التحويلات", 50)
-        url = f"{self.api_url}/transactions/?per_page=10000"
-        response = self.make_request(url, headers)
-        if response and response.status_code == 200:
-            transactions = response.json().get("items", [])
+        url = f"{self.api_url}/transactions/changes/"
+        self.request_started.emit(url)
+        try:
+            # Only rows changed since the previous load cross the network
+            transactions = TransactionChangeMirror.refresh(self.api_url, headers)
+        except requests.RequestException as e:
+            self.error_occurred.emit(f"خطأ في الاتصال: {str(e)}")
+        else:
             self.cache_manager.set('transactions', transactions)
             self.data_loaded.emit({"transactions": transactions})
+        finally:
+            self.request_finished.emit(url)
         self._track_memory('load_transactions')
         self._log_performance('load_transactions', operation_start)
         
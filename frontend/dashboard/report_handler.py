@@ -386,6 +386,8 @@ class ReportHandlerMixin:
             if branch_id:
                 params["branch_id"] = branch_id
             params["per_page"] = 10000  # جلب كل النتائج دفعة واحدة
+            # Only the columns the report table shows
+            params["fields"] = "id,sender,receiver,amount,currency,date,status,branch_id,destination_branch_id,employee_name"
             url = f"{self.api_url}/transactions/"
         elif report_type == "branch":
             params["start_date"] = start_date
@@ -17,6 +17,7 @@ from ui.user_management_improved import AddEmployeeDialog, EditEmployeeDialog
 from ui.custom_widgets import ModernGroupBox, ModernButton
 from utils.helpers import get_status_arabic, get_status_color
 from ui.menu_auth import MenuAuthMixin
+from api.events import EventStreamThread
 from branch_dashboard.employees_tab import EmployeesTabMixin
 from branch_dashboard.reports_tab import ReportsTabMixin
 from branch_dashboard.profits_tab import ProfitsTabMixin
@@ -45,8 +46,7 @@ class InitialDataWorker(QThread):
     def run(self):
         result = {'success': True, 'error': None}
         try:
-            self.dashboard.load_branch_info()
-            self.dashboard.update_financial_status()
+            self.dashboard.load_dashboard_snapshot()
         except Exception as e:
             result['success'] = False
             result['error'] = str(e)
@@ -110,6 +110,12 @@ class BranchManagerDashboard(QMainWindow, MenuAuthMixin, EmployeesTabMixin, Repo
         self.financial_update_timer.timeout.connect(self.update_financial_status)
         self.financial_update_timer.start(self.FINANCIAL_CACHE_DURATION * 1000)
         
+        # Balance changes are pushed by the server; the timer above becomes a reconciling poll
+        self.event_stream = EventStreamThread(self.api_url, self.token)
+        self.event_stream.event_received.connect(self.handle_server_event)
+        self.event_stream.connection_changed.connect(self.handle_event_stream_state)
+        self.event_stream.start()
+        
         # Start progressive loading
         self.initialize_data()
     
@@ -295,19 +301,41 @@ class BranchManagerDashboard(QMainWindow, MenuAuthMixin, EmployeesTabMixin, Repo
             )
             
             if response.status_code == 200:
-                branch = response.json()
-                self.branch_name_label.setText(f"الفرع: {branch.get('name', '')}")
-                self.branch_id_label.setText(branch.get('branch_id', ''))
-                self.branch_name_field.setText(branch.get('name', ''))
-                self.branch_location_label.setText(branch.get('location', ''))
-                self.branch_governorate_label.setText(branch.get('governorate', ''))
-                self.branch_governorate = branch.get('governorate', '')
+                self.apply_branch_info(response.json())
             else:
                 self.show_branch_info_error()
         except Exception as e:
             print(f"Error loading branch info: {e}")
             self.show_branch_info_error()
 
+    def apply_branch_info(self, branch):
+        """Show branch details (a /branches/{id} or dashboard snapshot branch section)"""
+        self.branch_name_label.setText(f"الفرع: {branch.get('name', '')}")
+        self.branch_id_label.setText(branch.get('branch_id', ''))
+        self.branch_name_field.setText(branch.get('name', ''))
+        self.branch_location_label.setText(branch.get('location', ''))
+        self.branch_governorate_label.setText(branch.get('governorate', ''))
+        self.branch_governorate = branch.get('governorate', '')
+
+    def load_dashboard_snapshot(self):
+        """Branch info, balances and employee counts from /dashboard/snapshot in one request"""
+        self.branch_name_label.setText("جاري التحميل...")
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        response = requests.get(f"{self.api_url}/dashboard/snapshot", headers=headers, timeout=10)
+        if response.status_code != 200:
+            # Servers without the snapshot endpoint
+            self.load_branch_info()
+            self.update_financial_status()
+            return
+        sections = response.json().get("sections", {})
+        branch = sections.get("branch", {}).get("data", {})
+        self.apply_branch_info(branch)
+        self.apply_financial_stats(branch.get("financial_stats", {}))
+        if "employees" in sections:
+            # Served to load_employee_stats from its cache
+            self._employee_stats_cache = sections["employees"]["data"]
+            self._last_employee_stats = time.time()
+
     def show_branch_info_error(self):
         """Show error state for branch information"""
         self.branch_name_label.setText("الفرع: ")
@@ -1610,6 +1638,22 @@ class BranchManagerDashboard(QMainWindow, MenuAuthMixin, EmployeesTabMixin, Repo
         help_dialog.setLayout(layout)
         help_dialog.exec()
 
+    def handle_server_event(self, event_type, data):
+        """React to pushed events for this branch."""
+        if event_type in ("balance_changed", "allocation_made", "resync"):
+            self.update_financial_status()
+    
+    def handle_event_stream_state(self, connected):
+        """Poll balances rarely while the event stream is connected."""
+        interval = 600 if connected else self.FINANCIAL_CACHE_DURATION
+        self.financial_update_timer.setInterval(interval * 1000)
+    
+    def closeEvent(self, event):
+        """Stop background timers and the event stream when closing."""
+        self.financial_update_timer.stop()
+        self.event_stream.stop()
+        super().closeEvent(event)
+    
     def update_financial_status(self):
         """Update financial status with loading indicator"""
         try:
@@ -1625,36 +1669,7 @@ class BranchManagerDashboard(QMainWindow, MenuAuthMixin, EmployeesTabMixin, Repo
             )
             
             if response.status_code == 200:
-                branch_data = response.json()
-                financial = branch_data.get("financial_stats", {})
-                
-                # Syrian Pounds Balance
-                syp_balance = financial.get("available_balance_syp", financial.get("available_balance", 0))
-                self.syp_balance_label.setText(f"{syp_balance:,.2f} ل.س")
-                
-                # Update color based on SYP balance
-                if syp_balance < 500000:
-                    self.syp_balance_label.setStyleSheet("color: #e74c3c; font-weight: bold;")
-                else:
-                    self.syp_balance_label.setStyleSheet("color: #2ecc71; font-weight: bold;")
-
-                # US Dollars Balance
-                usd_balance = financial.get("available_balance_usd", 0)
-                self.usd_balance_label.setText(f"{usd_balance:,.2f} $")
-                
-                # Update color based on USD balance
-                if usd_balance < 1000:
-                    self.usd_balance_label.setStyleSheet("color: #e74c3c; font-weight: bold;")
-                else:
-                    self.usd_balance_label.setStyleSheet("color: #3498db; font-weight: bold;")
-                
-                # Update cache
-                self._financial_cache = {
-                    'syp_balance': syp_balance,
-                    'usd_balance': usd_balance,
-                    'timestamp': time.time()
-                }
-                
+                self.apply_financial_stats(response.json().get("financial_stats", {}))
             else:
                 self.show_financial_error()
 
@@ -1662,6 +1677,35 @@ class BranchManagerDashboard(QMainWindow, MenuAuthMixin, EmployeesTabMixin, Repo
             print(f"Error updating financial status: {e}")
             self.show_financial_error()
 
+    def apply_financial_stats(self, financial):
+        """Show the branch balances from a financial_stats block"""
+        # Syrian Pounds Balance
+        syp_balance = financial.get("available_balance_syp", financial.get("available_balance", 0))
+        self.syp_balance_label.setText(f"{syp_balance:,.2f} ل.س")
+        
+        # Update color based on SYP balance
+        if syp_balance < 500000:
+            self.syp_balance_label.setStyleSheet("color: #e74c3c; font-weight: bold;")
+        else:
+            self.syp_balance_label.setStyleSheet("color: #2ecc71; font-weight: bold;")
+
+        # US Dollars Balance
+        usd_balance = financial.get("available_balance_usd", 0)
+        self.usd_balance_label.setText(f"{usd_balance:,.2f} $")
+        
+        # Update color based on USD balance
+        if usd_balance < 1000:
+            self.usd_balance_label.setStyleSheet("color: #e74c3c; font-weight: bold;")
+        else:
+            self.usd_balance_label.setStyleSheet("color: #3498db; font-weight: bold;")
+        
+        # Update cache
+        self._financial_cache = {
+            'syp_balance': syp_balance,
+            'usd_balance': usd_balance,
+            'timestamp': time.time()
+        }
+
     def make_request(self, url, method="GET", params=None, data=None, cache_duration=None, cache_key=None):
         """Make an API request with caching and request tracking"""
         try:
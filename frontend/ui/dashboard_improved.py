@@ -24,6 +24,7 @@ from ui.user_search import UserSearchDialog
 from ui.custom_widgets import ModernGroupBox, ModernButton
 from utils.helpers import get_status_arabic, get_status_color, format_currency
 from api.client import APIClient
+from api.events import EventStreamThread
 from dashboard.branch_allocation import BranchAllocationMixin
 from ui.menu_auth import MenuAuthMixin
 from dashboard.receipt_printer import ReceiptPrinterMixin
@@ -37,6 +38,14 @@ from ui.password_reset import PasswordResetDialog
 from dashboard.dashboard_utils import DashboardUtilsMixin
 from dashboard.table_manager import OptimizedTableManager
 
+# Columns of the transfers table plus what the details dialog shows (?fields= on /transactions/)
+TRANSACTION_TABLE_FIELDS = ",".join([
+    "id", "sender", "sender_mobile", "sender_governorate", "sender_location",
+    "receiver", "receiver_mobile", "receiver_governorate", "receiver_location",
+    "amount", "currency", "message", "date", "status", "branch_id", "destination_branch_id",
+    "branch_governorate", "employee_name",
+])
+
 class DirectorDashboard(QMainWindow, BranchAllocationMixin, MenuAuthMixin, ReceiptPrinterMixin, ReportHandlerMixin, SettingsHandlerMixin, EmployeeManagementMixin, BranchManagementMixin, DashboardUtilsMixin):
     """Dashboard for the director role."""
     
@@ -138,6 +147,27 @@ class DirectorDashboard(QMainWindow, BranchAllocationMixin, MenuAuthMixin, Recei
         self.background_timer.timeout.connect(self.process_background_tasks)
         self.background_timer.start(5000)  # 5 seconds
         print("[QTimer] Started: background_timer")
+        
+        # Server push: refresh on events, keep update_timer as a rare reconciling poll
+        if not hasattr(self, 'event_refresh_timer'):
+            self.event_refresh_timer = QTimer(self)
+            self.event_refresh_timer.setSingleShot(True)
+            self.event_refresh_timer.timeout.connect(self.smart_update)
+        if not hasattr(self, 'event_stream'):
+            self.event_stream = EventStreamThread(self.api_url, self.token)
+            self.event_stream.event_received.connect(self.handle_server_event)
+            self.event_stream.connection_changed.connect(self.handle_event_stream_state)
+            self._active_threads.add(self.event_stream)
+            self.event_stream.start()
+    
+    def handle_server_event(self, event_type, data):
+        """Coalesce bursts of pushed events into one refresh."""
+        if not self.event_refresh_timer.isActive():
+            self.event_refresh_timer.start(2000)
+    
+    def handle_event_stream_state(self, connected):
+        """Poll rarely while the event stream is up, fall back to 5 minutes otherwise."""
+        self.update_timer.setInterval(1800000 if connected else 300000)
     
     def setup_ui_with_loading(self):
         """Setup UI with loading indicators for each tab"""
@@ -269,34 +299,14 @@ class DirectorDashboard(QMainWindow, BranchAllocationMixin, MenuAuthMixin, Recei
         self.load_initial_data()
 
     def load_basic_dashboard_data(self):
-        """Load only essential dashboard data with combined requests"""
+        """Load only essential dashboard data from the dashboard snapshot"""
         try:
-            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
-            
-            # Combine multiple requests into one batch
-            stats = {}
-            
-            # Get all stats in parallel
-            responses = {
-                'branches': requests.get(f"{self.api_url}/branches/stats/", headers=headers),
-                'users': requests.get(f"{self.api_url}/users/stats/", headers=headers),
-                'financial': requests.get(f"{self.api_url}/financial/total/", headers=headers)
-            }
-            
-            # Process responses
-            for key, response in responses.items():
-                if response.status_code == 200:
-                    stats.update(response.json())
-            
-            # Get today's transactions
-            today = datetime.now().strftime("%Y-%m-%d")
-            trans_response = requests.get(f"{self.api_url}/transactions/stats/?date={today}", headers=headers)
-            if trans_response.status_code == 200:
-                stats.update(trans_response.json())
-            
-            # Update cache and UI
-            self._update_cache('basic_stats', stats)
-            self.update_basic_stats(stats)
+            # All dashboard sections in one request
+            response = self.api_client.get_dashboard_snapshot()
+            if response.status_code == 200:
+                stats = response.json().get("sections", {})
+                self._update_cache('basic_stats', stats)
+                self.update_basic_stats(stats)
             
             # Load basic branch list for filters
             self.load_basic_branches()
@@ -697,58 +707,12 @@ class DirectorDashboard(QMainWindow, BranchAllocationMixin, MenuAuthMixin, Recei
             self.statusBar().showMessage(f"خطأ في تحديث لوحة المعلومات: {str(e)}", 5000)
     
     def load_financial_status(self):
-        """Load and display financial status."""
-        try:
-            headers = {"Authorization": f"Bearer {self.token}"}
-            # For director, get total financial stats across all branches
-            response = requests.get(f"{self.api_url}/financial/total/", headers=headers)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Update SYP balance
-                syp_balance = data.get("total_balance_syp", 0)
-                self.syp_balance.setText(f"{syp_balance:,.0f} ل.س")
-                
-                # Update USD balance
-                usd_balance = data.get("total_balance_usd", 0)
-                self.usd_balance.setText(f"{usd_balance:,.2f} $")
-                
-        except Exception as e:
-            print(f"Error loading financial status: {e}")
-            self.syp_balance.setText("غير متوفر")
-            self.usd_balance.setText("غير متوفر")
+        """Load and display financial status (part of the dashboard snapshot)."""
+        self.load_combined_basic_stats()
             
     def load_branch_status(self):
-        """Load and display overall system status."""
-        try:
-            headers = {"Authorization": f"Bearer {self.token}"}
-            
-            # Get total active employees across all branches
-            emp_response = requests.get(
-                f"{self.api_url}/users/stats/",
-                headers=headers
-            )
-            if emp_response.status_code == 200:
-                emp_data = emp_response.json()
-                active_count = emp_data.get("active", 0)
-                self.active_employees.setText(f"{active_count} موظف نشط")
-            
-            # Get today's total transactions
-            today = datetime.now().strftime("%Y-%m-%d")
-            trans_response = requests.get(
-                f"{self.api_url}/transactions/stats/?date={today}",
-                headers=headers
-            )
-            if trans_response.status_code == 200:
-                trans_data = trans_response.json()
-                trans_count = trans_data.get("total", 0)
-                self.today_transactions.setText(f"{trans_count} تحويل اليوم")
-                
-        except Exception as e:
-            print(f"Error loading branch status: {e}")
-            self.active_employees.setText("غير متوفر")
-            self.today_transactions.setText("غير متوفر")
+        """Load and display overall system status (part of the dashboard snapshot)."""
+        self.load_combined_basic_stats()
             
     def load_recent_activity(self):
         """Load recent activity data."""
@@ -1225,6 +1189,7 @@ class DirectorDashboard(QMainWindow, BranchAllocationMixin, MenuAuthMixin, Recei
             # Pagination
             params["page"] = self.current_page_transactions
             params["per_page"] = self.transactions_per_page
+            params["fields"] = TRANSACTION_TABLE_FIELDS
             response = requests.get(url, headers=headers, params=params)
             if response.status_code == 200:
                 data = response.json()
@@ -1641,7 +1606,8 @@ class DirectorDashboard(QMainWindow, BranchAllocationMixin, MenuAuthMixin, Recei
         # Stop all timers
         for timer_name in [
             'refresh_timer', 'transaction_timer', 'time_timer', 'update_timer',
-            'background_timer', 'basic_refresh_timer', 'tab_refresh_timer']:
+            'background_timer', 'basic_refresh_timer', 'tab_refresh_timer',
+            'event_refresh_timer']:
             timer = getattr(self, timer_name, None)
             if timer is not None:
                 timer.stop()
@@ -1959,69 +1925,53 @@ class DirectorDashboard(QMainWindow, BranchAllocationMixin, MenuAuthMixin, Recei
     def load_combined_basic_stats(self):
         """Load all basic statistics in one combined request"""
         try:
-            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
-            
             # Check if we have valid cached data
             if self._is_cache_valid('basic_stats'):
                 self.update_basic_stats(self._get_cached_data('basic_stats'))
                 return
                 
-            # Make parallel requests for all basic stats
-            responses = {
-                'branches': requests.get(f"{self.api_url}/branches/stats/", headers=headers),
-                'users': requests.get(f"{self.api_url}/users/stats/", headers=headers),
-                'financial': requests.get(f"{self.api_url}/financial/total/", headers=headers)
-            }
-            
-            # Combine all responses
-            combined_stats = {}
-            for key, response in responses.items():
-                if response.status_code == 200:
-                    combined_stats.update(response.json())
-                else:
-                    print(f"Error loading {key} stats: {response.status_code}")
-            
-            # Update cache with combined data
-            self._update_cache('basic_stats', combined_stats)
+            response = self.api_client.get_dashboard_snapshot()
+            if response.status_code != 200:
+                print(f"Error loading dashboard snapshot: {response.status_code}")
+                return
+            sections = response.json().get("sections", {})
             
-            # Update UI with new data
-            self.update_basic_stats(combined_stats)
+            # Update cache and UI with the new data
+            self._update_cache('basic_stats', sections)
+            self.update_basic_stats(sections)
             
             # Also update individual caches
-            if 'branches' in responses and responses['branches'].status_code == 200:
-                self._update_cache('branches', responses['branches'].json())
-            if 'users' in responses and responses['users'].status_code == 200:
-                self._update_cache('users', responses['users'].json())
-            if 'financial' in responses and responses['financial'].status_code == 200:
-                self._update_cache('financial', responses['financial'].json())
+            for key in ('users', 'financial'):
+                if key in sections:
+                    self._update_cache(key, sections[key]["data"])
             
         except Exception as e:
             print(f"Error loading combined basic stats: {e}")
             self.statusBar().showMessage(f"خطأ في تحميل البيانات الأساسية: {str(e)}", 5000)
 
     def update_basic_stats(self, data):
-        """Update basic statistics with combined data."""
+        """Update basic statistics from the /dashboard/snapshot sections."""
         try:
-            # Update branch stats
-            if 'branches' in data:
-                branch_stats = data['branches']
-                self.branch_count_label.setText(str(branch_stats.get('total', 0)))
-                self.active_branches_label.setText(str(branch_stats.get('active', 0)))
-                self.inactive_branches_label.setText(str(branch_stats.get('inactive', 0)))
+            # Update financial stats
+            if 'financial' in data:
+                financial_stats = data['financial']['data']
+                self.syp_balance.setText(f"{financial_stats.get('total_balance_syp', 0):,.0f} ل.س")
+                self.usd_balance.setText(f"{financial_stats.get('total_balance_usd', 0):,.2f} $")
             
             # Update user stats
             if 'users' in data:
-                user_stats = data['users']
-                self.total_users_label.setText(str(user_stats.get('total', 0)))
-                self.active_users_label.setText(str(user_stats.get('active', 0)))
-                self.inactive_users_label.setText(str(user_stats.get('inactive', 0)))
-            
-            # Update financial stats
-            if 'financial' in data:
-                financial_stats = data['financial']
-                self.total_balance_label.setText(f"{financial_stats.get('total_balance', 0):,.2f}")
-                self.total_income_label.setText(f"{financial_stats.get('total_income', 0):,.2f}")
-                self.total_expenses_label.setText(f"{financial_stats.get('total_expenses', 0):,.2f}")
+                user_stats = data['users']['data']
+                self.active_employees.setText(f"{user_stats.get('employees', 0)} موظف نشط")
+            
+            # Update today's transfers
+            if 'today' in data:
+                today_stats = data['today']['data']
+                self.today_transactions.setText(f"{today_stats.get('total', 0)} تحويل اليوم")
+            
+            # Oldest section decides how fresh the cards are
+            ages = [section.get('age_seconds', 0) for section in data.values() if isinstance(section, dict)]
+            if ages:
+                self.statusBar().showMessage(f"آخر تحديث للإحصائيات قبل {max(ages):.0f} ثانية", 3000)
             
             # Update cache timestamp
             self._update_cache('basic_stats', data)
@@ -19,6 +19,8 @@ from utils.helpers import get_status_arabic, get_status_color
 from money_transfer.receipt_printer import ReceiptPrinter
 from money_transfer.transaction_details import TransactionDetailsDialog
 from money_transfer.transfers import TransferCore
+from api.local_store import LocalStore
+from api.sync import SyncThread, send_submission
 import time
 
 class TransactionTableModel(QAbstractTableModel):
@@ -223,16 +225,22 @@ class SearchManager:
         self.search_transactions(transactions, '', ['receiver'])
 
 class TransferWorker(QThread):
-    """Worker thread for handling transfer operations"""
+    """Worker thread for handling transfer operations.
+
+    The transfer is already in the local outbox; ``queued`` is emitted when
+    the server could not be reached so the sync thread replays it later.
+    """
     finished = pyqtSignal(dict)
     error = pyqtSignal(str)
+    queued = pyqtSignal(str)
     progress = pyqtSignal(str)
     
-    def __init__(self, api_url, data, headers):
+    def __init__(self, api_url, data, headers, idempotency_key):
         super().__init__()
         self.api_url = api_url
         self.data = data
         self.headers = headers
+        self.idempotency_key = idempotency_key
         
     def run(self):
         try:
@@ -247,28 +255,17 @@ class TransferWorker(QThread):
             # Emit progress signal
             self.progress.emit("جاري إرسال التحويل...")
             
-            # Send transfer
-            response = requests.post(
-                f"{self.api_url}/transactions/",
-                json=self.data,
-                headers=self.headers,
-                timeout=10
+            # Send transfer; replays with the same key never create a second transfer
+            outcome, result = send_submission(
+                self.api_url, self.headers, "/transactions/", self.data, self.idempotency_key, timeout=10
             )
             
-            if response.status_code == 201:
-                self.finished.emit(response.json())
+            if outcome == "sent":
+                self.finished.emit(result)
+            elif outcome == "retry":
+                self.queued.emit(result)
             else:
-                error_msg = f"فشل إرسال التحويل: رمز الحالة {response.status_code}"
-                try:
-                    error_data = response.json()
-                    if "detail" in error_data:
-                        if isinstance(error_data["detail"], list):
-                            error_msg = "\n".join([str(err) for err in error_data["detail"]])
-                        else:
-                            error_msg = str(error_data["detail"])
-                except:
-                    pass
-                self.error.emit(error_msg)
+                self.error.emit(result)
                 
         except Exception as e:
             self.error.emit(f"خطأ في الاتصال: {str(e)}")
@@ -341,8 +338,16 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
         self.total_pages_incoming = 1
         self.per_page_incoming = 18
         self.current_zoom = 100
+        # Notifications are fetched incrementally after the first load
+        self.notifications = []
+        self.last_notification_id = None
+        self.max_notifications_shown = 200
         # Initialize search manager
         self.search_manager = SearchManager()
+        # Screens read from the local mirror; the sync thread keeps it current
+        self.local_store = LocalStore.for_user(self.api_url, self.username)
+        self.sync_thread = SyncThread(self.api_url, self.user_token, self.local_store)
+        self.pending_transfer_key = None
         
         self.setWindowTitle("نظام تحويل الأموال الداخلي")
         self.setGeometry(100, 100, 800, 700)
@@ -371,6 +376,11 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
         self.loading_overlay = LoadingOverlay(self)
         self.loading_overlay.hide()
         
+        self.sync_thread.synced.connect(self.handle_sync_completed)
+        self.sync_thread.connection_changed.connect(self.handle_connection_changed)
+        self.sync_thread.submission_rejected.connect(self.handle_submission_rejected)
+        self.sync_thread.start()
+        
     def setup_ui(self):
         """Set up the UI components."""
         # Title
@@ -550,37 +560,29 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
         self.receive_money_tab.setLayout(layout)
         
     def load_received_transactions(self):
-        """Load received transactions for the current branch with pagination support."""
+        """Load received transactions for the current branch from the local store with pagination support."""
         try:
             self.receive_status_label.setText("جاري تحميل بيانات التحويلات الواردة...")
-            headers = {"Authorization": f"Bearer {self.user_token}"} if self.user_token else {}
-
-            # إعداد رابط الطلب مع بارامتر الصفحة وعدد النتائج في كل صفحة
-            url = f"{self.api_url}/transactions/?destination_branch_id={self.branch_id}&page={self.current_page_incoming}&per_page={self.per_page_incoming}"
-
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                transactions_data = response.json()
-                transactions = transactions_data.get("items", [])
-                self.total_pages_incoming = transactions_data.get("total_pages", 1)
-                self.current_page_incoming = transactions_data.get("page", 1)
-                self.receive_count_label.setText(
-                    f"عدد التحويلات: {transactions_data.get('total', len(transactions))} "
-                    f"(الصفحة {self.current_page_incoming}/{self.total_pages_incoming})"
-                )
-                # Store transactions for filtering
-                self.all_received_transactions = transactions
-                # Emit signal to update UI
-                self.incomingTransactionsUpdated.emit(transactions)
-                self.receive_status_label.setText("تم تحميل بيانات التحويلات الواردة بنجاح")
-            else:
-                self.receive_status_label.setText(f"خطأ في تحميل بيانات التحويلات المستلمة: {response.status_code}")
-                QMessageBox.warning(self, "خطأ", f"فشل تحميل بيانات التحويلات المستلمة: {response.text}")
+            transactions_data = self.local_store.query_transactions(
+                destination_branch_id=self.branch_id,
+                page=self.current_page_incoming,
+                per_page=self.per_page_incoming
+            )
+            transactions = transactions_data["items"]
+            self.total_pages_incoming = transactions_data["total_pages"]
+            self.current_page_incoming = transactions_data["page"]
+            self.receive_count_label.setText(
+                f"عدد التحويلات: {transactions_data['total']} "
+                f"(الصفحة {self.current_page_incoming}/{self.total_pages_incoming})"
+            )
+            # Store transactions for filtering
+            self.all_received_transactions = transactions
+            # Emit signal to update UI
+            self.incomingTransactionsUpdated.emit(transactions)
+            self.receive_status_label.setText("تم تحميل بيانات التحويلات الواردة بنجاح")
         except Exception as e:
-            self.receive_status_label.setText("خطأ في الاتصال")
+            self.receive_status_label.setText("خطأ في تحميل البيانات المحلية")
             print(f"Error loading received transactions: {e}")
-            QMessageBox.critical(self, "خطأ في الاتصال", 
-                            "تعذر الاتصال بالخادم. الرجاء التحقق من اتصالك بالإنترنت وحالة الخادم.")
 
     def next_page_incoming(self):
         if self.current_page_incoming < self.total_pages_incoming:
@@ -1127,7 +1129,7 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
         
         # Refresh button
         refresh_button = ModernButton("تحديث الإشعارات", color="#2ecc71")
-        refresh_button.clicked.connect(self.load_notifications)
+        refresh_button.clicked.connect(lambda: self.load_notifications(full_reload=True))
         layout.addWidget(refresh_button)
         
         # Notifications table
@@ -1166,15 +1168,26 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
         
         self.notifications_tab.setLayout(layout)
     
+    def fetch_branches(self):
+        """Branches from the local store, fetched from the API only while the store is still empty."""
+        branches = self.local_store.get_branches()
+        if branches:
+            return branches
+        headers = {"Authorization": f"Bearer {self.user_token}"} if self.user_token else {}
+        response = requests.get(f"{self.api_url}/branches/", headers=headers, timeout=10)
+        if response.status_code != 200:
+            return None
+        branches = response.json().get("branches", [])
+        self.local_store.replace_branches(branches)
+        return branches
+
     def load_branches(self):
-        """Load branches from the API and configure destination branch filtering."""
+        """Load branches and configure destination branch filtering."""
         try:
-            headers = {"Authorization": f"Bearer {self.user_token}"} if self.user_token else {}
-            response = requests.get(f"{self.api_url}/branches/", headers=headers)
+            branches = self.fetch_branches()
             
-            if response.status_code == 200:
-                branches_data = response.json()
-                self.branches = branches_data.get("branches", [])
+            if branches is not None:
+                self.branches = branches
                 
                 # Create branch ID to name mapping
                 self.branch_id_to_name = {branch['id']: branch['name'] for branch in self.branches}
@@ -1255,44 +1268,32 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
             self.branch_input.setEnabled(True)       
     
     def load_transactions(self):
-        """Load transactions from the API with pagination support."""
+        """Load transactions from the local store with pagination support."""
         try:
             self.status_label.setText("جاري تحميل بيانات التحويلات...")
-            headers = {"Authorization": f"Bearer {self.user_token}"} if self.user_token else {}
-
-            # إعداد رابط الطلب مع بارامتر الصفحة وعدد النتائج في كل صفحة
-            url = f"{self.api_url}/transactions/?page={self.current_page_outgoing}&per_page={self.per_page_outgoing}"
-            if self.user_role == "employee":
-                url += f"&branch_id={self.branch_id}&employee_id={self.user_id}"
-            else:
-                if self.branch_id:
-                    url += f"&branch_id={self.branch_id}"
-
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                transactions_data = response.json()
-                transactions = transactions_data.get("items", [])
-                self.total_pages_outgoing = transactions_data.get("total_pages", 1)
-                self.current_page_outgoing = transactions_data.get("page", 1)
-                self.count_label.setText(
-                    f"عدد التحويلات: {transactions_data.get('total', len(transactions))} "
-                    f"(الصفحة {self.current_page_outgoing}/{self.total_pages_outgoing})"
-                )
-                # Store transactions for filtering
-                self.all_transactions = transactions
-                # Update search manager cache
-                self.search_manager.update_cache(transactions)
-                # Emit signal to update UI
-                self.outgoingTransactionsUpdated.emit(transactions)
-                self.status_label.setText("تم تحميل بيانات التحويلات الصادرة بنجاح")
-            else:
-                self.status_label.setText(f"خطأ في تحميل بيانات التحويلات: {response.status_code}")
-                QMessageBox.warning(self, "خطأ", f"فشل تحميل بيانات التحويلات: {response.text}")
+            transactions_data = self.local_store.query_transactions(
+                branch_id=self.branch_id or None,
+                employee_id=self.user_id if self.user_role == "employee" else None,
+                page=self.current_page_outgoing,
+                per_page=self.per_page_outgoing
+            )
+            transactions = transactions_data["items"]
+            self.total_pages_outgoing = transactions_data["total_pages"]
+            self.current_page_outgoing = transactions_data["page"]
+            self.count_label.setText(
+                f"عدد التحويلات: {transactions_data['total']} "
+                f"(الصفحة {self.current_page_outgoing}/{self.total_pages_outgoing})"
+            )
+            # Store transactions for filtering
+            self.all_transactions = transactions
+            # Update search manager cache
+            self.search_manager.update_cache(transactions)
+            # Emit signal to update UI
+            self.outgoingTransactionsUpdated.emit(transactions)
+            self.status_label.setText("تم تحميل بيانات التحويلات الصادرة بنجاح")
         except Exception as e:
-            self.status_label.setText("خطأ في الاتصال")
+            self.status_label.setText("خطأ في تحميل البيانات المحلية")
             print(f"Error loading transactions: {e}")
-            QMessageBox.critical(self, "خطأ في الاتصال", 
-                            "تعذر الاتصال بالخادم. الرجاء التحقق من اتصالك بالإنترنت وحالة الخادم.")
     
     def filter_transactions(self):
         """Filter transactions based on selected status."""
@@ -1325,51 +1326,80 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
 
     def refresh_data(self):
         """Refresh all data in the application."""
+        self.sync_thread.request_sync()
         self.load_transactions()
         self.status_label.setText("تم تحديث البيانات في: " + datetime.now().strftime("%H:%M:%S"))
         
-    def load_notifications(self):
-        """Load notifications from the API."""
+    def load_notifications(self, full_reload=False):
+        """Load notifications from the API.
+
+        After the first load only notifications newer than the last seen id
+        are requested; ``full_reload`` refetches the newest page so status
+        changes on existing rows are picked up as well.
+        """
         try:
             headers = {"Authorization": f"Bearer {self.user_token}"} if self.user_token else {}
+            incremental = not full_reload and self.last_notification_id is not None
+            params = {"limit": 100}
+            if incremental:
+                params["since_id"] = self.last_notification_id
             
-            response = requests.get(f"{self.api_url}/notifications/", headers=headers)
-            
-            if response.status_code == 200:
+            new_notifications = []
+            while True:
+                response = requests.get(f"{self.api_url}/notifications/", headers=headers, params=params)
+                if response.status_code != 200:
+                    QMessageBox.warning(self, "خطأ", f"فشل في تحميل الإشعارات: {response.text}")
+                    return
                 notifications_data = response.json()
-                notifications = notifications_data.get("notifications", [])
-                
-                self.notifications_table.setRowCount(len(notifications))
-                
-                for row_idx, notification in enumerate(notifications):
-                    # Set transaction ID
-                    self.notifications_table.setItem(row_idx, 0, QTableWidgetItem(notification.get("transaction_id", "")))
-                    
-                    # Set recipient phone
-                    self.notifications_table.setItem(row_idx, 1, QTableWidgetItem(notification.get("recipient_phone", "")))
-                    
-                    # Set message
-                    self.notifications_table.setItem(row_idx, 2, QTableWidgetItem(notification.get("message", "")))
-                    
-                    # Set status with color
-                    status = notification.get("status", "pending")
-                    status_item = QTableWidgetItem(self.get_notification_status_arabic(status))
-                    status_item.setBackground(self.get_notification_status_color(status))
-                    self.notifications_table.setItem(row_idx, 3, status_item)
-                    
-                    # Set created at
-                    self.notifications_table.setItem(row_idx, 4, QTableWidgetItem(notification.get("created_at", "")))
+                new_notifications.extend(notifications_data.get("notifications", []))
+                if notifications_data.get("next_since_id") is not None:
+                    self.last_notification_id = notifications_data["next_since_id"]
+                # Only keep paging when catching up on new notifications
+                if not incremental or not notifications_data.get("has_more"):
+                    break
+                params["since_id"] = self.last_notification_id
+            
+            if incremental:
+                # The feed returns new rows oldest first; the table shows newest first
+                self.notifications = list(reversed(new_notifications)) + self.notifications
             else:
-                QMessageBox.warning(self, "خطأ", f"فشل في تحميل الإشعارات: {response.text}")
+                self.notifications = new_notifications
+            self.notifications = self.notifications[:self.max_notifications_shown]
+            self.render_notifications()
         except Exception as e:
             QMessageBox.warning(self, "خطأ", f"تعذر الاتصال بالخادم: {str(e)}")
     
+    def render_notifications(self):
+        """Fill the notifications table from the locally held list."""
+        notifications = self.notifications
+        self.notifications_table.setRowCount(len(notifications))
+        
+        for row_idx, notification in enumerate(notifications):
+            # Set transaction ID
+            self.notifications_table.setItem(row_idx, 0, QTableWidgetItem(notification.get("transaction_id", "")))
+            
+            # Set recipient phone
+            self.notifications_table.setItem(row_idx, 1, QTableWidgetItem(notification.get("recipient_phone", "")))
+            
+            # Set message
+            self.notifications_table.setItem(row_idx, 2, QTableWidgetItem(notification.get("message", "")))
+            
+            # Set status with color
+            status = notification.get("status", "pending")
+            status_item = QTableWidgetItem(self.get_notification_status_arabic(status))
+            status_item.setBackground(self.get_notification_status_color(status))
+            self.notifications_table.setItem(row_idx, 3, status_item)
+            
+            # Set created at
+            self.notifications_table.setItem(row_idx, 4, QTableWidgetItem(notification.get("created_at", "")))
+    
     def get_notification_status_arabic(self, status):
         """Convert notification status to Arabic."""
         status_map = {
             "sent": "تم الإرسال",
             "pending": "قيد الانتظار",
-            "failed": "فشل"
+            "failed": "فشل",
+            "withdrawn": "ملغى"
         }
         return status_map.get(status, status)
     
@@ -1378,7 +1408,8 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
         status_colors = {
             "sent": QColor(200, 255, 200),  # Light green
             "pending": QColor(255, 255, 200),  # Light yellow
-            "failed": QColor(255, 200, 200)  # Light red
+            "failed": QColor(255, 200, 200),  # Light red
+            "withdrawn": QColor(230, 230, 230)  # Light grey
         }
         return status_colors.get(status, QColor(255, 255, 255))  # White default
     
@@ -1516,9 +1547,9 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
             
             if response.status_code == 200:
                 QMessageBox.information(self, "نجاح", "تم تحديث حالة التحويل بنجاح")
-                # Refresh both transactions and notifications
+                # Refresh both transactions and notifications (statuses changed, so reload fully)
                 self.load_transactions()
-                self.load_notifications()
+                self.load_notifications(full_reload=True)
             else:
                 QMessageBox.warning(self, "خطأ", f"فشل تحديث حالة التحويل: رمز الحالة {response.status_code}")
         except Exception as e:
@@ -1921,16 +1952,23 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
         self.loading_overlay.set_status("جاري إرسال التحويل...")
         self.loading_overlay.show()
         
+        # Record the transfer durably first; the sync thread stays away while this worker sends it
+        self.pending_transfer_key = self.local_store.enqueue(
+            "/transactions/", data, hold_seconds=60, local_fields={"employee_id": self.user_id}
+        )
+        
         # Create and start worker
         self.transfer_worker = TransferWorker(
             self.api_url,
             data,
-            {"Authorization": f"Bearer {self.user_token}"} if self.user_token else {}
+            {"Authorization": f"Bearer {self.user_token}"} if self.user_token else {},
+            self.pending_transfer_key
         )
         
         # Connect signals
         self.transfer_worker.finished.connect(self.handle_transfer_success)
         self.transfer_worker.error.connect(self.handle_transfer_error)
+        self.transfer_worker.queued.connect(self.handle_transfer_queued)
         self.transfer_worker.progress.connect(self.loading_overlay.set_status)
         
         # Start worker
@@ -1938,6 +1976,8 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
         
     def handle_transfer_success(self, response_data):
         """Handle successful transfer submission."""
+        self.local_store.mark_sent(self.pending_transfer_key)
+        self.sync_thread.request_sync()
         self.loading_overlay.hide()
         QMessageBox.information(self, "نجاح", "تم إرسال التحويل بنجاح")
         self.clear_form()
@@ -1949,8 +1989,50 @@ class MoneyTransferApp(QMainWindow, ReceiptPrinter, TransferCore, MenuAuthMixin)
 
     def handle_transfer_error(self, error_msg):
         """Handle transfer submission error."""
+        # Rejected by the server: drop it from the outbox so the user can correct the form
+        self.local_store.discard(self.pending_transfer_key)
         self.loading_overlay.hide()
         QMessageBox.critical(self, "خطأ", error_msg)
+
+    def handle_transfer_queued(self, error_msg):
+        """The server is unreachable; the transfer stays in the outbox and is sent by the sync thread."""
+        self.local_store.mark_retry(self.pending_transfer_key, error_msg, 5)
+        self.loading_overlay.hide()
+        QMessageBox.information(
+            self, "تم الحفظ محلياً",
+            "تعذر الاتصال بالخادم. تم حفظ التحويل وسيتم إرساله تلقائياً عند عودة الاتصال."
+        )
+        self.clear_form()
+        self.load_transactions()
+
+    def handle_sync_completed(self, stats):
+        """Re-render the lists from the refreshed local store."""
+        self.branches = self.local_store.get_branches()
+        self.branch_id_to_name = {branch['id']: branch['name'] for branch in self.branches}
+        self.load_transactions()
+        self.load_received_transactions()
+        if stats.get("sent"):
+            self.load_notifications()
+            self.transferCompleted.emit()
+
+    def handle_connection_changed(self, online):
+        """Tell the user when lists are served from local data only."""
+        if online:
+            pending = self.local_store.pending_count()
+            self.statusBar().showMessage(f"متصل - تحويلات بانتظار الإرسال: {pending}" if pending else "متصل", 5000)
+        else:
+            self.statusBar().showMessage("غير متصل - يتم عرض البيانات المحلية وستُرسل التحويلات عند عودة الاتصال")
+
+    def handle_submission_rejected(self, key, error_msg):
+        """A queued transfer was refused by the server when it was replayed."""
+        QMessageBox.warning(self, "تحويل مرفوض", f"رفض الخادم تحويلاً محفوظاً محلياً:\n{error_msg}")
+        self.load_transactions()
+
+    def closeEvent(self, event):
+        """Stop the sync thread and close the local store."""
+        self.sync_thread.stop()
+        self.local_store.close()
+        super().closeEvent(event)
         
     def resizeEvent(self, event):
         """Handle window resize to update loading overlay size."""
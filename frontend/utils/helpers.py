@@ -7,7 +7,8 @@ def get_status_arabic(status):
         "completed": "مكتمل",
         "cancelled": "ملغي",
         "rejected": "مرفوض",
-        "on_hold": "معلق"
+        "on_hold": "معلق",
+        "queued": "بانتظار الإرسال"
     }
     return status_map.get(status, status)
 
@@ -18,7 +19,8 @@ def get_status_color(status):
         "completed": QColor(200, 255, 200),
         "cancelled": QColor(255, 200, 200),
         "rejected": QColor(255, 150, 150),
-        "on_hold": QColor(255, 200, 150)
+        "on_hold": QColor(255, 200, 150),
+        "queued": QColor(230, 230, 230)
     }
     return status_colors.get(status, QColor(255, 255, 255))
 